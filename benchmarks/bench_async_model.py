@@ -0,0 +1,84 @@
+"""Bulk actions: AsyncBookModel (asyncio, bounded concurrency) vs BookModel on a thread pool.
+
+    python server/app.py                     # in another terminal
+    python benchmarks/bench_async_model.py [--url http://localhost:5000] [--books 300]
+                                           [--threads 4] [--concurrency 4 16 32] [--repeat 3]
+
+Takes --books available books, issues them all in one /books/batch call and then
+times returning them one request per book: with BookModel on a ThreadPoolExecutor
+of --threads workers (the controller's executor) and with AsyncBookModel at each
+--concurrency limit. Prints the median wall time and requests per second.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import os
+import statistics
+import sys
+import time
+
+CLIENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'client')
+sys.path.insert(0, CLIENT)
+
+from async_model import HAS_AIOHTTP, AsyncBookModel  # noqa: E402
+from model import BookModel  # noqa: E402
+
+
+def threaded(url, ids, threads):
+    model = BookModel(timeout=60)
+    model.BASE_URL = url
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(model.return_book_by_id, ids))
+
+
+def with_asyncio(url, ids, concurrency):
+    async def _run():
+        model = AsyncBookModel(timeout=60, max_concurrency=concurrency)
+        model.BASE_URL = url
+        try:
+            return await asyncio.gather(*(model.return_book_by_id(i) for i in ids))
+        finally:
+            await model.close()
+
+    return asyncio.run(_run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=BookModel.BASE_URL)
+    parser.add_argument('--books', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 16, 32])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    if not HAS_AIOHTTP:
+        sys.exit('aiohttp is not installed: pip install aiohttp')
+
+    model = BookModel(timeout=60)
+    model.BASE_URL = args.url
+    page = model.get_books_page(limit=args.books, status='доступна')
+    ids = [b['id'] for b in page['items']]
+    if len(ids) < args.books:
+        sys.exit(f'need {args.books} available books at {args.url}, found {len(ids)}')
+
+    runs = [(f'threads={args.threads} (BookModel)', lambda: threaded(args.url, ids, args.threads))]
+    runs += [(f'asyncio concurrency={c}', lambda c=c: with_asyncio(args.url, ids, c)) for c in args.concurrency]
+    print(f'returning {len(ids)} books, one request each')
+    print(f'{"client":<34}{"median, s":>10}{"req/s":>9}')
+    for name, run in runs:
+        times = []
+        for _ in range(args.repeat):
+            results = model.issue_many((i, '') for i in ids)
+            if not results or any(r.get('status') != 200 for r in results):
+                sys.exit(f'could not issue the books: {results!r:.200}')
+            start = time.perf_counter()
+            returned = run()
+            times.append(time.perf_counter() - start)
+            if not all(returned):
+                sys.exit(f'{name}: {returned.count(False)} returns failed')
+        median = statistics.median(times)
+        print(f'{name:<34}{median:>10.2f}{len(ids) / median:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
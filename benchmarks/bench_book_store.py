@@ -0,0 +1,85 @@
+"""Client cache memory: list of book dicts vs BookStore.
+
+    python benchmarks/bench_book_store.py [--books 100000 1000000]
+
+For each size builds the /books payload in both wire forms and measures with
+tracemalloc the memory held by the decoded cache (and the peak while decoding):
+the JSON list as resp.json() returns it, and a BookStore loaded from the JSON
+list and from the columnar payload.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'client'))
+sys.path.insert(0, HERE)
+
+from bench_search_index import make_books  # noqa: E402
+from book_store import BookStore  # noqa: E402
+from model import decode_columnar  # noqa: E402
+
+
+def columnar_payload(books, block=10000):
+    # the shape server/app.py streams for application/vnd.library.columnar+json
+    blocks = []
+    for start in range(0, len(books), block):
+        chunk = books[start:start + block]
+        values = list(dict.fromkeys(b['status'] for b in chunk))
+        codes = {v: i for i, v in enumerate(values)}
+        blocks.append({
+            'id': [b['id'] for b in chunk],
+            'title': [b['title'] for b in chunk],
+            'author': [b['author'] for b in chunk],
+            'status_values': values,
+            'status': [codes[b['status']] for b in chunk],
+            'reserved_by': [b['reserved_by'] for b in chunk],
+        })
+    return json.dumps({'blocks': blocks}, ensure_ascii=False)
+
+
+def measure(decode):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = decode()
+    elapsed = time.perf_counter() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, nargs='+', default=[100000, 1000000])
+    args = parser.parse_args()
+
+    print(f'{"books":>9}  {"representation":<26}{"held, MiB":>11}{"peak, MiB":>11}{"B/book":>8}{"time, s":>9}')
+    for n in args.books:
+        books = make_books(n)
+        plain = json.dumps(books, ensure_ascii=False)
+        columnar = columnar_payload(books)
+        del books
+        cases = [
+            ('list of dicts (json)', lambda: json.loads(plain)),
+            ('BookStore (json)', lambda: BookStore(json.loads(plain))),
+            ('BookStore (columnar)', lambda: decode_columnar(json.loads(columnar))),
+        ]
+        reference = None
+        for name, decode in cases:
+            result, size, peak, elapsed = measure(decode)
+            if reference is None:
+                reference = result
+            else:
+                assert len(result) == len(reference) and result[-1] == reference[-1]
+            print(f'{n:>9}  {name:<26}{size / 2**20:>11.1f}{peak / 2**20:>11.1f}{size / n:>8.0f}{elapsed:>9.2f}')
+            del result
+        del reference
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Client cold start: time until the first rows are available, with and without the disk snapshot.
+
+    python server/app.py                     # in another terminal
+    python benchmarks/bench_cold_start.py [--url http://localhost:5000] [--repeat 5]
+
+"Network" is a fresh BookModel doing the full GET /books and decoding it;
+"disk" reads the snapshot saved from that response the way the controller does
+before revalidating: the first screen (CACHE_HEAD_ROWS books), then all of it. Tk rendering is not included: in virtual
+mode only the visible rows are inserted either way.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+CLIENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'client')
+sys.path.insert(0, CLIENT)
+
+from disk_cache import DiskCache  # noqa: E402
+from model import BookModel  # noqa: E402
+
+# MainController.CACHE_HEAD_ROWS (not imported: the controller pulls in Tk)
+HEAD_ROWS = 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=BookModel.BASE_URL)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    network = []
+    for _ in range(args.repeat):
+        model = BookModel(timeout=60)
+        model.BASE_URL = args.url
+        start = time.perf_counter()
+        books, version = model.get_books_with_version()
+        network.append(time.perf_counter() - start)
+    if version is None:
+        sys.exit(f'no books from {args.url}: is the server running?')
+    etag, _ = model.books_validator()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = DiskCache(os.path.join(tmp, 'books.sqlite'), args.url)
+        start = time.perf_counter()
+        cache.save(books, version, etag)
+        save_t = time.perf_counter() - start
+        size = os.path.getsize(cache.path)
+        head = []
+        disk = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            cache.load(limit=HEAD_ROWS)
+            head.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            snapshot = cache.load()
+            disk.append(time.perf_counter() - start)
+        assert snapshot['books'] == books
+
+    print(f'books: {len(books)}; snapshot {size / 2**20:.1f} MiB, written in {save_t * 1000:.0f} ms (background)')
+    print(f'all rows from network: {statistics.median(network) * 1000:7.0f} ms (median of {args.repeat})')
+    print(f'first {HEAD_ROWS} rows from disk: {statistics.median(head) * 1000:7.1f} ms (median of {args.repeat})')
+    print(f'all rows from disk:    {statistics.median(disk) * 1000:7.0f} ms (median of {args.repeat})')
+
+
+if __name__ == '__main__':
+    main()
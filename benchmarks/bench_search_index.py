@@ -0,0 +1,84 @@
+"""Client search: trigram SearchIndex vs the linear scan with MainController._matches_filter.
+
+    python benchmarks/bench_search_index.py [--books 100000] [--repeat 5]
+
+Prints the index build time and size, the median time per query over --repeat
+runs, and checks that both return the same books.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+CLIENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'client')
+sys.path.insert(0, CLIENT)
+
+from controller import MainController  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+
+TITLE_WORDS = ['Война', 'мир', 'Анна', 'Каренина', 'Преступление', 'наказание', 'Идиот', 'Мёртвые',
+               'души', 'Отцы', 'дети', 'Обломов', 'Гроза', 'Чайка', 'Вишнёвый', 'сад', 'Герой',
+               'нашего', 'времени', 'Братья', 'Карамазовы', 'Бесы', 'Dune', 'Foundation', 'Hyperion']
+AUTHORS = ['Толстой', 'Достоевский', 'Гоголь', 'Тургенев', 'Гончаров', 'Островский', 'Чехов',
+           'Лермонтов', 'Пушкин', 'Булгаков', 'Herbert', 'Asimov', 'Simmons']
+READERS = ['Иванов', 'Петров', 'Сидорова', 'Кузнецов', 'Smith']
+STATUSES = ['доступна', 'выдана', 'зарезервирована']
+QUERIES = [('', 'Все'), ('', 'выдана'), ('ка', 'Все'), ('мир', 'Все'), ('каренина', 'Все'),
+           ('толстой', 'доступна'), ('иванов', 'зарезервирована'), ('вишнёвый сад', 'Все'), ('нет такого', 'Все')]
+
+
+def make_books(n, seed=1):
+    rng = random.Random(seed)
+    books = []
+    for i in range(1, n + 1):
+        status = rng.choice(STATUSES)
+        books.append({
+            'id': i,
+            'title': ' '.join(rng.sample(TITLE_WORDS, rng.randint(1, 4))) + f' {i}',
+            'author': rng.choice(AUTHORS),
+            'status': status,
+            'reserved_by': rng.choice(READERS) if status == 'зарезервирована' else None,
+        })
+    return books
+
+
+def timed(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    books = make_books(args.books)
+    start = time.perf_counter()
+    index = SearchIndex(books)
+    elapsed = time.perf_counter() - start
+    # size measured on a second build: tracemalloc slows allocation down a lot
+    tracemalloc.start()
+    second = SearchIndex(books)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del second
+    print(f'books: {len(books)}; index build: {elapsed:.2f} s, {size / 2**20:.1f} MiB')
+    print(f'{"query":<24}{"status":<18}{"matches":>9}{"scan, ms":>11}{"index, ms":>11}{"speedup":>9}')
+    for text, status in QUERIES:
+        scan_t, expected = timed(lambda: [b for b in books if MainController._matches_filter(None, b, text, status)], args.repeat)
+        index_t, got = timed(lambda: index.search(text, status), args.repeat)
+        assert got == expected, (text, status)
+        print(f'{text!r:<24}{status:<18}{len(got):>9}{scan_t * 1000:>11.1f}{index_t * 1000:>11.1f}{scan_t / max(index_t, 1e-9):>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
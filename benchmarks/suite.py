@@ -0,0 +1,268 @@
+"""Microbenchmarks of the hot server handlers and client controller paths, with baselines.
+
+    python benchmarks/suite.py [--sizes 1000 10000 100000] [--repeat 5] [--groups server client]
+                               [--threshold 0.25] [--baseline benchmarks/baselines.json]
+                               [--out results.json] [--save-baseline]
+
+server: GET /books through the Flask test client (JSON and columnar, response
+cache off) at each --sizes catalog size, and the latency of one PUT
+/books/issue/<id> and /books/return/<id> on the largest catalog. The server
+runs on a temporary SQLite file.
+
+client: MainController._matches_filter over the cache, and with a withdrawn Tk
+root (as client/tests/test_model.py does; skipped without a display)
+filter_and_show, sort_by_column and populating the Treeview, each timed until
+the list on screen is settled.
+
+Each benchmark is run once to warm up and then --repeat times; the median is
+compared with the baseline file and anything slower than the baseline by more
+than --threshold (a fraction) is flagged, with exit status 1. --save-baseline
+stores this run's medians as the new baseline (entries for benchmarks that did
+not run are kept).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+CLIENT = os.path.join(ROOT, 'client')
+sys.path.insert(0, ROOT)
+
+from loadtest.catalog import generate_books  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(HERE, 'baselines.json')
+# books issued and returned per timed run of the transition benchmarks
+TRANSITIONS = 100
+
+
+def server_benchmarks(sizes):
+    """Yield (name, run) pairs; run() returns the seconds one measurement took."""
+    state = tempfile.mkdtemp(prefix='bench-suite-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(state, 'library.db')
+    os.environ['RESPONSE_CACHE_PATH'] = os.path.join(state, 'response_cache.sqlite')
+    os.environ['METRICS_PATH'] = os.path.join(state, 'metrics.sqlite')
+    # measure the handler, not the response cache
+    os.environ['RESPONSE_CACHE_MAX_ENTRIES'] = '0'
+    import flask_migrate
+    from server import create_app
+
+    app = create_app()
+    with app.app_context():
+        flask_migrate.upgrade()
+    client = app.test_client()
+    loaded = 0
+    for size in sorted(sizes):
+        body = ''.join(json.dumps(b, ensure_ascii=False) + '\n' for b in generate_books(size - loaded, seed=size))
+        resp = client.post('/books/bulk', data=body.encode('utf-8'), content_type='application/x-ndjson')
+        assert resp.status_code == 200 and resp.get_json()['inserted'] == size - loaded, resp.get_data()
+        loaded = size
+
+        def get_books(accept):
+            start = time.perf_counter()
+            resp = client.get('/books', headers={'Accept': accept})
+            resp.get_data()
+            elapsed = time.perf_counter() - start
+            assert resp.status_code == 200
+            return elapsed
+
+        yield f'server.get_books.json.{_size(size)}', lambda: get_books('application/json')
+        yield f'server.get_books.columnar.{_size(size)}', lambda: get_books('application/vnd.library.columnar+json')
+
+    page = client.get('/books', query_string={'limit': TRANSITIONS, 'status': 'доступна'}).get_json()
+    ids = [b['id'] for b in page['items']]
+
+    def transitions(timed, untimed):
+        # per request; the other half puts the books back
+        start = time.perf_counter()
+        for book_id in ids:
+            assert client.put(f'/books/{timed}/{book_id}', json={}).status_code == 200
+        elapsed = time.perf_counter() - start
+        for book_id in ids:
+            client.put(f'/books/{untimed}/{book_id}', json={})
+        return elapsed / len(ids)
+
+    def returns():
+        for book_id in ids:
+            client.put(f'/books/issue/{book_id}', json={})
+        start = time.perf_counter()
+        for book_id in ids:
+            assert client.put(f'/books/return/{book_id}', json={}).status_code == 200
+        return (time.perf_counter() - start) / len(ids)
+
+    yield f'server.issue_book.{_size(loaded)}', lambda: transitions('issue', 'return')
+    yield f'server.return_book.{_size(loaded)}', returns
+
+
+def client_benchmarks(sizes):
+    sys.path.insert(0, CLIENT)
+    os.environ['LIBRARY_CLIENT_CACHE'] = os.path.join(tempfile.mkdtemp(prefix='bench-suite-'), 'books.sqlite')
+    from book_store import BookStore
+    from controller import MainController
+    from model import BookModel
+
+    catalogs = {}
+    for size in sizes:
+        catalogs[size] = BookStore([dict(b, id=i + 1) for i, b in enumerate(generate_books(size, seed=size))])
+
+    for size, books in catalogs.items():
+        def matches(books=books):
+            start = time.perf_counter()
+            for book in books:
+                MainController._matches_filter(None, book, 'сад', 'доступна')
+            return time.perf_counter() - start
+
+        yield f'client.matches_filter.{_size(size)}', matches
+
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        print(f'client Tk benchmarks skipped: {e}', file=sys.stderr)
+        return
+    root.withdraw()
+    # no server: the controller's startup load fails at once and leaves the cache to us
+    BookModel.BASE_URL = 'http://127.0.0.1:9'
+    controller = MainController(root)
+
+    def settle(condition=lambda: True):
+        # run the Tk loop until the filter pass, the row diff and `condition` are done
+        while controller._filter_token is not None or controller._rendering is not None or not condition():
+            root.update()
+            time.sleep(0.0005)
+
+    def timed(action):
+        start = time.perf_counter()
+        action()
+        settle()
+        return time.perf_counter() - start
+
+    settle()
+    try:
+        for size, books in catalogs.items():
+            controller._sort_spec = []
+            controller._set_books(books.copy(), None, save=False)
+            settle(lambda: controller._index is not None)
+
+            def filter_and_show():
+                controller.view.search_entry.delete(0, 'end')
+                controller.view.search_entry.insert(0, 'сад')
+                controller.view.status_filter.set('Все')
+                return timed(controller.filter_and_show)
+
+            def sort_by_column():
+                controller.view.search_entry.delete(0, 'end')
+                controller.filter_and_show()
+                settle()
+                return timed(lambda: controller.sort_by_column('title'))
+
+            def populate():
+                # from an empty list to all rows (virtual mode above VIRTUAL_THRESHOLD)
+                shown = list(controller._books)
+                controller._render_books([])
+                settle()
+                return timed(lambda: controller._render_books(shown))
+
+            yield f'client.filter_and_show.{_size(size)}', filter_and_show
+            yield f'client.sort_by_column.{_size(size)}', sort_by_column
+            yield f'client.populate_treeview.{_size(size)}', populate
+    finally:
+        controller._executor.shutdown(wait=False)
+        root.destroy()
+
+
+GROUPS = {'server': server_benchmarks, 'client': client_benchmarks}
+
+
+def _size(n):
+    return f'{n // 1000}k' if n >= 1000 and n % 1000 == 0 else str(n)
+
+
+def measure(run, repeat):
+    run()
+    times = [run() for _ in range(repeat)]
+    return {'median_ms': round(statistics.median(times) * 1000, 4), 'min_ms': round(min(times) * 1000, 4),
+            'repeat': repeat}
+
+
+def compare(results, baseline, threshold):
+    """(name, median, baseline median, change, verdict) rows; verdict is '', 'REGRESSION' or 'faster'."""
+    rows = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, result['median_ms'], None, None, 'no baseline'))
+            continue
+        change = result['median_ms'] / base['median_ms'] - 1
+        verdict = 'REGRESSION' if change > threshold else 'faster' if change < -threshold else ''
+        rows.append((name, result['median_ms'], base['median_ms'], change, verdict))
+    return rows
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--groups', nargs='+', choices=list(GROUPS), default=list(GROUPS))
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='flag medians slower than the baseline by more than this fraction')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--out', help='save this run\'s results as JSON')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    args = parser.parse_args()
+
+    results = {}
+    for group in args.groups:
+        for name, run in GROUPS[group](args.sizes):
+            results[name] = measure(run, args.repeat)
+            print(f'{name:<40}{results[name]["median_ms"]:>12.3f} ms', file=sys.stderr)
+
+    meta = {'date': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'git_commit': _git_commit(),
+            'python': platform.python_version(), 'machine': f'{platform.system()} {platform.machine()}',
+            'host': platform.node()}
+    baseline = {'meta': None, 'results': {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as fp:
+            baseline = json.load(fp)
+
+    rows = compare(results, baseline['results'], args.threshold)
+    print(f'{"benchmark":<40}{"median, ms":>12}{"baseline":>12}{"change":>9}')
+    for name, median, base, change, verdict in rows:
+        print(f'{name:<40}{median:>12.3f}{f"{base:.3f}" if base is not None else "-":>12}'
+              f'{f"{change:+.0%}" if change is not None else "":>9}  {verdict}')
+    if baseline['meta']:
+        print(f'baseline: {baseline["meta"].get("git_commit")} on {baseline["meta"].get("host")}, '
+              f'{baseline["meta"].get("date")}')
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as fp:
+            json.dump({'meta': meta, 'threshold': args.threshold, 'results': results}, fp, indent=2)
+            fp.write('\n')
+    if args.save_baseline:
+        merged = dict(baseline['results'], **results)
+        with open(args.baseline, 'w', encoding='utf-8') as fp:
+            json.dump({'meta': meta, 'results': dict(sorted(merged.items()))}, fp, indent=2)
+            fp.write('\n')
+    regressions = [row[0] for row in rows if row[4] == 'REGRESSION']
+    if regressions:
+        print(f'{len(regressions)} regression(s) over {args.threshold:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import threading
+import traceback
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+try:
+    from book_store import BookStore
+    from model import COLUMNAR_MIMETYPE, BookModel, decode_columnar
+except ImportError:
+    from .book_store import BookStore
+    from .model import COLUMNAR_MIMETYPE, BookModel, decode_columnar
+
+
+class AsyncBookModel:
+    """Awaitable counterpart of BookModel on aiohttp (an optional dependency).
+
+    The methods and their results are those of BookModel, as coroutines. At most
+    `max_concurrency` requests are in flight at once (a semaphore, and the connector
+    keeps that many keep-alive connections), each with its own `timeout`; GET/PUT/
+    DELETE are retried on connection errors and 5xx like BookModel's session does.
+    Use an instance from a single event loop, e.g. an AsyncRunner's.
+    """
+
+    BASE_URL = BookModel.BASE_URL
+    RETRIES = 3
+    BACKOFF = 0.3
+    RETRY_STATUSES = (500, 502, 503, 504)
+    IDEMPOTENT = ('GET', 'PUT', 'DELETE')
+
+    def __init__(self, timeout: int = 5, max_concurrency: int = 16):
+        if not HAS_AIOHTTP:
+            raise RuntimeError('AsyncBookModel requires aiohttp (pip install aiohttp)')
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        # created on first use, inside the loop that will run the requests
+        self._session = None
+        self._semaphore = None
+        # last full /books response, revalidated with If-None-Match
+        self._books_etag = None
+        self._books_cache = BookStore()
+        self._books_version = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method, path, **kwargs):
+        """(status, headers, body) of one request, None if it could not be made."""
+        session = self._get_session()
+        attempts = self.RETRIES + 1 if method in self.IDEMPOTENT else 1
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        for attempt in range(attempts):
+            if attempt:
+                await asyncio.sleep(self.BACKOFF * 2 ** (attempt - 1))
+            try:
+                async with self._semaphore:
+                    async with session.request(method, f'{self.BASE_URL}{path}', timeout=timeout, **kwargs) as resp:
+                        result = resp.status, resp.headers, await resp.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                continue
+            if result[0] in self.RETRY_STATUSES and attempt + 1 < attempts:
+                continue
+            return result
+        return None
+
+    async def _json(self, method, path, expect=200, **kwargs):
+        result = await self._request(method, path, **kwargs)
+        if result is None or result[0] != expect:
+            return None
+        try:
+            return json.loads(result[2])
+        except ValueError:
+            return None
+
+    async def _ok(self, method, path, **kwargs):
+        result = await self._request(method, path, **kwargs)
+        return result is not None and result[0] == 200
+
+    async def get_books(self):
+        return (await self.get_books_with_version())[0]
+
+    async def get_books_with_version(self):
+        """Return (books, version) as BookModel.get_books_with_version does."""
+        headers = {'Accept': f'{COLUMNAR_MIMETYPE}, application/json;q=0.5'}
+        if self._books_etag:
+            headers['If-None-Match'] = self._books_etag
+        result = await self._request('GET', '/books', headers=headers)
+        if result is not None:
+            status, resp_headers, body = result
+            if status == 304:
+                return self._books_cache.copy(), self._books_version
+            if status == 200:
+                try:
+                    data = json.loads(body)
+                except ValueError:
+                    return BookStore(), None
+                if resp_headers.get('Content-Type', '').startswith(COLUMNAR_MIMETYPE):
+                    books = decode_columnar(data)
+                else:
+                    books = BookStore(data)
+                try:
+                    version = int(resp_headers['X-Books-Version'])
+                except (KeyError, ValueError):
+                    version = None
+                self._books_etag = resp_headers.get('ETag')
+                self._books_cache = books
+                self._books_version = version
+                return books.copy(), version
+        return BookStore(), None
+
+    def prime_books_cache(self, books, version, etag):
+        if etag and self._books_etag is None:
+            self._books_etag = etag
+            self._books_cache = books.copy() if isinstance(books, BookStore) else BookStore(books)
+            self._books_version = version
+
+    def books_validator(self):
+        return self._books_etag, self._books_version
+
+    async def search_books(self, q, status=None, limit=500):
+        params = {'q': q, 'limit': limit}
+        if status and status != 'Все':
+            params['status'] = status
+        return await self._json('GET', '/books/search', params=params)
+
+    async def get_changes(self, since):
+        return await self._json('GET', '/books/changes', params={'since': since})
+
+    async def get_books_page(self, limit=100, cursor=None, q=None, status=None, sort='id', order='asc'):
+        params = {'limit': limit, 'sort': sort, 'order': order}
+        if cursor:
+            params['cursor'] = cursor
+        if q:
+            params['q'] = q
+        if status and status != 'Все':
+            params['status'] = status
+        page = await self._json('GET', '/books', params=params)
+        return page if page is not None else {'items': [], 'next_cursor': None}
+
+    async def add_book(self, title, author):
+        return await self._json('POST', '/books', expect=201, json={'title': title, 'author': author})
+
+    async def issue_book_by_id(self, book_id, name=""):
+        return await self._ok('PUT', f'/books/issue/{book_id}', json={"name": name} if name else {})
+
+    async def return_book_by_id(self, book_id):
+        return await self._ok('PUT', f'/books/return/{book_id}')
+
+    async def reserve_book_by_id(self, book_id, name):
+        return await self._ok('PUT', f'/books/reserve/{book_id}', json={"name": name})
+
+    async def delete_book_by_id(self, book_id):
+        return await self._ok('DELETE', f'/books/{book_id}')
+
+    async def batch(self, operations):
+        data = await self._json('POST', '/books/batch', json={'operations': operations})
+        return None if data is None else data.get('results')
+
+    async def issue_many(self, items):
+        return await self.batch([{'op': 'issue', 'id': int(book_id), 'name': name} for book_id, name in items])
+
+    async def return_many(self, book_ids):
+        return await self.batch([{'op': 'return', 'id': int(book_id)} for book_id in book_ids])
+
+    async def reserve_many(self, items):
+        return await self.batch([{'op': 'reserve', 'id': int(book_id), 'name': name} for book_id, name in items])
+
+    async def delete_many(self, book_ids):
+        return await self.batch([{'op': 'delete', 'id': int(book_id)} for book_id in book_ids])
+
+
+class AsyncRunner:
+    """An asyncio event loop on a daemon thread, so Tk code can run coroutines.
+
+    `submit(coro, on_done)` schedules `coro` on the loop and returns a
+    concurrent.futures.Future; `on_done(result)` (None if the coroutine raised)
+    is handed to `call_soon`, e.g. `lambda fn: root.after(0, fn)`, to run on the
+    Tk thread.
+    """
+
+    def __init__(self, call_soon):
+        self._call_soon = call_soon
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name='asyncio-loop', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro, on_done=None):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        if on_done is not None:
+            def _done(f):
+                try:
+                    result = f.result()
+                except Exception:
+                    traceback.print_exc()
+                    result = None
+                self._call_soon(lambda: on_done(result))
+
+            future.add_done_callback(_done)
+        return future
+
+    def stop(self, timeout=5):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
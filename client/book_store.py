@@ -0,0 +1,173 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+
+FIELDS = ('id', 'title', 'author', 'status', 'reserved_by')
+
+
+class Book(Mapping):
+    """One cached book: a read-only record with the read API of the book dicts the
+    server returns (`get`, `[]`, `keys`, `==` with a dict), so `dict(book, status=...)`
+    still makes a changed copy. About a third of the size of the equivalent dict.
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, id, title, author, status, reserved_by=None):
+        self.id = id
+        self.title = title
+        self.author = author
+        self.status = status
+        self.reserved_by = reserved_by
+
+    def __getitem__(self, key):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        # hot path: called for every book by filtering, sorting and rendering
+        return getattr(self, key) if key in FIELDS else default
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __repr__(self):
+        return 'Book(%s)' % ', '.join(f'{f}={getattr(self, f)!r}' for f in FIELDS)
+
+
+class BookStore(Sequence):
+    """Compact client cache of books, in server (id) order.
+
+    Books are kept as `Book` records next to a parallel `array` of their ids, so
+    looking a book up by id is a bisect while the ids are ascending (they are,
+    unless a placeholder or a restored book broke the order; then it is a scan of
+    the array in C). Authors, statuses and reader names repeat a lot and are
+    interned in a per-store table: equal values share one string object.
+
+    Records are never changed in place: `upsert` replaces the record, so lists of
+    books taken earlier (shown rows, a snapshot being saved) stay consistent.
+    """
+
+    def __init__(self, books=()):
+        self._ids = array('q')
+        self._records = []
+        self._strings = {}
+        self._ascending = True
+        self.extend(books)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a store from (id, title, author, status, reserved_by) tuples."""
+        store = cls()
+        store.extend_rows(rows)
+        return store
+
+    def _intern(self, value):
+        if value is None:
+            return None
+        return self._strings.setdefault(value, value)
+
+    def _record(self, book):
+        return Book(book.get('id'), book.get('title'), self._intern(book.get('author')),
+                    self._intern(book.get('status')), self._intern(book.get('reserved_by')))
+
+    def extend(self, books):
+        self.extend_rows((b.get('id'), b.get('title'), b.get('author'), b.get('status'), b.get('reserved_by'))
+                         for b in books)
+
+    def extend_rows(self, rows):
+        intern = self._strings.setdefault
+        ids = self._ids
+        records = self._records
+        last = ids[-1] if ids else None
+        ascending = self._ascending
+        for book_id, title, author, status, reserved_by in rows:
+            if ascending and last is not None and book_id <= last:
+                ascending = False
+            last = book_id
+            ids.append(book_id)
+            records.append(Book(book_id, title,
+                                None if author is None else intern(author, author),
+                                None if status is None else intern(status, status),
+                                None if reserved_by is None else intern(reserved_by, reserved_by)))
+        self._ascending = ascending
+
+    def copy(self):
+        # records are immutable, so the copy shares them (and the string table)
+        store = BookStore()
+        store._ids = array('q', self._ids)
+        store._records = list(self._records)
+        store._strings = self._strings
+        store._ascending = self._ascending
+        return store
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, index):
+        return self._records[index]
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def index_of(self, book_id):
+        """Position of the book with `book_id` (an int or its str form), None if absent."""
+        try:
+            book_id = int(book_id)
+        except (TypeError, ValueError):
+            return None
+        ids = self._ids
+        if self._ascending:
+            i = bisect_left(ids, book_id)
+            return i if i < len(ids) and ids[i] == book_id else None
+        try:
+            return ids.index(book_id)
+        except ValueError:
+            return None
+
+    def get(self, book_id):
+        i = self.index_of(book_id)
+        return None if i is None else self._records[i]
+
+    def upsert(self, book):
+        """Replace the book with the same id in place or append it; returns the stored record."""
+        record = self._record(book)
+        i = self.index_of(record.id)
+        if i is None:
+            ids = self._ids
+            if ids and record.id <= ids[-1]:
+                self._ascending = False
+            ids.append(record.id)
+            self._records.append(record)
+        else:
+            self._records[i] = record
+        return record
+
+    def insert(self, index, book):
+        """Put a book at `index` (e.g. back where it was); returns the stored record."""
+        record = self._record(book)
+        ids = self._ids
+        index = max(0, min(index, len(ids)))
+        if (index > 0 and ids[index - 1] >= record.id) or (index < len(ids) and ids[index] <= record.id):
+            self._ascending = False
+        ids.insert(index, record.id)
+        self._records.insert(index, record)
+        return record
+
+    def remove_ids(self, book_ids):
+        """Drop the books with the given ids in one pass."""
+        book_ids = set(book_ids)
+        keep = [i for i, book_id in enumerate(self._ids) if book_id not in book_ids]
+        if len(keep) == len(self._ids):
+            return
+        records = self._records
+        self._ids = array('q', (self._ids[i] for i in keep))
+        self._records = [records[i] for i in keep]
+        if not self._ascending:
+            # e.g. the placeholder that broke the order is gone again
+            ids = self._ids
+            self._ascending = all(a < b for a, b in zip(ids, ids[1:]))
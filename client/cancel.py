@@ -0,0 +1,23 @@
+class Cancelled(Exception):
+    pass
+
+
+class CancelToken:
+    """Cooperative cancellation for work running on a worker thread.
+
+    The Tk thread calls `cancel()`; the worker calls `check()` between chunks of
+    work, which raises Cancelled once the result is no longer wanted.
+    """
+
+    # items to process between two checks
+    CHUNK = 4096
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled()
@@ -1,12 +1,74 @@
 import tkinter as tk
 from tkinter import messagebox
 from model import BookModel
+from book_store import BookStore
 from view import MainView
+from rowdiff import apply_diff, diff_rows
+from cancel import CancelToken, Cancelled
+from search_index import SearchIndex
+from sort_orders import SortOrders
+from disk_cache import DiskCache, default_cache_path
+from optimistic import DELETED, expected_state
+from fetch_scheduler import FULL, FetchScheduler
+from async_model import HAS_AIOHTTP, AsyncBookModel, AsyncRunner
+import asyncio
+import threading
+import time
 import traceback
 import concurrent.futures
+from collections.abc import Sequence
+
+
+def _status_tag(status):
+    status = (status or '').lower()
+    if 'выдан' in status:
+        return 'issued'
+    if 'зарезерв' in status:
+        return 'reserved'
+    return 'available'
+
+
+def book_row(book):
+    # (iid, values, tag) as the view expects; iid is the book id so rows can be
+    # addressed by id regardless of which of them are currently rendered
+    values = (book.get('id'), book.get('title'), book.get('author'), book.get('status', 'неизвестно'), book.get('reserved_by') or '')
+    return str(book.get('id')), values, _status_tag(book.get('status'))
+
+
+class BookRows(Sequence):
+    """Lazy row view over a list of book dicts: tuples are built only for rows that get rendered."""
+
+    def __init__(self, books):
+        self._books = books
+
+    def __len__(self):
+        return len(self._books)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [book_row(b) for b in self._books[index]]
+        return book_row(self._books[index])
+
 
 class MainController:
+    # above this many cached books text search goes to the server's full-text index
+    LOCAL_FILTER_LIMIT = 50000
+    # how many best matches to show for a server-side search
+    REMOTE_SEARCH_LIMIT = 500
+    # write the on-disk snapshot this long after the last change to the cache (ms)
+    CACHE_SAVE_DELAY_MS = 2000
+    # rows read first from the snapshot to fill the screen while the rest loads
+    CACHE_HEAD_ROWS = 200
+    # up to this many cached books filtering and sorting run inline on the Tk thread:
+    # the pass is quicker than a round trip through the executor
+    INLINE_FILTER_LIMIT = 5000
+    # requests in flight for an action applied to many books (asyncio model)
+    BULK_CONCURRENCY = 16
+    # operations per POST /books/batch (the server's MAX_BATCH_OPERATIONS)
+    BULK_BATCH_SIZE = 1000
+
     def __init__(self, root):
+        self._started = time.perf_counter()
         self.model = BookModel()
         # Передаём функции-события в нужном порядке: добавить, удалить, выдать, вернуть, зарезервировать книгу.
         self.view = MainView(
@@ -23,12 +85,59 @@ class MainController:
         # register search callback so the view can notify controller on filter changes
         try:
             self.view.set_search_callback(self._on_search)
+            self.view.set_search_abort_callback(self._on_search_input)
         except Exception:
             pass
-        # cached books retrieved from server (used for local filtering)
-        self._books = []
+        # cached books retrieved from server (used for local filtering), a compact
+        # BookStore of read-only records
+        self._books = BookStore()
+        # trigram index over the cache, patched on deltas and rebuilt off the Tk thread
+        # on full loads; None while a rebuild is pending (filtering then scans the cache)
+        self._index = SearchIndex()
+        # bumped on every change to _books so a stale index rebuild is not installed
+        self._books_generation = 0
+        # per-column sort permutations over the cache and the active sort:
+        # [(column, ascending), ...], primary first; kept across refreshes
+        self._sorter = SortOrders()
+        self._sort_spec = []
+        # books currently shown in the list, in display order (after filter/sort)
+        self._shown = []
+        # book id (Treeview iid) -> (values, tag) of the rendered rows, in display order;
+        # empty while the view is in virtual mode
+        self._tree_rows = {}
+        # (base rows, diff) of a row diff the view is still applying, None otherwise
+        self._rendering = None
+        # cancellation token of the filter/sort pass running on a worker, None if idle
+        self._filter_token = None
+        # server change-log version of the cache; None until the first full load
+        self._version = None
         # Executor for background tasks to reuse threads and limit concurrency
         self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+        # snapshot of _books on disk for instant startup
+        self._disk_cache = DiskCache(default_cache_path(self.model.BASE_URL), self.model.BASE_URL)
+        self._cache_save_after = None
+        # full loads and delta syncs go through one scheduler: one fetch in flight,
+        # one trailing, stale results dropped
+        self._fetches = FetchScheduler(self._submit, lambda fn: self.view.root.after(0, fn),
+                                       self._fetch_books, self._apply_fetched)
+        # actions over many books go through the asyncio model on its own loop thread
+        # when aiohttp is installed; otherwise through the executor
+        self._async = None
+        self.async_model = None
+        if HAS_AIOHTTP:
+            try:
+                self.async_model = AsyncBookModel(timeout=self.model.timeout, max_concurrency=self.BULK_CONCURRENCY)
+                self.async_model.BASE_URL = self.model.BASE_URL
+                self._async = AsyncRunner(lambda fn: self.view.root.after(0, fn))
+            except Exception:
+                traceback.print_exc()
+                self.async_model = self._async = None
+        # actions shown optimistically and not yet answered by the server, oldest first
+        self._pending = []
+        # a snapshot save was skipped while actions were pending
+        self._cache_save_deferred = False
+        # placeholder ids for books being added (negative, never clash with server ids)
+        self._next_placeholder_id = -1
         # register context menu callback
         self.view.set_menu_callback(self._on_menu_action)
         # register selection callback
@@ -36,53 +145,296 @@ class MainController:
             self.view.set_selection_callback(self._on_selection_changed)
         except Exception:
             pass
-        self.load_books()
+        self.load_cached_books()
 
-    def load_books(self):
-        # Fetch books in a background thread to avoid blocking UI
-        def _fetch():
+    def _submit(self, fn):
+        try:
+            self._executor.submit(fn)
+        except Exception:
+            threading.Thread(target=fn, daemon=True).start()
+
+    def load_cached_books(self):
+        # Show the snapshot saved on disk right away (the first screen, then all of
+        # it), then revalidate it in the background with the deltas since its
+        # version; without a snapshot do a full load
+        def _read():
             try:
-                books = self.model.get_books() or []
+                snapshot = self._disk_cache.load(limit=self.CACHE_HEAD_ROWS)
+                if snapshot is not None and snapshot['count'] > len(snapshot['books']):
+                    head = snapshot['books']
+                    self.view.root.after(0, lambda: _show_head(head, snapshot['count']))
+                    snapshot = self._disk_cache.load()
             except Exception:
                 traceback.print_exc()
-                books = []
+                snapshot = None
 
             def _update_ui():
-                tree = self.view.book_list
-                for item in tree.get_children():
-                    tree.delete(item)
-                # update cache
-                self._books = books
-                for book in books:
-                    status = (book.get('status') or '').lower()
-                    tag = 'available'
-                    if 'выдан' in status or 'выдана' in status:
-                        tag = 'issued'
-                    elif 'зарезерв' in status:
-                        tag = 'reserved'
-                    tree.insert('', tk.END, values=(book.get('id'), book.get('title'), book.get('author'), book.get('status', 'неизвестно'), book.get('reserved_by') or ''), tags=(tag,))
-                self.view.set_status(f'Загружено записей: {len(books)}')
-                try:
-                    self.view.set_busy(False)
-                except Exception:
-                    pass
+                if snapshot is None or self._version is not None:
+                    self.load_books()
+                    return
+                self.model.prime_books_cache(snapshot['books'], snapshot['version'], snapshot['etag'])
+                self._fetches.invalidate()
+                self._set_books(snapshot['books'], snapshot['version'], save=False)
+                elapsed = (time.perf_counter() - self._started) * 1000
+                self.view.set_status(f'Загружено из кэша: {len(self._books)} ({elapsed:.0f} мс), проверка обновлений...')
+                self.sync_books()
 
             try:
-                try:
-                    self.view.set_busy(True, 'Загрузка...')
-                except Exception:
-                    pass
                 self.view.root.after(0, _update_ui)
             except Exception:
                 pass
 
-        # submit to executor
+        def _show_head(head, count):
+            if self._version is None and not self._books:
+                self._render_books(head)
+                elapsed = (time.perf_counter() - self._started) * 1000
+                self.view.set_status(f'Загрузка из кэша: {len(head)} из {count} ({elapsed:.0f} мс)...')
+
+        self._submit(_read)
+
+    def _set_books(self, books, version, save=True):
+        # Replace the whole cache. Rows are shown at once; the search index is rebuilt
+        # in the background (filter_and_show scans the cache until it is ready).
+        self._books = books if isinstance(books, BookStore) else BookStore(books)
+        self._version = version
+        self._sorter = SortOrders(books)
+        self._invalidate_index()
+        self._reapply_pending()
+        self.filter_and_show()
+        if save:
+            self._schedule_cache_save()
+
+    def _rebuild_index(self):
+        generation = self._books_generation
+        books = list(self._books)
+
+        def _build():
+            index = SearchIndex(books)
+
+            def _install():
+                if generation == self._books_generation:
+                    self._index = index
+                else:
+                    # the cache changed while building: build again from the current state
+                    self._rebuild_index()
+
+            try:
+                self.view.root.after(0, _install)
+            except Exception:
+                pass
+
+        self._submit(_build)
+
+    def _invalidate_index(self):
+        # the cache changed in a way the index cannot be patched for (new list, reorder)
+        self._books_generation += 1
+        if self._index is not None:
+            self._index = None
+            self._rebuild_index()
+
+    def _schedule_cache_save(self):
         try:
-            self._executor.submit(_fetch)
+            if self._cache_save_after is not None:
+                self.view.root.after_cancel(self._cache_save_after)
+            self._cache_save_after = self.view.root.after(self.CACHE_SAVE_DELAY_MS, self._save_cache)
         except Exception:
-            # fallback to thread
-            threading = __import__('threading')
-            threading.Thread(target=_fetch, daemon=True).start()
+            self._cache_save_after = None
+
+    def _save_cache(self):
+        self._cache_save_after = None
+        if self._version is None:
+            # never got a consistent snapshot from the server
+            return
+        if self._pending:
+            # the list holds unconfirmed results (and placeholder ids) that are not the
+            # server's state at _version: save once the last pending action is answered
+            self._cache_save_deferred = True
+            return
+        self._cache_save_deferred = False
+        books = list(self._books)
+        version = self._version
+        # the ETag is only valid for the exact version it was issued for
+        etag, etag_version = self.model.books_validator()
+        if etag_version != version:
+            etag = None
+
+        def _write():
+            try:
+                self._disk_cache.save(books, version, etag)
+            except Exception:
+                traceback.print_exc()
+
+        self._submit(_write)
+
+    def load_books(self):
+        # Full reload in the background; concurrent requests are coalesced
+        self.view.set_status('Загрузка...')
+        self._fetches.request(full=True)
+
+    def sync_books(self):
+        # Bring the cache up to date by applying only server-side deltas;
+        # fall back to a full load when there is no baseline or the gap is too large
+        self._fetches.request(full=self._version is None)
+
+    def fetch_stats(self):
+        """Counters of the fetch scheduler (requested/started/coalesced/dropped/applied)."""
+        return dict(self._fetches.stats)
+
+    def _fetch_books(self, kind):
+        # worker thread; _version only changes when a fetch is applied, and only
+        # one fetch runs at a time, so reading it here is safe
+        if kind == FULL or self._version is None:
+            try:
+                return FULL, self.model.get_books_with_version()
+            except Exception:
+                traceback.print_exc()
+                return FULL, ([], None)
+        return kind, self.model.get_changes(self._version)
+
+    def _apply_fetched(self, kind, result):
+        # _fetch_books may have turned a sync into a full load (no baseline yet)
+        kind, result = result if result is not None else (kind, None)
+        if kind == FULL:
+            books, version = result or ([], None)
+            if version is None and not books and self._books:
+                # server unreachable: keep showing the cached snapshot
+                self.view.set_status(f'Сервер недоступен, показаны сохранённые данные: {len(self._books)}')
+            else:
+                self._set_books(books, version)
+                self.view.set_status(f'Загружено записей: {len(books)}')
+            return
+        if result is None or result.get('reset'):
+            self.load_books()
+            return
+        if self._version is not None and result.get('version', 0) > self._version:
+            self._apply_changes(result.get('changes') or [])
+            self._version = result['version']
+            self._reapply_pending()
+            self.filter_and_show()
+            self._schedule_cache_save()
+        self.view.set_status(f'Загружено записей: {len(self._books)}')
+
+    def _apply_changes(self, changes):
+        # Upserts replace the cached record (never mutate it in place), new ids are appended
+        # (ids grow, so server order is kept), tombstones drop the book from the cache.
+        # a filter pass on a worker may be reading the cache, the index or the sorter
+        self._abort_filter()
+        deleted = set()
+        index = self._index
+        for change in changes:
+            book_id = change.get('id')
+            if change.get('op') == 'delete':
+                deleted.add(book_id)
+                if index is not None:
+                    index.remove(book_id)
+                self._sorter.remove(book_id)
+                continue
+            book = self._books.upsert(change['book'])
+            if index is not None:
+                index.upsert(book)
+            self._sorter.upsert(book)
+        if deleted:
+            self._books.remove_ids(deleted)
+        # a pending index rebuild sees the bump and starts over with these changes
+        self._books_generation += 1
+
+    # Optimistic actions: the expected result is shown at once, the server answers later
+    def _find_book(self, book_id):
+        i = self._books.index_of(book_id)
+        if i is None:
+            return None, None
+        return i, self._books[i]
+
+    def _begin_optimistic(self, action, book_id, name='', show=True):
+        # Record and apply the expected result; None if it cannot be predicted
+        # (unknown book, or an action the server would refuse). show=False leaves
+        # re-rendering to the caller (e.g. once for many books)
+        index, book = self._find_book(book_id)
+        after = expected_state(book, action, name)
+        if after is None:
+            return None
+        op = {'id': book.get('id'), 'action': action, 'name': name, 'before': book, 'index': index, 'after': after}
+        self._pending.append(op)
+        self._apply_optimistic(op)
+        if show:
+            self.filter_and_show()
+        return op
+
+    def _apply_optimistic(self, op):
+        if op['after'] is DELETED:
+            self._apply_changes([{'op': 'delete', 'id': op['id']}])
+        else:
+            self._apply_changes([{'op': 'upsert', 'id': op['id'], 'book': op['after']}])
+            # the store keeps its own record: _end_optimistic checks for that very object
+            op['after'] = self._books.get(op['id'])
+
+    def _end_optimistic(self, op, ok, show=True):
+        # On failure undo just this action, and only if nothing replaced its result since
+        if op is None:
+            return
+        try:
+            self._pending.remove(op)
+        except ValueError:
+            return
+        if not self._pending and self._cache_save_deferred:
+            self._schedule_cache_save()
+        if ok:
+            return
+        index, current = self._find_book(op['id'])
+        if op['action'] == 'add':
+            if current is not None:
+                self._apply_changes([{'op': 'delete', 'id': op['id']}])
+        elif op['after'] is DELETED:
+            if current is None:
+                self._restore_book(op['before'], op['index'])
+        elif current is op['after']:
+            self._apply_changes([{'op': 'upsert', 'id': op['id'], 'book': op['before']}])
+        if show:
+            self.filter_and_show()
+
+    def _restore_book(self, book, index):
+        # put a book back where it was (appending would change the cache order)
+        self._abort_filter()
+        self._sorter.upsert(self._books.insert(index, book))
+        self._invalidate_index()
+
+    def _reapply_pending(self):
+        # Fresh server data replaced the optimistic results: apply the still pending
+        # actions on top of it. Actions the server already performed predict nothing.
+        for op in self._pending:
+            index, current = self._find_book(op['id'])
+            if op['action'] == 'add':
+                if current is None:
+                    self._apply_optimistic(op)
+                continue
+            after = expected_state(current, op['action'], op['name'])
+            if after is None:
+                continue
+            op.update(before=current, index=index, after=after)
+            self._apply_optimistic(op)
+
+    def _run_action(self, op, work, done_text, error_text, error_status):
+        # Send one action in the background; any number may be in flight at once.
+        # Afterwards the cache is reconciled with the server through the change log.
+        def _work():
+            try:
+                ok = work()
+            except Exception:
+                traceback.print_exc()
+                ok = False
+
+            def _finish():
+                self._end_optimistic(op, ok)
+                if ok:
+                    self.view.set_status(done_text)
+                else:
+                    messagebox.showerror('Ошибка', error_text)
+                    self.view.set_status(error_status)
+                self.sync_books()
+
+            self.view.root.after(0, _finish)
+
+        self._submit(_work)
 
     def on_item_double_click(self, book_id):
         # Открыть окно действий для выбранной книги
@@ -95,7 +447,7 @@ class MainController:
 
     # Search / filter / refresh / sort helpers
     def refresh(self):
-        self.load_books()
+        self.sync_books()
 
     def _matches_filter(self, book, text: str, status_filter: str):
         if text:
@@ -111,58 +463,175 @@ class MainController:
                 return False
         return True
 
+    def _render_books(self, books):
+        # Reconcile the list with `books`: only rows that appeared, disappeared, changed
+        # or moved are touched. Large lists are rendered virtually (only the visible slice).
+        # The view applies the diff in time slices; a newer render cuts it short and
+        # diffs against the rows that actually made it to the screen.
+        self._shown = books
+        shown = self._cancel_render()
+        rows = BookRows(books)
+        if len(rows) > self.view.VIRTUAL_THRESHOLD:
+            self._tree_rows = {}
+            self.view.show_virtual_rows(rows)
+            return
+        new_rows = {iid: (values, tag) for iid, values, tag in rows}
+        diff = diff_rows(shown, new_rows)
+        self._tree_rows = new_rows
+        rendering = self._rendering = (shown, diff)
+
+        def _done():
+            if self._rendering is rendering:
+                self._rendering = None
+
+        self.view.apply_row_diff(diff, on_done=_done)
+
+    def _cancel_render(self):
+        # the rows on screen once the diff being applied (if any) is stopped
+        rendering, self._rendering = self._rendering, None
+        if rendering is None:
+            return self._tree_rows
+        done = self.view.cancel_row_diff()
+        if done is None:
+            return self._tree_rows
+        return apply_diff(rendering[0], rendering[1], done)
+
+    def _abort_filter(self):
+        if self._filter_token is not None:
+            self._filter_token.cancel()
+            self._filter_token = None
+
+    def _on_search_input(self):
+        # a keystroke makes the running pass stale: stop computing and rendering it now,
+        # the debounced search starts a new one
+        self._abort_filter()
+        self._tree_rows = self._cancel_render()
+
+    def _run_filter(self, compute, show):
+        # Run `compute(token)` on a worker and `show(result)` on the Tk thread, unless a
+        # newer pass, a keystroke or a cache change cancelled the token meanwhile.
+        # Small caches are filtered inline.
+        self._abort_filter()
+        token = self._filter_token = CancelToken()
+
+        def _show(result):
+            if token.cancelled:
+                return
+            self._filter_token = None
+            show(result)
+
+        if len(self._books) <= self.INLINE_FILTER_LIMIT:
+            _show(compute(token))
+            return
+
+        def _work():
+            try:
+                result = compute(token)
+            except Cancelled:
+                return
+            except Exception:
+                # a cancelled pass may trip over the cache being changed under it
+                if not token.cancelled:
+                    traceback.print_exc()
+                return
+            try:
+                self.view.root.after(0, lambda: _show(result))
+            except Exception:
+                pass
+
+        self._submit(_work)
+
     def filter_and_show(self):
         # read filters from view and apply client-side
-        tree = self.view.book_list
-        for item in tree.get_children():
-            tree.delete(item)
         # use cached copy to avoid network calls on every keystroke
-        all_books = list(self._books)
+        # the trigram index gives the same result as _matches_filter over the cache;
+        # the active sort is re-applied so it survives refreshes
         text = self.view.search_entry.get().strip()
         status_f = self.view.status_filter.get().strip()
-        filtered = [b for b in all_books if self._matches_filter(b, text, status_f)]
-        for book in filtered:
-            status = (book.get('status') or '').lower()
-            tag = 'available'
-            if 'выдан' in status or 'выдана' in status:
-                tag = 'issued'
-            elif 'зарезерв' in status:
-                tag = 'reserved'
-            tree.insert('', tk.END, values=(book.get('id'), book.get('title'), book.get('author'), book.get('status', 'неизвестно'), book.get('reserved_by') or ''), tags=(tag,))
-        self.view.set_status(f'Загружено записей: {len(filtered)} (из {len(all_books)})')
+        index, books, sorter, spec = self._index, self._books, self._sorter, list(self._sort_spec)
+
+        def _compute(token):
+            if index is not None:
+                filtered = index.search(text, status_f, cancel=token)
+            else:
+                filtered = []
+                for n, book in enumerate(books):
+                    if not n % token.CHUNK:
+                        token.check()
+                    if self._matches_filter(book, text, status_f):
+                        filtered.append(book)
+            return sorter.order(filtered, spec, cancel=token)
+
+        def _show(filtered):
+            self._render_books(filtered)
+            self.view.set_status(f'Загружено записей: {len(filtered)} (из {len(self._books)})')
+
+        self._run_filter(_compute, _show)
 
     def _on_search(self):
-        # Debounce/simple immediate filter
+        # Debounce/simple immediate filter; very large catalogs are searched on the server
         try:
-            self.filter_and_show()
+            text = self.view.search_entry.get().strip()
+            if text and len(self._books) > self.LOCAL_FILTER_LIMIT:
+                self.remote_search(text, self.view.status_filter.get().strip())
+            else:
+                self.filter_and_show()
         except Exception:
             pass
 
-    def sort_by_column(self, column: str):
-        # Simple toggle sort on client-side data
-        tree = self.view.book_list
-        data = [tree.item(i, 'values') for i in tree.get_children('')]
-        # find index of column
-        col_index = {'id':0,'title':1,'author':2,'status':3,'reserved_by':4}.get(column, 0)
-        # determine current order
-        ascending = getattr(self, '_sort_asc', True)
+    def remote_search(self, text, status_f):
+        def _fetch():
+            try:
+                books = self.model.search_books(text, status_f, limit=self.REMOTE_SEARCH_LIMIT)
+            except Exception:
+                traceback.print_exc()
+                books = None
+
+            def _update_ui():
+                # drop the result if the user has typed something else meanwhile
+                if self.view.search_entry.get().strip() != text:
+                    return
+                # a local pass started before must not replace the server's answer
+                self._abort_filter()
+                if books is None:
+                    # server search unavailable: fall back to scanning the cache
+                    self.filter_and_show()
+                    return
+                self._render_books(books)
+                self.view.set_status(f'Найдено (лучшие совпадения): {len(books)} (из {len(self._books)})')
+
+            try:
+                self.view.root.after(0, _update_ui)
+            except Exception:
+                pass
+
+        self._submit(_fetch)
+
+    def sort_by_column(self, column: str, add: bool = False):
+        # Click on a heading sorts by that column (a second click reverses it);
+        # with add=True (Shift+click) the column becomes an extra sort key instead
+        spec = list(self._sort_spec)
+        if add:
+            for i, (c, ascending) in enumerate(spec):
+                if c == column:
+                    spec[i] = (c, not ascending)
+                    break
+            else:
+                spec.append((column, True))
+        else:
+            ascending = not spec[0][1] if spec and spec[0][0] == column else True
+            spec = [(column, ascending)]
+        self._sort_spec = spec
         try:
-            data.sort(key=lambda r: (r[col_index] or '').lower(), reverse=not ascending)
+            self.view.set_sort_indicator(spec)
         except Exception:
-            data.sort(key=lambda r: r[col_index], reverse=not ascending)
-        # reinsert
-        for item in tree.get_children(''):
-            tree.delete(item)
-        for row in data:
-            # determine tag again
-            status = (row[3] or '').lower()
-            tag = 'available'
-            if 'выдан' in status or 'выдана' in status:
-                tag = 'issued'
-            elif 'зарезерв' in status:
-                tag = 'reserved'
-            tree.insert('', tk.END, values=row, tags=(tag,))
-        self._sort_asc = not ascending
+            pass
+        if self._filter_token is not None:
+            # a filter pass is running: let it sort its result with the new spec
+            self.filter_and_show()
+            return
+        shown, sorter = self._shown, self._sorter
+        self._run_filter(lambda token: sorter.order(shown, spec, cancel=token), self._render_books)
 
     def _on_menu_action(self, action, book_id):
         # action: 'issue'|'return'|'reserve'|'delete'
@@ -209,128 +678,115 @@ class MainController:
 
     # Helper methods that operate directly with model (used by actions window)
     def perform_issue(self, book_id, name=""):
-        def _work():
-            try:
-                ok = self.model.issue_book_by_id(book_id, name)
-            except Exception:
-                traceback.print_exc()
-                ok = False
-
-            def _finish():
-                if ok:
-                    self.view.set_status('Книга выдана')
-                    self.load_books()
-                else:
-                    messagebox.showerror('Ошибка', 'Не удалось выдать книгу')
-                    self.view.set_status('Ошибка при выдаче')
-                try:
-                    self.view.set_busy(False)
-                except Exception:
-                    pass
-
-            self.view.root.after(0, _finish)
-
-        try:
-            self.view.set_busy(True, 'Выдача...')
-        except Exception:
-            pass
-        try:
-            self._executor.submit(_work)
-        except Exception:
-            threading.Thread(target=_work, daemon=True).start()
+        if self._is_placeholder(book_id):
+            return
+        op = self._begin_optimistic('issue', book_id, name)
+        self.view.set_status('Выдача...')
+        self._run_action(op, lambda: self.model.issue_book_by_id(book_id, name),
+                         'Книга выдана', 'Не удалось выдать книгу', 'Ошибка при выдаче')
 
     def perform_return(self, book_id):
-        def _work():
-            try:
-                ok = self.model.return_book_by_id(book_id)
-            except Exception:
-                traceback.print_exc()
-                ok = False
-
-            def _finish():
-                if ok:
-                    self.view.set_status('Книга возвращена')
-                    self.load_books()
-                else:
-                    messagebox.showerror('Ошибка', 'Не удалось вернуть книгу')
-                    self.view.set_status('Ошибка при возврате')
-                try:
-                    self.view.set_busy(False)
-                except Exception:
-                    pass
-
-            self.view.root.after(0, _finish)
-
-        try:
-            self.view.set_busy(True, 'Возврат...')
-        except Exception:
-            pass
-        try:
-            self._executor.submit(_work)
-        except Exception:
-            threading.Thread(target=_work, daemon=True).start()
+        if self._is_placeholder(book_id):
+            return
+        op = self._begin_optimistic('return', book_id)
+        self.view.set_status('Возврат...')
+        self._run_action(op, lambda: self.model.return_book_by_id(book_id),
+                         'Книга возвращена', 'Не удалось вернуть книгу', 'Ошибка при возврате')
 
     def perform_reserve(self, book_id, name):
-        def _work():
-            try:
-                ok = self.model.reserve_book_by_id(book_id, name)
-            except Exception:
-                traceback.print_exc()
-                ok = False
+        if self._is_placeholder(book_id):
+            return
+        op = self._begin_optimistic('reserve', book_id, name)
+        self.view.set_status('Резервирование...')
+        self._run_action(op, lambda: self.model.reserve_book_by_id(book_id, name),
+                         'Книга зарезервирована', 'Не удалось зарезервировать книгу', 'Ошибка при резервировании')
 
-            def _finish():
-                if ok:
-                    self.view.set_status('Книга зарезервирована')
-                    self.load_books()
-                else:
-                    messagebox.showerror('Ошибка', 'Не удалось зарезервировать книгу')
-                    self.view.set_status('Ошибка при резервировании')
-                try:
-                    self.view.set_busy(False)
-                except Exception:
-                    pass
+    def perform_delete(self, book_id):
+        if self._is_placeholder(book_id):
+            return
+        op = self._begin_optimistic('delete', book_id)
+        self.view.set_status('Удаление...')
+        self._run_action(op, lambda: self.model.delete_book_by_id(book_id),
+                         'Книга удалена', 'Не удалось удалить книгу', 'Ошибка при удалении')
+
+    def perform_bulk(self, action, book_ids, name=''):
+        """Apply one action ('issue'|'return'|'reserve'|'delete') to many books, e.g. a stack
+        of scanned ids entered in one of the action dialogs. Every book is shown changed at
+        once; the books go to POST /books/batch, BULK_BATCH_SIZE per request (chunks in
+        parallel through the asyncio model when it is available), and the ones the server
+        refused are rolled back individually.
+        """
+        book_ids = [b for b in book_ids if not self._is_placeholder(b)]
+        if not book_ids:
+            return
+        ops = [self._begin_optimistic(action, book_id, name, show=False) for book_id in book_ids]
+        self.filter_and_show()
+        self.view.set_status(f'Отправка: {len(book_ids)}...')
+        operations = [{'op': action, 'id': int(book_id), 'name': name} for book_id in book_ids]
+        chunks = [operations[i:i + self.BULK_BATCH_SIZE] for i in range(0, len(operations), self.BULK_BATCH_SIZE)]
+
+        def _finish(chunk_results):
+            results = []
+            for chunk, answer in zip(chunks, chunk_results or [None] * len(chunks)):
+                # None: the request failed as a whole (network, 409), so did every book in it
+                results += [r.get('status') == 200 for r in answer] if answer else [False] * len(chunk)
+            for op, ok in zip(ops, results):
+                self._end_optimistic(op, ok, show=False)
+            self.filter_and_show()
+            failed = results.count(False)
+            if failed:
+                messagebox.showerror('Ошибка', f'Не удалось выполнить для {failed} из {len(book_ids)} книг')
+            self.view.set_status(f'Выполнено: {len(book_ids) - failed} из {len(book_ids)}')
+            self.sync_books()
 
-            self.view.root.after(0, _finish)
+        if self._async is not None:
+            model = self.async_model
 
-        try:
-            self.view.set_busy(True, 'Резервирование...')
-        except Exception:
-            pass
-        try:
-            self._executor.submit(_work)
-        except Exception:
-            threading.Thread(target=_work, daemon=True).start()
+            async def _send():
+                return await asyncio.gather(*(model.batch(chunk) for chunk in chunks))
 
-    def perform_delete(self, book_id):
-        def _work():
+            self._async.submit(_send(), _finish)
+            return
+        # no aiohttp: one executor task per chunk
+        results = [None] * len(chunks)
+        remaining = [len(chunks)]
+
+        def _one(i, chunk):
             try:
-                ok = self.model.delete_book_by_id(book_id)
+                answer = self.model.batch(chunk)
             except Exception:
                 traceback.print_exc()
-                ok = False
-
-            def _finish():
-                if ok:
-                    self.view.set_status('Книга удалена')
-                    self.load_books()
-                else:
-                    messagebox.showerror('Ошибка', 'Не удалось удалить книгу')
-                    self.view.set_status('Ошибка при удалении')
-                try:
-                    self.view.set_busy(False)
-                except Exception:
-                    pass
-
-            self.view.root.after(0, _finish)
-
+                answer = None
+
+            def _done():
+                results[i] = answer
+                remaining[0] -= 1
+                if not remaining[0]:
+                    _finish(results)
+
+            self.view.root.after(0, _done)
+
+        for i, chunk in enumerate(chunks):
+            self._submit(lambda i=i, chunk=chunk: _one(i, chunk))
+
+    @staticmethod
+    def _parse_ids(text):
+        """Book ids typed or scanned into an action dialog: one or several, separated by
+        spaces, commas or semicolons. Raises ValueError for anything that is not an id."""
+        ids = text.replace(',', ' ').replace(';', ' ').split()
+        for book_id in ids:
+            int(book_id)
+        return ids
+
+    def _is_placeholder(self, book_id):
+        # a book that is still being added has no server id yet
         try:
-            self.view.set_busy(True, 'Удаление...')
-        except Exception:
-            pass
-        try:
-            self._executor.submit(_work)
-        except Exception:
-            threading.Thread(target=_work, daemon=True).start()
+            placeholder = int(book_id) < 0
+        except (TypeError, ValueError):
+            return False
+        if placeholder:
+            self.view.set_status('Книга ещё сохраняется на сервере')
+        return placeholder
 
     def add_book(self):
         # Read current inputs and validate
@@ -369,6 +825,15 @@ class MainController:
         except Exception:
             pass
 
+        # show the new book right away under a placeholder id until the server assigns one
+        placeholder = {'id': self._next_placeholder_id, 'title': send_title, 'author': send_author,
+                       'status': 'доступна', 'reserved_by': None}
+        self._next_placeholder_id -= 1
+        op = {'id': placeholder['id'], 'action': 'add', 'name': '', 'before': None, 'index': None, 'after': placeholder}
+        self._pending.append(op)
+        self._apply_optimistic(op)
+        self.filter_and_show()
+
         def _work():
             try:
                 result = self.model.add_book(send_title, send_author)
@@ -377,9 +842,17 @@ class MainController:
                 result = None
 
             def _finish():
+                self._end_optimistic(op, bool(result))
                 if result:
+                    # swap the placeholder for the book under its real id
+                    changes = [{'op': 'delete', 'id': placeholder['id']}]
+                    if result.get('id') is not None:
+                        book = dict(placeholder, id=result['id'])
+                        changes.append({'op': 'upsert', 'id': book['id'], 'book': book})
+                    self._apply_changes(changes)
+                    self.filter_and_show()
                     self.view.set_status('Книга добавлена')
-                    self.load_books()
+                    self.sync_books()
                 else:
                     # restore inputs so user can retry
                     try:
@@ -392,44 +865,30 @@ class MainController:
                         pass
                     messagebox.showerror('Ошибка', 'Не удалось добавить книгу')
                     self.view.set_status('Ошибка при добавлении')
-                try:
-                    self.view.set_busy(False)
-                except Exception:
-                    pass
 
             self.view.root.after(0, _finish)
 
-        try:
-            self.view.set_busy(True, 'Добавление...')
-        except Exception:
-            pass
-        try:
-            self._executor.submit(_work)
-        except Exception:
-            threading.Thread(target=_work, daemon=True).start()
+        self.view.set_status('Добавление...')
+        self._submit(_work)
 
     def open_delete_window(self):
         delete_window = tk.Toplevel()
         delete_window.title("Удалить книгу")
         delete_window.geometry("300x150")
-        tk.Label(delete_window, text="Введите ID книги для удаления:").pack(pady=5)
+        tk.Label(delete_window, text="Введите ID книги (или несколько через пробел):").pack(pady=5)
         id_entry = tk.Entry(delete_window)
         id_entry.pack(pady=5)
         tk.Button(delete_window, text="Удалить", 
                   command=lambda: self.confirm_delete(id_entry, delete_window)).pack(pady=5)
 
     def confirm_delete(self, id_entry, window):
-        book_id = id_entry.get().strip()
-        if book_id:
-            # use async delete to avoid blocking UI
-            self.perform_delete(book_id)
-        window.destroy()
+        self._confirm_action('delete', id_entry, window)
 
     def open_issue_window(self):
         issue_window = tk.Toplevel()
         issue_window.title("Выдать книгу")
         issue_window.geometry("300x200")
-        tk.Label(issue_window, text="Введите ID книги для выдачи:").pack(pady=5)
+        tk.Label(issue_window, text="Введите ID книги (или несколько через пробел):").pack(pady=5)
         id_entry = tk.Entry(issue_window)
         id_entry.pack(pady=5)
         tk.Label(issue_window, text="Введите имя (если книга зарезервирована):").pack(pady=5)
@@ -439,33 +898,26 @@ class MainController:
                   command=lambda: self.confirm_issue(id_entry, name_entry, issue_window)).pack(pady=5)
 
     def confirm_issue(self, id_entry, name_entry, window):
-        book_id = id_entry.get().strip()
-        name = name_entry.get().strip()
-        if book_id:
-            self.perform_issue(book_id, name)
-        window.destroy()
+        self._confirm_action('issue', id_entry, window, name_entry.get().strip())
 
     def open_return_window(self):
         return_window = tk.Toplevel()
         return_window.title("Вернуть книгу")
         return_window.geometry("300x150")
-        tk.Label(return_window, text="Введите ID книги для возврата:").pack(pady=5)
+        tk.Label(return_window, text="Введите ID книги (или несколько через пробел):").pack(pady=5)
         id_entry = tk.Entry(return_window)
         id_entry.pack(pady=5)
         tk.Button(return_window, text="Вернуть", 
                   command=lambda: self.confirm_return(id_entry, return_window)).pack(pady=5)
 
     def confirm_return(self, id_entry, window):
-        book_id = id_entry.get().strip()
-        if book_id:
-            self.perform_return(book_id)
-        window.destroy()
+        self._confirm_action('return', id_entry, window)
 
     def open_reserve_window(self):
         reserve_window = tk.Toplevel()
         reserve_window.title("Резервировать книгу")
         reserve_window.geometry("300x200")
-        tk.Label(reserve_window, text="Введите ID книги для резервирования:").pack(pady=5)
+        tk.Label(reserve_window, text="Введите ID книги (или несколько через пробел):").pack(pady=5)
         id_entry = tk.Entry(reserve_window)
         id_entry.pack(pady=5)
         tk.Label(reserve_window, text="Введите имя для резервирования:").pack(pady=5)
@@ -475,8 +927,29 @@ class MainController:
                   command=lambda: self.confirm_reserve(id_entry, name_entry, reserve_window)).pack(pady=5)
 
     def confirm_reserve(self, id_entry, name_entry, window):
-        book_id = id_entry.get().strip()
         name = name_entry.get().strip()
-        if book_id and name:
-            self.perform_reserve(book_id, name)
+        if name:
+            self._confirm_action('reserve', id_entry, window, name)
+        else:
+            window.destroy()
+
+    def _confirm_action(self, action, id_entry, window, name=''):
+        # one id goes through the single-book endpoint, several (a scanned stack) as a batch
+        try:
+            book_ids = self._parse_ids(id_entry.get())
+        except ValueError:
+            messagebox.showwarning('Ввод', 'ID книги должен быть числом')
+            return
         window.destroy()
+        if not book_ids:
+            return
+        if len(book_ids) > 1:
+            self.perform_bulk(action, book_ids, name)
+        elif action == 'issue':
+            self.perform_issue(book_ids[0], name)
+        elif action == 'reserve':
+            self.perform_reserve(book_ids[0], name)
+        elif action == 'return':
+            self.perform_return(book_ids[0])
+        else:
+            self.perform_delete(book_ids[0])
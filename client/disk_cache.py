@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import tempfile
+import time
+try:
+    from book_store import BookStore
+except ImportError:
+    from .book_store import BookStore
+
+FIELDS = ('id', 'title', 'author', 'status', 'reserved_by')
+# bump when the file layout changes: older files are then ignored
+FORMAT = '1'
+
+
+def default_cache_path(base_url):
+    """Per-user cache file, one per server (LIBRARY_CLIENT_CACHE overrides it)."""
+    path = os.environ.get('LIBRARY_CLIENT_CACHE')
+    if path:
+        return path
+    root = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    name = ''.join(c if c.isalnum() else '_' for c in base_url.split('://')[-1])
+    return os.path.join(root, 'library-client', f'books-{name}.sqlite')
+
+
+class DiskCache:
+    """Snapshot of the book list on disk, so the client can show rows before the network answers.
+
+    The snapshot is a small SQLite file with the books in display order plus the
+    server change-log version and ETag they correspond to; after loading it the
+    controller revalidates in the background (deltas since that version, or a
+    conditional GET). Each write goes to its own temporary file that replaces the old
+    one with os.replace, so a crash or two overlapping saves never leave a half-written
+    cache. Writing stops as soon as a snapshot outgrows `max_bytes`; such snapshots are
+    not kept.
+    """
+
+    def __init__(self, path, base_url, max_bytes=128 * 1024 * 1024):
+        self.path = path
+        self.base_url = base_url
+        self.max_bytes = max_bytes
+
+    def load(self, limit=None):
+        """Return {'books' (a BookStore), 'count', 'version', 'etag', 'saved_at'} or None if there is no usable snapshot.
+
+        With `limit` only the first `limit` books are read (`count` is still the total),
+        which is enough to fill the first screen while the rest is loading.
+        """
+        if not os.path.exists(self.path):
+            return None
+        try:
+            conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+            try:
+                meta = dict(conn.execute('SELECT key, value FROM meta'))
+                if meta.get('format') != FORMAT or meta.get('base_url') != self.base_url:
+                    return None
+                sql = f'SELECT {", ".join(FIELDS)} FROM books ORDER BY pos'
+                if limit is not None:
+                    rows = conn.execute(sql + ' LIMIT ?', (limit,)).fetchall()
+                    count = conn.execute('SELECT count(*) FROM books').fetchone()[0]
+                else:
+                    rows = conn.execute(sql).fetchall()
+                    count = len(rows)
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return None
+        version = meta.get('version')
+        return {
+            # rows go straight into the store, no dict per book
+            'books': BookStore.from_rows(rows),
+            'count': count,
+            'version': int(version) if version else None,
+            'etag': meta.get('etag') or None,
+            'saved_at': float(meta.get('saved_at') or 0),
+        }
+
+    def save(self, books, version, etag=None):
+        """Atomically replace the snapshot; returns False if it was not written."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # a unique name per save: saves run on a worker pool and may overlap
+        try:
+            fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.path) + '.', suffix='.tmp',
+                                       dir=directory or None)
+            os.close(fd)
+        except OSError:
+            return False
+        try:
+            conn = sqlite3.connect(tmp)
+            try:
+                conn.execute('PRAGMA journal_mode=OFF')
+                conn.execute('PRAGMA synchronous=OFF')
+                # the file cannot grow past max_bytes: inserts fail with SQLITE_FULL instead
+                page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+                conn.execute(f'PRAGMA max_page_count={max(1, self.max_bytes // page_size)}')
+                conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+                conn.execute('CREATE TABLE books (pos INTEGER PRIMARY KEY, id INTEGER, title TEXT, '
+                             'author TEXT, status TEXT, reserved_by TEXT)')
+                conn.executemany(
+                    'INSERT INTO books VALUES (?, ?, ?, ?, ?, ?)',
+                    ((pos, b.get('id'), b.get('title'), b.get('author'), b.get('status'), b.get('reserved_by'))
+                     for pos, b in enumerate(books)))
+                meta = {'format': FORMAT, 'base_url': self.base_url, 'saved_at': str(time.time()),
+                        'version': '' if version is None else str(version), 'etag': etag or ''}
+                conn.executemany('INSERT INTO meta VALUES (?, ?)', meta.items())
+                conn.commit()
+            finally:
+                conn.close()
+            os.replace(tmp, self.path)
+            return True
+        except sqlite3.OperationalError as e:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            if 'full' in str(e):
+                # too big to be worth keeping: drop the stale snapshot as well
+                self.clear()
+            return False
+        except (OSError, sqlite3.Error):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,84 @@
+import traceback
+
+FULL = 'full'
+SYNC = 'sync'
+
+
+class FetchScheduler:
+    """Serializes cache refreshes: at most one fetch in flight plus one trailing fetch.
+
+    `request(full)` while a fetch is running only marks a trailing fetch (a full load
+    wins over a sync), so a burst of refresh clicks or finished actions costs at most
+    two round trips. `fetch(kind)` runs through `submit` (a worker), its result is
+    handed to `apply(kind, result)` through `call_soon` (the Tk thread); all other
+    methods are called on the Tk thread.
+
+    Every fetch gets a generation number. A result whose generation is not newer than
+    the last applied one, or that was started before `invalidate()`, is dropped.
+    `stats` counts requests, started fetches, coalesced requests (absorbed by an
+    already queued trailing fetch) and dropped results.
+    """
+
+    def __init__(self, submit, call_soon, fetch, apply):
+        self._submit = submit
+        self._call_soon = call_soon
+        self._fetch = fetch
+        self._apply = apply
+        self.generation = 0
+        self.applied = 0
+        self._running = False
+        self._trailing = None
+        self.stats = {'requested': 0, 'started': 0, 'coalesced': 0, 'dropped': 0, 'applied': 0}
+
+    @property
+    def busy(self):
+        return self._running
+
+    def request(self, full=False):
+        self.stats['requested'] += 1
+        kind = FULL if full else SYNC
+        if not self._running:
+            self._start(kind)
+            return
+        if self._trailing is not None:
+            self.stats['coalesced'] += 1
+        self._trailing = FULL if FULL in (kind, self._trailing) else SYNC
+
+    def invalidate(self):
+        # the cache was replaced by other means: results of fetches started so far are stale
+        self.applied = self.generation
+
+    def _start(self, kind):
+        self._running = True
+        self.generation += 1
+        self.stats['started'] += 1
+        generation = self.generation
+
+        def _work():
+            try:
+                result = self._fetch(kind)
+            except Exception:
+                traceback.print_exc()
+                result = None
+            self._call_soon(lambda: self._done(generation, kind, result))
+
+        self._submit(_work)
+
+    def _done(self, generation, kind, result):
+        self._running = False
+        if generation <= self.applied:
+            self.stats['dropped'] += 1
+        else:
+            self.applied = generation
+            self.stats['applied'] += 1
+            try:
+                # may call request() itself, e.g. a sync asking for a full load
+                self._apply(kind, result)
+            except Exception:
+                traceback.print_exc()
+        trailing, self._trailing = self._trailing, None
+        if trailing is not None:
+            if self._running:
+                self._trailing = trailing
+            else:
+                self._start(trailing)
@@ -1,28 +1,187 @@
+import threading
+import time
+from collections import deque
+
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+try:
+    from book_store import BookStore
+except ImportError:
+    from .book_store import BookStore
+
+
+# compact column-oriented /books representation (status is dictionary-encoded)
+COLUMNAR_MIMETYPE = 'application/vnd.library.columnar+json'
+
+
+class _TimedSession(requests.Session):
+    """Session that reports every response together with the time until its body was read."""
+
+    def __init__(self, on_response):
+        super().__init__()
+        self._on_response = on_response
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        resp = super().send(request, **kwargs)
+        # without stream=True send() returns after reading the body
+        if not kwargs.get('stream'):
+            self._on_response(resp, time.perf_counter() - start)
+        return resp
 
 
 class BookModel:
     BASE_URL = 'http://localhost:5000'  # Адрес сервера
+    # how many recent request timings to keep (see recent_timings())
+    TIMINGS_KEEP = 500
 
-    def __init__(self, timeout: int = 5):
+    def __init__(self, timeout: int = 5, trace: bool = False):
         # session with retries and connection pooling
         self.timeout = timeout
-        self.session = requests.Session()
+        self.session = _TimedSession(self._record_timing)
         retries = Retry(total=3, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504))
         adapter = HTTPAdapter(max_retries=retries, pool_maxsize=10)
         self.session.mount('http://', adapter)
         self.session.mount('https://', adapter)
+        # per-request timings: client latency plus the server's Server-Timing, if any;
+        # trace=True asks the server to trace every request (honoured with TRACE_HEADER=1)
+        if trace:
+            self.session.headers['X-Request-Trace'] = '1'
+        self._timings = deque(maxlen=self.TIMINGS_KEEP)
+        self._timings_lock = threading.Lock()
+        # last full /books response, revalidated with If-None-Match
+        self._books_lock = threading.Lock()
+        self._books_etag = None
+        self._books_cache = BookStore()
+        self._books_version = None
+
+    def _record_timing(self, resp, elapsed):
+        try:
+            entry = {
+                'method': resp.request.method,
+                'path': resp.request.path_url,
+                'status': resp.status_code,
+                # the whole call, body included (a streamed list is mostly body)
+                'client_ms': elapsed * 1000,
+                # until the response headers arrived
+                'headers_ms': resp.elapsed.total_seconds() * 1000,
+                'server': parse_server_timing(resp.headers.get('Server-Timing')),
+            }
+        except Exception:
+            return
+        with self._timings_lock:
+            self._timings.append(entry)
+
+    def recent_timings(self):
+        """The last TIMINGS_KEEP requests, oldest first: dicts with method, path, status,
+        client_ms (until the body was read), headers_ms (until the headers arrived) and
+        server ({'db': ms, 'serialize': ms, 'total': ms} when the server traced it)."""
+        with self._timings_lock:
+            return list(self._timings)
 
     def get_books(self):
+        return self.get_books_with_version()[0]
+
+    def get_books_with_version(self):
+        """Return (books, version) where version is the server change-log version
+        the list corresponds to (None if the server did not report it)."""
+        with self._books_lock:
+            etag = self._books_etag
+        # prefer the columnar form; requests negotiates gzip (br/zstd if installed) itself
+        headers = {'Accept': f'{COLUMNAR_MIMETYPE}, application/json;q=0.5'}
+        if etag:
+            headers['If-None-Match'] = etag
+        try:
+            resp = self.session.get(f'{self.BASE_URL}/books', headers=headers, timeout=self.timeout)
+            if resp.status_code == 304:
+                # nothing changed: reuse the cached store (copy so callers may modify it)
+                with self._books_lock:
+                    return self._books_cache.copy(), self._books_version
+            if resp.status_code == 200:
+                books = self._decode_books(resp)
+                version = self._parse_version(resp)
+                with self._books_lock:
+                    self._books_etag = resp.headers.get('ETag')
+                    self._books_cache = books
+                    self._books_version = version
+                return books.copy(), version
+        except Exception:
+            pass
+        return [], None
+
+    def prime_books_cache(self, books, version, etag):
+        """Seed the conditional-GET cache from a snapshot saved on disk for `etag`,
+        so the next get_books_with_version() can be answered with 304."""
+        if not etag:
+            return
+        with self._books_lock:
+            if self._books_etag is None:
+                self._books_etag = etag
+                self._books_cache = books.copy() if isinstance(books, BookStore) else BookStore(books)
+                self._books_version = version
+
+    def books_validator(self):
+        """(etag, version) of the last full /books response."""
+        with self._books_lock:
+            return self._books_etag, self._books_version
+
+    def search_books(self, q, status=None, limit=500):
+        """Full-text search on the server (word-prefix match, case-insensitive, by relevance).
+        Used instead of local filtering when the catalog is too large to scan per keystroke."""
+        params = {'q': q, 'limit': limit}
+        if status and status != 'Все':
+            params['status'] = status
+        try:
+            resp = self.session.get(f'{self.BASE_URL}/books/search', params=params, timeout=self.timeout)
+            if resp.status_code == 200:
+                return resp.json()
+        except Exception:
+            pass
+        return None
+
+    def get_changes(self, since):
+        """Fetch changes after `since`: {'version', 'reset', 'changes': [...]}, or None on error."""
         try:
-            resp = self.session.get(f'{self.BASE_URL}/books', timeout=self.timeout)
+            resp = self.session.get(f'{self.BASE_URL}/books/changes', params={'since': since}, timeout=self.timeout)
             if resp.status_code == 200:
                 return resp.json()
         except Exception:
             pass
-        return []
+        return None
+
+    @staticmethod
+    def _decode_books(resp):
+        # turn either representation into a BookStore
+        if not resp.headers.get('Content-Type', '').startswith(COLUMNAR_MIMETYPE):
+            return BookStore(resp.json())
+        return decode_columnar(resp.json())
+
+    @staticmethod
+    def _parse_version(resp):
+        try:
+            return int(resp.headers['X-Books-Version'])
+        except (KeyError, ValueError):
+            return None
+
+    def get_books_page(self, limit=100, cursor=None, q=None, status=None, sort='id', order='asc'):
+        """Fetch one keyset-paginated page of books filtered and sorted on the server.
+        Returns {'items': [...], 'next_cursor': str|None}; pass `next_cursor` back to get the next page.
+        """
+        params = {'limit': limit, 'sort': sort, 'order': order}
+        if cursor:
+            params['cursor'] = cursor
+        if q:
+            params['q'] = q
+        if status and status != 'Все':
+            params['status'] = status
+        try:
+            resp = self.session.get(f'{self.BASE_URL}/books', params=params, timeout=self.timeout)
+            if resp.status_code == 200:
+                return resp.json()
+        except Exception:
+            pass
+        return {'items': [], 'next_cursor': None}
 
     def add_book(self, title, author):
         data = {'title': title, 'author': author}
@@ -63,3 +222,58 @@ class BookModel:
             return resp.status_code == 200
         except Exception:
             return False
+
+    # Batch operations: one request / one server transaction for a stack of books.
+    # Each returns a list of per-item results ({'id', 'op', 'status', 'message'|'error'})
+    # in input order, or None if the request itself failed.
+    def batch(self, operations):
+        try:
+            resp = self.session.post(f'{self.BASE_URL}/books/batch', json={'operations': operations}, timeout=self.timeout)
+            if resp.status_code == 200:
+                return resp.json().get('results')
+        except Exception:
+            pass
+        return None
+
+    def issue_many(self, items):
+        """items: iterable of (book_id, name) pairs; name may be empty."""
+        return self.batch([{'op': 'issue', 'id': int(book_id), 'name': name} for book_id, name in items])
+
+    def return_many(self, book_ids):
+        return self.batch([{'op': 'return', 'id': int(book_id)} for book_id in book_ids])
+
+    def reserve_many(self, items):
+        """items: iterable of (book_id, name) pairs."""
+        return self.batch([{'op': 'reserve', 'id': int(book_id), 'name': name} for book_id, name in items])
+
+    def delete_many(self, book_ids):
+        return self.batch([{'op': 'delete', 'id': int(book_id)} for book_id in book_ids])
+
+
+def parse_server_timing(value):
+    """{'db': 1.2, 'total': 5.0} from a Server-Timing header (durations in ms)."""
+    timings = {}
+    for metric in (value or '').split(','):
+        name, *params = metric.strip().split(';')
+        if not name:
+            continue
+        timings[name] = None
+        for param in params:
+            key, _, raw = param.strip().partition('=')
+            if key == 'dur':
+                try:
+                    timings[name] = float(raw.strip('"'))
+                except ValueError:
+                    pass
+    return timings
+
+
+def decode_columnar(data):
+    """Load the columnar /books payload into a BookStore without building a dict per book.
+    Status strings come from the per-block dictionary, so equal statuses share one object."""
+    books = BookStore()
+    for block in data.get('blocks', []):
+        values = block['status_values']
+        statuses = [values[code] for code in block['status']]
+        books.extend_rows(zip(block['id'], block['title'], block['author'], statuses, block['reserved_by']))
+    return books
@@ -0,0 +1,31 @@
+AVAILABLE = 'доступна'
+ISSUED = 'выдана'
+RESERVED = 'зарезервирована'
+
+# expected_state() result for a book the action removes
+DELETED = object()
+
+
+def expected_state(book, action, name=''):
+    """The book as the server will have it after `action`, following the same rules as
+    the server's transitions; DELETED for a delete, None if the server would refuse.
+
+    Used to show an action's result before the server confirms it. Applying an action
+    to a book already in the resulting state gives None, so re-applying pending
+    actions on top of fresh server data never applies one twice.
+    """
+    if book is None:
+        return None
+    status = book.get('status')
+    if action == 'issue':
+        if status == AVAILABLE or (status == RESERVED and name and name == book.get('reserved_by')):
+            return dict(book, status=ISSUED, reserved_by=None)
+    elif action == 'return':
+        if status == ISSUED:
+            return dict(book, status=AVAILABLE)
+    elif action == 'reserve':
+        if status == AVAILABLE and name:
+            return dict(book, status=RESERVED, reserved_by=name)
+    elif action == 'delete':
+        return DELETED
+    return None
@@ -0,0 +1,62 @@
+from collections import namedtuple
+
+# deletes: [iid]; inserts: [(index, iid, values, tag)] by ascending index;
+# updates: [(iid, values, tag)]; order: full new iid order when kept rows were
+# reordered (e.g. after a sort), otherwise None
+RowDiff = namedtuple('RowDiff', 'deletes inserts updates order')
+
+
+def diff_rows(old, new):
+    """Keyed diff between two rendered snapshots.
+
+    `old` and `new` are dicts iid -> (values, tag) in display order (dicts keep
+    insertion order). Applying the result to a Treeview showing `old` -- deletes,
+    then updates, then inserts at their index, then a reorder if `order` is set --
+    makes it show `new` while leaving unchanged rows (and their selection) alone.
+    """
+    deletes = [iid for iid in old if iid not in new]
+    inserts = []
+    updates = []
+    kept = []
+    for index, (iid, row) in enumerate(new.items()):
+        previous = old.get(iid)
+        if previous is None:
+            inserts.append((index, iid) + tuple(row))
+            continue
+        kept.append(iid)
+        if previous != row:
+            updates.append((iid,) + tuple(row))
+    order = None
+    if kept and [iid for iid in old if iid in new] != kept:
+        order = list(new)
+    return RowDiff(deletes, inserts, updates, order)
+
+
+
+def diff_ops(diff):
+    # number of Treeview calls applying `diff` takes, counting a reorder as one
+    return len(diff.deletes) + len(diff.updates) + len(diff.inserts) + (diff.order is not None)
+
+
+def apply_diff(old, diff, limit=None):
+    """The snapshot a Treeview showing `old` has after the first `limit` calls
+    applying `diff` (all of them if None), in MainView._apply_diff's order.
+
+    Lets a caller that cancelled a partly applied diff know what is on screen.
+    """
+    if limit is None:
+        limit = diff_ops(diff)
+    deletes = set(diff.deletes[:limit])
+    limit -= len(deletes)
+    items = [iid for iid in old if iid not in deletes]
+    values = {iid: old[iid] for iid in items}
+    for iid, vals, tag in diff.updates[:max(limit, 0)]:
+        values[iid] = (vals, tag)
+    limit -= len(diff.updates)
+    for index, iid, vals, tag in diff.inserts[:max(limit, 0)]:
+        items.insert(len(items) if diff.order is not None else index, iid)
+        values[iid] = (vals, tag)
+    limit -= len(diff.inserts)
+    if diff.order is not None and limit > 0:
+        items = list(diff.order)
+    return {iid: values[iid] for iid in items}
@@ -0,0 +1,173 @@
+from array import array
+
+
+def _normalize(book):
+    # the same normalization MainController._matches_filter applies on every keystroke
+    return ((book.get('title') or '').lower(),
+            (book.get('author') or '').lower(),
+            (book.get('reserved_by') or '').lower())
+
+
+def _grams(fields):
+    return {f[i:i + 3] for f in fields for i in range(len(f) - 2)}
+
+
+def _bit_positions(bits):
+    # set bits of a bitset, lowest first, in O(n) instead of shifting the int per bit
+    s = bin(bits)[:1:-1]
+    i = s.find('1')
+    while i != -1:
+        yield i
+        i = s.find('1', i + 1)
+
+
+class SearchIndex:
+    """Inverted trigram index over title/author/reserved_by of the cached books.
+
+    `search(text, status_filter)` returns exactly what filtering the books with
+    MainController._matches_filter would, in the same order, but looks up the
+    posting lists of the query's trigrams instead of lowercasing every book:
+    the rarest lists are intersected and only the surviving candidates are checked
+    against the pre-normalized fields. Status filtering uses one bitset per status.
+
+    Books keep a slot in cache order (updates keep it, new books are appended), so
+    `upsert`/`remove` mirror MainController._apply_changes. Posting lists are
+    append-only arrays; entries left stale by updates and deletes are filtered out
+    by the final check and dropped when the index compacts itself.
+    """
+
+    # compact once this share of posting entries is stale
+    COMPACT_RATIO = 0.5
+    # stop intersecting posting lists once this few candidates are left
+    CANDIDATES_ENOUGH = 64
+
+    def __init__(self, books=()):
+        self.build(books)
+
+    def build(self, books):
+        self._books = []      # slot -> book dict, None once removed
+        self._fields = []     # slot -> normalized (title, author, reserved_by)
+        self._statuses = []   # slot -> lowercased status
+        self._slot_of = {}    # book id -> slot
+        self._postings = {}   # trigram -> array of slots
+        self._entries = 0
+        self._stale = 0
+        for book in books:
+            self._add(book)
+        # status bitsets are built in one go: OR-ing bit by bit would be quadratic
+        maps = {}
+        for slot, status in enumerate(self._statuses):
+            bitmap = maps.get(status)
+            if bitmap is None:
+                bitmap = maps[status] = bytearray(len(self._statuses) // 8 + 1)
+            bitmap[slot >> 3] |= 1 << (slot & 7)
+        self._status_bits = {s: int.from_bytes(b, 'little') for s, b in maps.items()}
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def _add(self, book):
+        slot = len(self._books)
+        fields = _normalize(book)
+        self._books.append(book)
+        self._fields.append(fields)
+        self._statuses.append((book.get('status') or '').lower())
+        self._slot_of[book.get('id')] = slot
+        self._index_grams(slot, _grams(fields))
+        return slot
+
+    def _index_grams(self, slot, grams):
+        postings = self._postings
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array('I')
+            posting.append(slot)
+        self._entries += len(grams)
+
+    def _set_status(self, slot, status):
+        old = self._statuses[slot]
+        if old is not None and old in self._status_bits:
+            self._status_bits[old] &= ~(1 << slot)
+        self._statuses[slot] = status
+        if status is not None:
+            self._status_bits[status] = self._status_bits.get(status, 0) | (1 << slot)
+
+    def upsert(self, book):
+        slot = self._slot_of.get(book.get('id'))
+        if slot is None:
+            slot = self._add(book)
+            self._statuses[slot] = None
+            self._set_status(slot, (book.get('status') or '').lower())
+            return
+        old_fields = self._fields[slot]
+        fields = _normalize(book)
+        self._books[slot] = book
+        if fields != old_fields:
+            old_grams = _grams(old_fields)
+            new_grams = _grams(fields)
+            self._fields[slot] = fields
+            self._index_grams(slot, new_grams - old_grams)
+            self._stale += len(old_grams - new_grams)
+        self._set_status(slot, (book.get('status') or '').lower())
+        self._maybe_compact()
+
+    def remove(self, book_id):
+        slot = self._slot_of.pop(book_id, None)
+        if slot is None:
+            return
+        self._stale += len(_grams(self._fields[slot]))
+        self._set_status(slot, None)
+        self._books[slot] = None
+        self._fields[slot] = None
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._stale > self.COMPACT_RATIO * self._entries:
+            self.build([b for b in self._books if b is not None])
+
+    def search(self, text, status_filter=None, cancel=None):
+        """Matching books in cache order. `cancel` (a CancelToken) is checked between
+        chunks, so a search running on a worker can be abandoned."""
+        allowed = None
+        if status_filter and status_filter != 'Все':
+            allowed = {s for s in self._status_bits if status_filter in s}
+        text = (text or '').lower()
+        if not text:
+            if allowed is None:
+                return [b for b in self._books if b is not None]
+            bits = 0
+            for status in allowed:
+                bits |= self._status_bits[status]
+            return [self._books[slot] for slot in _bit_positions(bits)]
+        if len(text) < 3:
+            # no trigram to look up: scan the pre-normalized fields
+            candidates = range(len(self._books))
+        else:
+            postings = []
+            for gram in _grams((text,)):
+                posting = self._postings.get(gram)
+                if posting is None:
+                    return []
+                postings.append(posting)
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                if len(candidates) <= self.CANDIDATES_ENOUGH:
+                    break
+                if cancel is not None:
+                    cancel.check()
+                candidates.intersection_update(posting)
+            candidates = sorted(candidates)
+        result = []
+        for n, slot in enumerate(candidates):
+            if cancel is not None and not n % cancel.CHUNK:
+                cancel.check()
+            fields = self._fields[slot]
+            if fields is None:
+                continue
+            if allowed is not None and self._statuses[slot] not in allowed:
+                continue
+            if text in fields[0] or text in fields[1] or text in fields[2]:
+                result.append(self._books[slot])
+        return result
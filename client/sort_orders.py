@@ -0,0 +1,144 @@
+import bisect
+import threading
+
+COLUMNS = ('id', 'title', 'author', 'status', 'reserved_by')
+
+
+def text_key(value):
+    # case-insensitive for Cyrillic too; «ё» sorts together with «е» as in dictionaries
+    return (value or '').casefold().replace('ё', 'е')
+
+
+def id_key(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+def key_func(column):
+    if column == 'id':
+        return lambda book: id_key(book.get('id'))
+    return lambda book: text_key(book.get(column))
+
+
+class SortOrders:
+    """Per-column sort permutations over the cached books.
+
+    Each column's order is a sorted list of (key, book id) built on first use and
+    then kept up to date with bisect on every `upsert`/`remove`, so re-sorting the
+    shown books is a single O(n) walk over the permutation. Keys are typed: the id
+    column compares as int, text columns casefolded with «ё» = «е». Ties always
+    break by ascending id (i.e. cache order), which makes multi-column sorts stable.
+
+    `order` may run on a worker while the Tk thread applies changes: building a
+    permutation and changing them are serialized by a lock. A walk that overlaps a
+    change can be off by that change; the controller re-sorts after every change.
+    """
+
+    def __init__(self, books=()):
+        self.build(books)
+
+    def build(self, books):
+        self._books = {b.get('id'): b for b in books}
+        self._sorted = {}   # column -> sorted [(key, id)], only for columns sorted so far
+        self._ranks = {}    # column -> {id: dense rank}, dropped on change
+        self._lock = threading.RLock()
+
+    def _column(self, column):
+        with self._lock:
+            entries = self._sorted.get(column)
+            if entries is None:
+                key = key_func(column)
+                entries = self._sorted[column] = sorted((key(b), i) for i, b in self._books.items())
+            return entries
+
+    def upsert(self, book):
+        with self._lock:
+            self._upsert(book)
+
+    def _upsert(self, book):
+        book_id = book.get('id')
+        old = self._books.get(book_id)
+        self._books[book_id] = book
+        for column, entries in self._sorted.items():
+            key = key_func(column)
+            entry = (key(book), book_id)
+            if old is not None:
+                old_entry = (key(old), book_id)
+                if old_entry == entry:
+                    continue
+                del entries[bisect.bisect_left(entries, old_entry)]
+            bisect.insort(entries, entry)
+            self._ranks.pop(column, None)
+
+    def remove(self, book_id):
+        with self._lock:
+            old = self._books.pop(book_id, None)
+            if old is None:
+                return
+            for column, entries in self._sorted.items():
+                del entries[bisect.bisect_left(entries, (key_func(column)(old), book_id))]
+                self._ranks.pop(column, None)
+
+    def _rank(self, column):
+        with self._lock:
+            ranks = self._ranks.get(column)
+            if ranks is None:
+                ranks = {}
+                rank = -1
+                previous = object()
+                for key, book_id in self._column(column):
+                    if key != previous:
+                        rank += 1
+                        previous = key
+                    ranks[book_id] = rank
+                self._ranks[column] = ranks
+            return ranks
+
+    def order(self, books, spec, cancel=None):
+        """Return `books` sorted by `spec`, a list of (column, ascending) pairs, primary first.
+
+        `cancel` (a CancelToken) is checked between chunks of the walk or key computation.
+        """
+        spec = [(c, asc) for c, asc in spec if c in COLUMNS]
+        if not spec:
+            return list(books)
+        if len(spec) == 1 and 8 * len(books) >= len(self._books):
+            # a large share of the cache: walk the permutation instead of sorting
+            result = self._walk(books, *spec[0], cancel=cancel)
+            if result is not None:
+                return result
+        ranks = [(self._rank(column), ascending) for column, ascending in spec]
+        decorated = []
+        for n, book in enumerate(books):
+            if cancel is not None and not n % cancel.CHUNK:
+                cancel.check()
+            book_id = book.get('id')
+            key = tuple(r.get(book_id, -1) if asc else -r.get(book_id, -1) for r, asc in ranks)
+            decorated.append((key, id_key(book_id), n))
+        decorated.sort()
+        return [books[n] for _, _, n in decorated]
+
+    def _walk(self, books, column, ascending, cancel=None):
+        wanted = {b.get('id'): b for b in books}
+        entries = self._column(column)
+        if cancel is not None:
+            cancel.check()
+        if ascending:
+            result = [wanted[i] for _, i in entries if i in wanted]
+        else:
+            # reverse the groups of equal keys, not the ids inside them
+            result = []
+            group = []
+            previous = object()
+            for key, book_id in reversed(entries):
+                if key != previous:
+                    result.extend(reversed(group))
+                    group = []
+                    previous = key
+                if book_id in wanted:
+                    group.append(wanted[book_id])
+            result.extend(reversed(group))
+        # books missing from the cache (e.g. server search results): fall back to sorting
+        return result if len(result) == len(wanted) == len(books) else None
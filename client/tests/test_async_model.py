@@ -0,0 +1,75 @@
+import sys
+import os
+import asyncio
+
+# Ensure repository root is on sys.path so 'client' package can be imported
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import pytest
+
+web = pytest.importorskip('aiohttp.web')
+
+from client.async_model import AsyncBookModel, AsyncRunner
+
+
+async def _serve(handler):
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f'http://127.0.0.1:{port}'
+
+
+def test_concurrency_is_bounded_and_5xx_is_retried():
+    state = {'in_flight': 0, 'max': 0, 'failures': 2}
+
+    async def handler(request):
+        if request.match_info['tail'] == 'books/return/13' and state['failures']:
+            state['failures'] -= 1
+            return web.Response(status=503)
+        state['in_flight'] += 1
+        state['max'] = max(state['max'], state['in_flight'])
+        await asyncio.sleep(0.01)
+        state['in_flight'] -= 1
+        return web.json_response({'message': 'ok'})
+
+    async def run():
+        runner, url = await _serve(handler)
+        model = AsyncBookModel(max_concurrency=3)
+        model.BASE_URL = url
+        model.BACKOFF = 0
+        try:
+            return await asyncio.gather(*(model.return_book_by_id(i) for i in range(30)))
+        finally:
+            await model.close()
+            await runner.cleanup()
+
+    results = asyncio.run(run())
+    assert all(results)
+    assert state['max'] == 3 and state['failures'] == 0
+
+
+def test_runner_delivers_results_through_call_soon():
+    delivered = []
+    runner = AsyncRunner(lambda fn: fn())
+
+    async def answer():
+        await asyncio.sleep(0)
+        return 42
+
+    async def fail():
+        raise RuntimeError('boom')
+
+    try:
+        runner.submit(answer(), delivered.append).result(timeout=5)
+        future = runner.submit(fail(), delivered.append)
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+    finally:
+        runner.stop()
+    assert delivered == [42, None]
@@ -0,0 +1,42 @@
+import sys
+import os
+
+# Ensure repository root is on sys.path so 'client' package can be imported
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from client.book_store import BookStore
+
+
+def _book(book_id, title, author='Толстой', status='доступна', reserved_by=None):
+    return {'id': book_id, 'title': title, 'author': author, 'status': status, 'reserved_by': reserved_by}
+
+
+def test_records_read_like_dicts_and_share_strings():
+    books = [_book(1, 'Война и мир'), _book(2, 'Анна Каренина', status=''.join(['выдана']))]
+    store = BookStore(books)
+    assert list(store) == books
+    book = store[0]
+    assert book['title'] == 'Война и мир' and book.get('reserved_by') is None and book.get('x', 5) == 5
+    assert dict(book, status='выдана') == dict(books[0], status='выдана')
+    # equal authors from different payload objects end up as one string
+    store.upsert(_book(3, 'Идиот', author=''.join(['Толст', 'ой'])))
+    assert store[2]['author'] is store[0]['author']
+
+
+def test_updates_in_place_and_lookup_by_id():
+    store = BookStore(_book(i, f'T{i}') for i in (1, 2, 4))
+    assert store.index_of(4) == 2 and store.index_of('2') == 1 and store.index_of(3) is None
+    record = store.upsert(_book(2, 'New', status='выдана'))
+    assert store[1] is record and store.get(2)['title'] == 'New' and len(store) == 3
+    # a placeholder with a negative id breaks the id order: lookups still work
+    store.upsert(_book(-1, 'Placeholder'))
+    store.insert(2, _book(3, 'T3'))
+    assert [b['id'] for b in store] == [1, 2, 3, 4, -1]
+    assert store.index_of(-1) == 4 and store.index_of(3) == 2
+    copy = store.copy()
+    store.remove_ids({-1, 2})
+    assert [b['id'] for b in store] == [1, 3, 4] and store.index_of(4) == 2
+    assert store.index_of(-1) is None
+    assert [b['id'] for b in copy] == [1, 2, 3, 4, -1]
@@ -0,0 +1,73 @@
+import sys
+import os
+
+# Ensure repository root is on sys.path so 'client' package can be imported
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from client.disk_cache import DiskCache
+
+URL = 'http://localhost:5000'
+BOOKS = [
+    {'id': 2, 'title': 'Мёртвые души', 'author': 'Гоголь', 'status': 'доступна', 'reserved_by': None},
+    {'id': 1, 'title': 'Война и мир', 'author': 'Толстой', 'status': 'зарезервирована', 'reserved_by': 'Иванов'},
+]
+
+
+def test_snapshot_roundtrip_keeps_order_and_validators(tmp_path):
+    cache = DiskCache(str(tmp_path / 'sub' / 'books.sqlite'), URL)
+    assert cache.load() is None
+    assert cache.save(BOOKS, 42, 'v42-abc')
+    snapshot = cache.load()
+    assert list(snapshot['books']) == BOOKS
+    assert snapshot['version'] == 42 and snapshot['etag'] == 'v42-abc'
+    # overwriting goes through a temporary file that is renamed into place
+    assert cache.save(BOOKS[:1], 43)
+    assert list(cache.load()['books']) == BOOKS[:1]
+    assert cache.load()['etag'] is None
+    assert os.listdir(tmp_path / 'sub') == ['books.sqlite']
+
+
+def test_snapshot_of_other_server_or_corrupt_file_is_ignored(tmp_path):
+    path = str(tmp_path / 'books.sqlite')
+    assert DiskCache(path, URL).save(BOOKS, 1)
+    assert DiskCache(path, 'http://example.org:5000').load() is None
+    with open(path, 'wb') as f:
+        f.write(b'not a database')
+    assert DiskCache(path, URL).load() is None
+
+
+def test_oversized_snapshot_is_not_kept(tmp_path):
+    path = str(tmp_path / 'books.sqlite')
+    assert DiskCache(path, URL).save(BOOKS, 1)
+    big = [dict(BOOKS[0], id=i, title='x' * 100) for i in range(2000)]
+    assert not DiskCache(path, URL, max_bytes=64 * 1024).save(big, 2)
+    assert not os.path.exists(path)
+    assert os.listdir(tmp_path) == []
+
+
+def test_overlapping_saves_use_separate_temporary_files(tmp_path):
+    import threading
+
+    path = str(tmp_path / 'books.sqlite')
+    cache = DiskCache(path, URL)
+    big = [dict(BOOKS[0], id=i) for i in range(5000)]
+    results = []
+    threads = [threading.Thread(target=lambda v=v: results.append(cache.save(big if v % 2 else BOOKS, v)))
+               for v in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [True] * 8
+    snapshot = cache.load()
+    assert list(snapshot['books']) == (big if snapshot['version'] % 2 else BOOKS)
+    assert os.listdir(tmp_path) == ['books.sqlite']
+
+
+def test_head_of_snapshot(tmp_path):
+    cache = DiskCache(str(tmp_path / 'books.sqlite'), URL)
+    cache.save(BOOKS, 7, 'v7')
+    head = cache.load(limit=1)
+    assert list(head['books']) == BOOKS[:1] and head['count'] == 2 and head['version'] == 7
@@ -0,0 +1,74 @@
+import sys
+import os
+
+# Ensure repository root is on sys.path so 'client' package can be imported
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from client.fetch_scheduler import FULL, SYNC, FetchScheduler
+
+
+class _Harness:
+    # workers and the Tk queue are driven by hand to control interleavings
+    def __init__(self):
+        self.workers = []
+        self.ui = []
+        self.fetched = []
+        self.applied = []
+        self.scheduler = FetchScheduler(self.workers.append, self.ui.append, self._fetch, self._apply)
+
+    def _fetch(self, kind):
+        self.fetched.append(kind)
+        return f'{kind}#{len(self.fetched)}'
+
+    def _apply(self, kind, result):
+        self.applied.append(result)
+
+    def finish_one(self):
+        self.workers.pop(0)()
+        self.ui.pop(0)()
+
+
+def test_burst_collapses_into_one_in_flight_and_one_trailing():
+    h = _Harness()
+    for _ in range(5):
+        h.scheduler.request()
+    h.scheduler.request(full=True)
+    assert len(h.workers) == 1
+    h.finish_one()
+    assert len(h.workers) == 1
+    h.finish_one()
+    assert not h.workers
+    # the trailing fetch was upgraded to a full load by the last request
+    assert h.fetched == [SYNC, FULL]
+    assert h.applied == ['sync#1', 'full#2']
+    assert h.scheduler.stats == {'requested': 6, 'started': 2, 'coalesced': 4, 'dropped': 0, 'applied': 2}
+
+
+def test_result_started_before_invalidate_is_dropped():
+    h = _Harness()
+    h.scheduler.request(full=True)
+    h.scheduler.invalidate()
+    h.finish_one()
+    assert h.applied == []
+    assert h.scheduler.stats['dropped'] == 1
+    h.scheduler.request()
+    h.finish_one()
+    assert h.applied == ['sync#2']
+
+
+def test_apply_may_request_a_follow_up_fetch():
+    h = _Harness()
+
+    def _apply(kind, result):
+        h.applied.append(result)
+        if kind == SYNC:
+            h.scheduler.request(full=True)
+
+    h.scheduler._apply = _apply
+    h.scheduler.request()
+    h.finish_one()
+    assert h.scheduler.busy
+    h.finish_one()
+    assert h.applied == ['sync#1', 'full#2'] and not h.scheduler.busy
@@ -0,0 +1,44 @@
+import sys
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Ensure repository root is on sys.path so 'client' package can be imported
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from client.model import BookModel
+
+
+class _SlowBody(BaseHTTPRequestHandler):
+    # like the streamed /books: headers go out at once, the body takes a while
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Server-Timing', 'db;dur=150, total;dur=210')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.flush()
+        time.sleep(0.2)
+        self.wfile.write(b'[]')
+
+    def log_message(self, *args):
+        pass
+
+
+def test_client_latency_includes_reading_the_body():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowBody)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        model = BookModel()
+        model.BASE_URL = f'http://127.0.0.1:{server.server_address[1]}'
+        assert len(model.get_books()) == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+    timing = model.recent_timings()[-1]
+    assert timing['path'] == '/books' and timing['status'] == 200
+    assert timing['headers_ms'] < 150 <= 200 <= timing['client_ms']
+    assert timing['server'] == {'db': 150.0, 'total': 210.0}
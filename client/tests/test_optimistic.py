@@ -0,0 +1,107 @@
+import sys
+import os
+
+# Ensure repository root is on sys.path so 'client' package can be imported
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from client.optimistic import DELETED, expected_state
+
+AVAILABLE = {'id': 1, 'title': 'Идиот', 'author': 'Достоевский', 'status': 'доступна', 'reserved_by': None}
+RESERVED = dict(AVAILABLE, status='зарезервирована', reserved_by='Иванов')
+ISSUED = dict(AVAILABLE, status='выдана')
+
+
+def test_expected_state_follows_server_rules():
+    assert expected_state(AVAILABLE, 'issue') == ISSUED
+    assert expected_state(RESERVED, 'issue', 'Иванов') == ISSUED
+    assert expected_state(RESERVED, 'issue', 'Петров') is None
+    assert expected_state(ISSUED, 'return') == AVAILABLE
+    assert expected_state(AVAILABLE, 'reserve', 'Иванов') == RESERVED
+    assert expected_state(AVAILABLE, 'reserve', '') is None
+    assert expected_state(ISSUED, 'delete') is DELETED
+    assert expected_state(None, 'issue') is None
+    # the input dict is never modified: rollback restores it as is
+    assert AVAILABLE['status'] == 'доступна'
+
+
+def test_reapplying_on_already_updated_server_state_predicts_nothing():
+    assert expected_state(ISSUED, 'issue') is None
+    assert expected_state(AVAILABLE, 'return') is None
+    assert expected_state(RESERVED, 'reserve', 'Иванов') is None
+
+
+def _headless_controller(books, **attrs):
+    # a MainController without Tk: just the state the optimistic paths touch
+    sys.path.insert(0, os.path.join(ROOT, 'client'))
+    from types import SimpleNamespace
+    from book_store import BookStore
+    from controller import MainController
+
+    c = MainController.__new__(MainController)
+    c._books = BookStore(books)
+    c._version = 7
+    c._pending = []
+    c._cache_save_after = None
+    c._cache_save_deferred = False
+    c._abort_filter = lambda: None
+    c._index = None
+    c._books_generation = 0
+    c._sorter = SimpleNamespace(upsert=lambda book: None, remove=lambda book_id: None)
+    c._submit = lambda fn: fn()
+    c.filter_and_show = lambda: None
+    c.sync_books = lambda: None
+    c.view = SimpleNamespace(set_status=lambda text: None, root=SimpleNamespace(after=lambda ms, fn: fn()))
+    for name, value in attrs.items():
+        setattr(c, name, value)
+    return c
+
+
+def test_snapshot_is_not_saved_while_actions_are_pending():
+    from types import SimpleNamespace
+
+    saved, scheduled = [], []
+    c = _headless_controller(
+        [AVAILABLE],
+        model=SimpleNamespace(books_validator=lambda: ('"v7"', 7)),
+        _disk_cache=SimpleNamespace(save=lambda books, version, etag: saved.append((books, version))),
+        _schedule_cache_save=lambda: scheduled.append(True))
+
+    placeholder = dict(AVAILABLE, id=-1, title='Нос')
+    add = {'id': -1, 'action': 'add', 'name': '', 'before': None, 'index': None, 'after': placeholder}
+    c._pending.append(add)
+    c._apply_optimistic(add)
+    c._save_cache()
+    assert saved == [] and not scheduled
+    # the add is answered: the deferred save is scheduled and writes server state only
+    c._end_optimistic(add, ok=False, show=False)
+    assert scheduled
+    c._save_cache()
+    assert saved == [([AVAILABLE], 7)]
+
+
+def test_bulk_action_goes_through_the_batch_endpoint_in_chunks(monkeypatch):
+    from types import SimpleNamespace
+    import controller
+
+    books = [dict(AVAILABLE, id=i) for i in range(1, 6)]
+    sent = []
+
+    def batch(operations):
+        sent.append(operations)
+        if len(sent) == 3:
+            return None  # the whole request failed
+        # the server refuses book 2
+        return [{'id': op['id'], 'status': 409 if op['id'] == 2 else 200} for op in operations]
+
+    c = _headless_controller(books, model=SimpleNamespace(batch=batch), _async=None, BULK_BATCH_SIZE=2)
+    errors = []
+    monkeypatch.setattr(controller.messagebox, 'showerror', lambda title, text: errors.append(text))
+    c.perform_bulk('issue', controller.MainController._parse_ids('1, 2 3;4 5'), 'Иванов')
+
+    assert [[op['id'] for op in chunk] for chunk in sent] == [[1, 2], [3, 4], [5]]
+    assert sent[0][0] == {'op': 'issue', 'id': 1, 'name': 'Иванов'}
+    statuses = {b['id']: b['status'] for b in c._books}
+    assert statuses == {1: 'выдана', 2: 'доступна', 3: 'выдана', 4: 'выдана', 5: 'доступна'}
+    assert c._pending == [] and errors == ['Не удалось выполнить для 2 из 5 книг']
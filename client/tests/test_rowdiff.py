@@ -0,0 +1,58 @@
+import sys
+import os
+
+# Ensure repository root is on sys.path so 'client' package can be imported
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from client.rowdiff import apply_diff, diff_rows, diff_ops
+
+
+def _rows(*books):
+    return {str(i): ((i, title, status), 'available') for i, title, status in books}
+
+
+def test_single_status_change_is_one_update():
+    old = _rows((1, 'A', 'доступна'), (2, 'B', 'доступна'), (3, 'C', 'доступна'))
+    new = _rows((1, 'A', 'доступна'), (2, 'B', 'выдана'), (3, 'C', 'доступна'))
+    diff = diff_rows(old, new)
+    assert diff.deletes == [] and diff.inserts == [] and diff.order is None
+    assert diff.updates == [('2', (2, 'B', 'выдана'), 'available')]
+    assert list(apply_diff(old, diff).items()) == list(new.items())
+
+
+def test_inserts_and_deletes_keep_position_without_reorder():
+    old = _rows((1, 'A', 'x'), (2, 'B', 'x'), (4, 'D', 'x'))
+    new = _rows((1, 'A', 'x'), (3, 'C', 'x'), (4, 'D', 'x'), (5, 'E', 'x'))
+    diff = diff_rows(old, new)
+    assert diff.deletes == ['2']
+    assert [i[:2] for i in diff.inserts] == [(1, '3'), (3, '5')]
+    assert diff.order is None
+    assert list(apply_diff(old, diff)) == ['1', '3', '4', '5']
+
+
+def test_sort_is_a_reorder_not_a_rebuild():
+    old = _rows((1, 'B', 'x'), (2, 'A', 'x'), (3, 'C', 'x'))
+    new = dict(sorted(old.items(), key=lambda kv: kv[1][0][1]))
+    diff = diff_rows(old, new)
+    assert diff.deletes == [] and diff.inserts == [] and diff.updates == []
+    assert diff.order == ['2', '1', '3']
+    assert list(apply_diff(old, diff)) == ['2', '1', '3']
+
+
+def test_identical_snapshots_produce_empty_diff():
+    rows = _rows((1, 'A', 'x'), (2, 'B', 'x'))
+    assert diff_rows(rows, dict(rows)) == ([], [], [], None)
+
+
+def test_partly_applied_diff_matches_the_screen():
+    old = _rows((1, 'A', 'x'), (2, 'B', 'x'), (3, 'C', 'x'))
+    new = _rows((3, 'C', 'y'), (4, 'D', 'x'), (1, 'A', 'x'))
+    diff = diff_rows(old, new)
+    assert diff_ops(diff) == 4
+    assert list(apply_diff(old, diff, 0).items()) == list(old.items())
+    # the delete and the update are done, the insert and the reorder are not
+    assert list(apply_diff(old, diff, 2).items()) == [('1', old['1']), ('3', new['3'])]
+    assert list(apply_diff(old, diff, 3)) == ['1', '3', '4']
+    assert list(apply_diff(old, diff, 4).items()) == list(new.items())
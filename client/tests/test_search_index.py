@@ -0,0 +1,91 @@
+import sys
+import os
+import random
+
+# Ensure repository root is on sys.path so 'client' package can be imported
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import pytest
+
+from client.cancel import CancelToken, Cancelled
+from client.search_index import SearchIndex
+
+STATUSES = ['доступна', 'выдана', 'зарезервирована']
+WORDS = ['Война', 'мир', 'Анна', 'Каренина', 'Идиот', 'Мёртвые', 'души', 'Толстой', 'Гоголь', 'War', 'Peace', 'ab']
+
+
+def _matches(book, text, status_filter):
+    # reference: MainController._matches_filter
+    if text:
+        text = text.lower()
+        fields = [(book.get(f) or '').lower() for f in ('title', 'author', 'reserved_by')]
+        if not any(text in f for f in fields):
+            return False
+    if status_filter and status_filter != 'Все':
+        if status_filter not in (book.get('status') or '').lower():
+            return False
+    return True
+
+
+def _book(rng, book_id):
+    status = rng.choice(STATUSES)
+    return {
+        'id': book_id,
+        'title': ' '.join(rng.sample(WORDS, 2)),
+        'author': rng.choice(WORDS),
+        'status': status,
+        'reserved_by': rng.choice(WORDS) if status == 'зарезервирована' else None,
+    }
+
+
+QUERIES = ['', 'а', 'ми', 'мир', 'АННА', 'каренина', 'war pe', 'ёртв', 'толстой', 'нет такого', 'ab']
+
+
+def _check(index, books):
+    for text in QUERIES:
+        for status in ('Все', '', *STATUSES):
+            expected = [b for b in books if _matches(b, text, status)]
+            assert index.search(text, status) == expected, (text, status)
+
+
+def test_index_matches_linear_scan():
+    rng = random.Random(1)
+    books = [_book(rng, i) for i in range(1, 400)]
+    _check(SearchIndex(books), books)
+
+
+def test_patches_mirror_apply_changes():
+    rng = random.Random(2)
+    books = [_book(rng, i) for i in range(1, 300)]
+    index = SearchIndex(books)
+    index.COMPACT_RATIO = 0.05
+    next_id = 300
+    for _ in range(500):
+        roll = rng.random()
+        if roll < 0.4:
+            # update in place, same position in the cache
+            pos = rng.randrange(len(books))
+            books[pos] = dict(_book(rng, books[pos]['id']))
+            index.upsert(books[pos])
+        elif roll < 0.7:
+            books.append(_book(rng, next_id))
+            next_id += 1
+            index.upsert(books[-1])
+        elif books:
+            removed = books.pop(rng.randrange(len(books)))
+            index.remove(removed['id'])
+    assert len(index) == len(books)
+    _check(index, books)
+
+
+def test_cancelled_search_stops():
+    rng = random.Random(3)
+    books = [_book(rng, i) for i in range(1, 300)]
+    index = SearchIndex(books)
+    token = CancelToken()
+    assert index.search('ми', 'Все', cancel=token) == [b for b in books if _matches(b, 'ми', 'Все')]
+    token.cancel()
+    with pytest.raises(Cancelled):
+        index.search('ми', 'Все', cancel=token)
@@ -0,0 +1,79 @@
+import sys
+import os
+import random
+
+# Ensure repository root is on sys.path so 'client' package can be imported
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import pytest
+
+from client.cancel import CancelToken, Cancelled
+from client.sort_orders import SortOrders, id_key, text_key
+
+
+def _ids(books):
+    return [b['id'] for b in books]
+
+
+def _book(book_id, title, author='Толстой', status='доступна'):
+    return {'id': book_id, 'title': title, 'author': author, 'status': status, 'reserved_by': None}
+
+
+def test_ids_sort_numerically_and_cyrillic_casefolded():
+    books = [_book(10, 'ёлка'), _book(9, 'Ель'), _book(100, 'арбуз'), _book(2, 'Яблоко'), _book(1, 'Берёза')]
+    orders = SortOrders(books)
+    assert _ids(orders.order(books, [('id', True)])) == [1, 2, 9, 10, 100]
+    # «ё» = «е» and case does not matter: ёлка goes between Берёза and Ель
+    assert _ids(orders.order(books, [('title', True)])) == [100, 1, 10, 9, 2]
+    assert _ids(orders.order(books, [('title', False)])) == [2, 9, 10, 1, 100]
+
+
+def test_descending_keeps_ties_in_id_order_and_multi_column_is_stable():
+    books = [_book(i, 'Война и мир' if i % 2 else 'Анна Каренина', author='Толстой' if i < 4 else 'Гоголь') for i in range(1, 7)]
+    orders = SortOrders(books)
+    assert _ids(orders.order(books, [('author', False)])) == [1, 2, 3, 4, 5, 6]
+    assert _ids(orders.order(books, [('title', False)])) == [1, 3, 5, 2, 4, 6]
+    assert _ids(orders.order(books, [('author', True), ('title', True)])) == [4, 6, 5, 2, 1, 3]
+    assert _ids(orders.order(books, [('author', True), ('title', False)])) == [5, 4, 6, 1, 3, 2]
+
+
+def test_incremental_updates_match_full_sort():
+    rng = random.Random(3)
+    words = ['Анна', 'ёж', 'Ежевика', 'мир', 'Мир', 'war', '']
+    books = {i: _book(i, rng.choice(words), rng.choice(words)) for i in range(1, 200)}
+    orders = SortOrders(books.values())
+    specs = [[('title', True)], [('title', False)], [('author', True), ('id', False)]]
+    for spec in specs:
+        orders.order(list(books.values()), spec)
+    for step in range(300):
+        book_id = rng.randrange(1, 260)
+        if step % 3 == 0 and book_id in books:
+            del books[book_id]
+            orders.remove(book_id)
+        else:
+            books[book_id] = _book(book_id, rng.choice(words), rng.choice(words))
+            orders.upsert(books[book_id])
+    shown = list(books.values())
+    for spec in specs:
+        assert _ids(orders.order(shown, spec)) == _ids(_reference(shown, spec)), spec
+
+
+def _reference(books, spec):
+    # ties by ascending id, then each key from the last to the primary (Python sort is stable)
+    result = sorted(books, key=lambda b: b['id'])
+    for column, ascending in reversed(spec):
+        key = id_key if column == 'id' else text_key
+        result.sort(key=lambda b: key(b[column]), reverse=not ascending)
+    return result
+
+
+def test_cancelled_order_stops():
+    books = [_book(i, 'Книга %d' % (i % 7)) for i in range(1, 50)]
+    orders = SortOrders(books)
+    token = CancelToken()
+    token.cancel()
+    for shown, spec in ((books, [('title', False)]), (books[:3], [('title', True), ('id', False)])):
+        with pytest.raises(Cancelled):
+            orders.order(shown, spec, cancel=token)
@@ -0,0 +1,45 @@
+import sys
+import os
+
+# Ensure repository root is on sys.path so 'client' package can be imported
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from client.virtual_list import VirtualWindow
+
+
+def test_window_slice_and_clamping():
+    win = VirtualWindow(visible=10, overscan=3)
+    win.set_total(100000)
+    assert win.slice() == range(0, 13)
+    assert win.scroll_to(99995)
+    # the last page is full, never scrolled past the end
+    assert win.top == 100000 - 10
+    assert win.slice() == range(99990, 100000)
+    assert not win.scroll_by(5)
+    assert win.scroll_to(-7) and win.top == 0
+
+
+def test_scrollbar_commands_map_onto_full_result_set():
+    win = VirtualWindow(visible=20)
+    win.set_total(1000)
+    assert win.handle_scroll_command('moveto', '0.5')
+    assert win.top == 500
+    assert win.fractions() == (0.5, 0.52)
+    win.handle_scroll_command('scroll', '1', 'units')
+    assert win.top == 501
+    win.handle_scroll_command('scroll', '-1', 'pages')
+    assert win.top == 501 - 19
+
+
+def test_ensure_visible_scrolls_minimally():
+    win = VirtualWindow(visible=10)
+    win.set_total(50)
+    assert not win.ensure_visible(9)
+    assert win.ensure_visible(10) and win.top == 1
+    assert win.ensure_visible(0) and win.top == 0
+    # shrinking the result set pulls the window back
+    win.scroll_to(40)
+    win.set_total(15)
+    assert win.top == 5
@@ -1,6 +1,13 @@
+import time
 import tkinter as tk
 from tkinter import ttk
 from typing import Optional
+try:
+    from rowdiff import diff_rows
+    from virtual_list import VirtualWindow
+except ImportError:
+    from .rowdiff import diff_rows
+    from .virtual_list import VirtualWindow
 try:
     import ttkbootstrap as tb
     _HAS_TTB = True
@@ -8,6 +15,13 @@ except Exception:
     _HAS_TTB = False
 
 class MainView:
+    # above this many rows only the visible slice is kept as real Treeview items
+    VIRTUAL_THRESHOLD = 2000
+    # a row diff is applied in slices of at most this long (s), so one frame is never lost
+    FRAME_BUDGET = 0.012
+    # iids per Treeview delete call while applying a diff
+    DELETE_BATCH = 256
+
     def __init__(self, root, add_book_callback, delete_book_callback, issue_book_callback, return_book_callback, reserve_book_callback, on_item_double_click=None, on_refresh=None, on_sort=None):
         self.root = root
         self.root.title("Онлайн библиотека")
@@ -107,11 +121,32 @@ class MainView:
         self.book_list.configure(yscrollcommand=vsb.set)
         self.book_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         vsb.pack(side=tk.RIGHT, fill=tk.Y)
-
-        # attach heading click for sorting
+        self._vsb = vsb
+
+        # Virtual list mode state: full result set, its scroll window and the
+        # selected row's iid (the book id), which survives scrolling out of view
+        self._virtual = False
+        self._vrows = []
+        self._vindex = None
+        self._vwin = VirtualWindow()
+        # iid -> (values, tag) of the rows rendered for the current window
+        self._window_rows = {}
+        self._selected_iid = None
+        # row diff being applied slice by slice: {'steps', 'done', 'after', 'on_done'}
+        self._diff_job = None
+        self.book_list.bind('<Configure>', self._on_tree_configure)
+        self.book_list.bind('<MouseWheel>', self._on_mouse_wheel)
+        self.book_list.bind('<Button-4>', lambda e: self._on_wheel_units(-3))
+        self.book_list.bind('<Button-5>', lambda e: self._on_wheel_units(3))
+        for key, step in (('<Up>', -1), ('<Down>', 1), ('<Prior>', 'page-'), ('<Next>', 'page+'), ('<Home>', 'home'), ('<End>', 'end')):
+            self.book_list.bind(key, lambda e, s=step: self._on_virtual_key(s))
+
+        # attach heading click for sorting; Shift+click adds a secondary sort column
         self._on_sort = on_sort
+        self._heading_texts = {col: self.book_list.heading(col, 'text') for col in columns}
         for col in columns:
             self.book_list.heading(col, command=lambda c=col: self._on_heading_click(c))
+        self.book_list.bind('<Shift-Button-1>', self._on_heading_shift_click)
 
         # Right: controls
         control_frame = ttk.Frame(main_frame, width=280)
@@ -212,9 +247,15 @@ class MainView:
         sel = self.book_list.selection()
         book_id = None
         if sel:
+            self._selected_iid = sel[0]
             vals = self.book_list.item(sel[0], 'values')
             if vals:
                 book_id = vals[0]
+        elif self._virtual and self._selected_iid is not None:
+            # the selected row was scrolled out of the rendered window, not deselected
+            return
+        else:
+            self._selected_iid = None
         # update label
         self.set_selected_book_id(book_id)
         try:
@@ -227,6 +268,9 @@ class MainView:
         self._selection_callback = cb
 
     def get_selected_book_id(self):
+        if self._virtual:
+            # rows are inserted with iid = book id, so this works while scrolled away
+            return self._selected_iid
         sel = self.book_list.selection()
         if not sel:
             return None
@@ -296,6 +340,27 @@ class MainView:
         if self._on_sort:
             self._on_sort(column)
 
+    def _on_heading_shift_click(self, event):
+        if self.book_list.identify_region(event.x, event.y) != 'heading':
+            return None
+        column = self.book_list.identify_column(event.x)
+        try:
+            name = self.book_list['columns'][int(column.lstrip('#')) - 1]
+        except (ValueError, IndexError):
+            return None
+        if self._on_sort:
+            self._on_sort(name, add=True)
+        return 'break'
+
+    def set_sort_indicator(self, spec):
+        """Show ▲/▼ (with the key's position for multi-column sorts) in the sorted headings."""
+        marks = {}
+        for n, (column, ascending) in enumerate(spec, 1):
+            arrow = '▲' if ascending else '▼'
+            marks[column] = f' {arrow}{n}' if len(spec) > 1 else f' {arrow}'
+        for column, text in self._heading_texts.items():
+            self.book_list.heading(column, text=text + marks.get(column, ''))
+
     def _handle_double_click(self, event):
         item_id = self.book_list.identify_row(event.y)
         if not item_id:
@@ -343,11 +408,22 @@ class MainView:
         """
         self._search_callback = cb
 
+    def set_search_abort_callback(self, cb):
+        """Register a callback called on every search keystroke or filter change, before
+        the debounce delay, so the controller can abort a filter pass that is now stale.
+        """
+        self._search_abort_callback = cb
+
     def _schedule_search(self, delay_ms: int = 300):
         """Debounce search calls so controller isn't invoked on every keystroke.
         Call this from key handlers; it will call `_on_search` after `delay_ms`
         of inactivity.
         """
+        try:
+            if getattr(self, '_search_abort_callback', None):
+                self._search_abort_callback()
+        except Exception:
+            pass
         try:
             # cancel previous scheduled call
             if getattr(self, '_search_after_id', None):
@@ -369,13 +445,199 @@ class MainView:
             pass
 
     def _on_delete_key(self, event):
-        sel = self.book_list.selection()
-        if sel:
-            item_id = sel[0]
-            values = self.book_list.item(item_id, 'values')
-            book_id = values[0] if values else None
-            if self._menu_callback:
-                self._menu_callback('delete', book_id)
+        book_id = self.get_selected_book_id()
+        if book_id and self._menu_callback:
+            self._menu_callback('delete', book_id)
+
+    # Rows
+    def apply_row_diff(self, diff, on_done=None):
+        """Reconcile the Treeview with a rowdiff.RowDiff computed by the caller.
+
+        Only changed rows are touched, so selection and scroll position survive.
+        Leaves virtual mode (the caller diffs against an empty snapshot then).
+        The diff is applied in slices of FRAME_BUDGET scheduled with `after`, so a
+        large one never blocks the event loop; `on_done` is called once it is fully
+        applied. A diff still being applied is cancelled (see cancel_row_diff).
+        """
+        self.cancel_row_diff()
+        self._leave_virtual()
+        self._diff_job = {'steps': self._diff_steps(diff), 'done': 0, 'after': None, 'on_done': on_done}
+        self._run_diff_slice()
+
+    def cancel_row_diff(self):
+        """Stop applying the current row diff. Returns how many of its Treeview calls
+        were made (rowdiff.apply_diff tells what is shown then), None if none was running.
+        """
+        job, self._diff_job = self._diff_job, None
+        if job is None:
+            return None
+        try:
+            if job['after'] is not None:
+                self.root.after_cancel(job['after'])
+        except Exception:
+            pass
+        job['steps'].close()
+        return job['done']
+
+    def _run_diff_slice(self):
+        job = self._diff_job
+        if job is None:
+            return
+        job['after'] = None
+        deadline = time.perf_counter() + self.FRAME_BUDGET
+        for done in job['steps']:
+            job['done'] = done
+            if time.perf_counter() >= deadline:
+                job['after'] = self.root.after(1, self._run_diff_slice)
+                return
+        self._diff_job = None
+        if job['on_done']:
+            job['on_done']()
+
+    def _apply_diff(self, diff):
+        for _ in self._diff_steps(diff):
+            pass
+
+    def _diff_steps(self, diff):
+        # Make the Treeview calls for `diff` one at a time (deletes in batches), yielding
+        # the number of calls made so far as rowdiff.diff_ops counts them
+        tree = self.book_list
+        done = 0
+        for i in range(0, len(diff.deletes), self.DELETE_BATCH):
+            batch = diff.deletes[i:i + self.DELETE_BATCH]
+            tree.delete(*batch)
+            done += len(batch)
+            yield done
+        for iid, values, tag in diff.updates:
+            tree.item(iid, values=values, tags=(tag,))
+            done += 1
+            yield done
+        for index, iid, values, tag in diff.inserts:
+            # with a reorder pending the position is fixed by set_children below
+            tree.insert('', tk.END if diff.order is not None else index, iid=iid, values=values, tags=(tag,))
+            done += 1
+            yield done
+        if diff.order is not None:
+            tree.set_children('', *diff.order)
+            done += 1
+            yield done
+
+    def show_virtual_rows(self, rows):
+        """Display a large result set: a sequence of (iid, values, tag), iid being the book id.
+
+        Only the visible slice (plus overscan) becomes Treeview items and the
+        scrollbar is driven by the position inside the full sequence, so `rows`
+        may be a lazy sequence that builds tuples on demand.
+        """
+        tree = self.book_list
+        self.cancel_row_diff()
+        if not self._virtual:
+            self._virtual = True
+            tree.delete(*tree.get_children())
+            self._window_rows = {}
+            # the Treeview's own scrolling only ever covers the window, so the
+            # scrollbar talks to the virtual window instead
+            tree.configure(yscrollcommand='')
+            self._vsb.configure(command=self._on_virtual_scroll)
+            self._vwin.top = 0
+        self._vrows = rows
+        self._vindex = None
+        self._vwin.set_visible(self._visible_row_count())
+        self._vwin.set_total(len(rows))
+        self._render_window()
+
+    def _leave_virtual(self):
+        if not self._virtual:
+            return
+        self._virtual = False
+        self._vrows = []
+        self._vindex = None
+        self._window_rows = {}
+        self.book_list.delete(*self.book_list.get_children())
+        self.book_list.configure(yscrollcommand=self._vsb.set)
+        self._vsb.configure(command=self.book_list.yview)
+
+    def _visible_row_count(self):
+        height = self.book_list.winfo_height()
+        if height <= 1:
+            # not mapped yet: use the widget's configured height
+            return int(self.book_list.cget('height') or 20)
+        try:
+            rowheight = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        except Exception:
+            rowheight = 20
+        # minus the headings row
+        return max(1, (height - rowheight - 4) // rowheight)
+
+    def _render_window(self):
+        # scrolling by a few rows only inserts/deletes the rows entering/leaving the window
+        tree = self.book_list
+        wanted = {}
+        for i in self._vwin.slice():
+            iid, values, tag = self._vrows[i]
+            wanted[iid] = (values, tag)
+        self._apply_diff(diff_rows(self._window_rows, wanted))
+        self._window_rows = wanted
+        if self._selected_iid is not None and tree.exists(self._selected_iid):
+            tree.selection_set(self._selected_iid)
+        tree.yview_moveto(0)
+        self._vsb.set(*self._vwin.fractions())
+
+    def _row_index(self, iid):
+        # iid -> position in the full result set, built lazily once per result set
+        if self._vindex is None:
+            self._vindex = {row[0]: i for i, row in enumerate(self._vrows)}
+        return self._vindex.get(iid)
+
+    def _on_virtual_scroll(self, *args):
+        if self._vwin.handle_scroll_command(*args):
+            self._render_window()
+
+    def _on_wheel_units(self, units):
+        if not self._virtual:
+            return None
+        if self._vwin.scroll_by(units):
+            self._render_window()
+        return 'break'
+
+    def _on_mouse_wheel(self, event):
+        if not self._virtual:
+            return None
+        # Windows reports multiples of 120, macOS small deltas
+        step = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+        return self._on_wheel_units(step * 3)
+
+    def _on_virtual_key(self, step):
+        # Arrow/page keys must be able to leave the rendered window
+        if not self._virtual or not self._vwin.total:
+            return None
+        index = self._row_index(self._selected_iid) if self._selected_iid is not None else None
+        page = max(1, self._vwin.visible - 1)
+        if step == 'home':
+            index = 0
+        elif step == 'end':
+            index = self._vwin.total - 1
+        elif index is None:
+            index = self._vwin.top
+        elif step == 'page-':
+            index -= page
+        elif step == 'page+':
+            index += page
+        else:
+            index += step
+        index = min(max(0, index), self._vwin.total - 1)
+        self._vwin.ensure_visible(index)
+        self._selected_iid = self._vrows[index][0]
+        self._render_window()
+        self.book_list.focus(self._selected_iid)
+        return 'break'
+
+    def _on_tree_configure(self, event):
+        if not self._virtual:
+            return
+        if self._vwin.visible != self._visible_row_count():
+            self._vwin.set_visible(self._visible_row_count())
+            self._render_window()
 
     def set_status(self, text: str):
         self.status_label.config(text=text)
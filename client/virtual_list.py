@@ -0,0 +1,67 @@
+class VirtualWindow:
+    """Scroll state for the virtual Treeview mode.
+
+    Tracks which slice of a large result set is on screen: `top` is the index of the
+    first visible row, `visible` how many rows fit in the widget. Only `slice()` rows
+    (the visible ones plus a small overscan below) become real Treeview items.
+    """
+
+    def __init__(self, visible: int = 20, overscan: int = 5):
+        self.total = 0
+        self.top = 0
+        self.visible = max(1, visible)
+        self.overscan = overscan
+
+    def set_total(self, total: int):
+        self.total = max(0, total)
+        self._clamp()
+
+    def set_visible(self, visible: int):
+        self.visible = max(1, visible)
+        self._clamp()
+
+    def max_top(self) -> int:
+        return max(0, self.total - self.visible)
+
+    def _clamp(self):
+        self.top = min(max(0, self.top), self.max_top())
+
+    def scroll_to(self, top: int) -> bool:
+        """Move the window so `top` is the first visible row; returns True if it moved."""
+        old = self.top
+        self.top = int(top)
+        self._clamp()
+        return self.top != old
+
+    def scroll_by(self, rows: int) -> bool:
+        return self.scroll_to(self.top + rows)
+
+    def handle_scroll_command(self, *args) -> bool:
+        """Apply a Tk scrollbar command: ('moveto', fraction) or ('scroll', n, 'units'|'pages')."""
+        if not args:
+            return False
+        if args[0] == 'moveto':
+            return self.scroll_to(round(float(args[1]) * self.total))
+        if args[0] == 'scroll':
+            step = int(args[1])
+            if len(args) > 2 and args[2] == 'pages':
+                step *= max(1, self.visible - 1)
+            return self.scroll_by(step)
+        return False
+
+    def ensure_visible(self, index: int) -> bool:
+        """Scroll the minimum amount needed for row `index` to be on screen."""
+        if index < self.top:
+            return self.scroll_to(index)
+        if index >= self.top + self.visible:
+            return self.scroll_to(index - self.visible + 1)
+        return False
+
+    def slice(self) -> range:
+        return range(self.top, min(self.total, self.top + self.visible + self.overscan))
+
+    def fractions(self):
+        """(first, last) for `Scrollbar.set`, relative to the whole result set."""
+        if self.total <= 0:
+            return 0.0, 1.0
+        return self.top / self.total, min(1.0, (self.top + self.visible) / self.total)
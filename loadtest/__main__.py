@@ -0,0 +1,156 @@
+import argparse
+import contextlib
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from . import __doc__ as USAGE
+from .catalog import generate_books, seed_server, write_ndjson
+from .driver import ROOT, catalog_ids, replay, reset_database, serve
+from .report import compare, format_report, load_report, save_report, summarize
+from .workload import load_trace, make_trace, save_trace
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+@contextlib.contextmanager
+def _target(args):
+    """(base URL, backend) of the server to load: the given --url or one started with --serve."""
+    if args.url:
+        yield args.url.rstrip('/'), args.backend
+        return
+    database_url = args.database_url
+    if database_url is None:
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='loadtest-db-'), 'library.db')
+    if args.reset_database:
+        reset_database(database_url)
+    with serve(database_url, workers=args.workers) as url:
+        yield url, database_url.split(':', 1)[0].split('+', 1)[0]
+
+
+def cmd_catalog(args):
+    books = generate_books(args.books, args.seed)
+    if args.url:
+        print(seed_server(args.url.rstrip('/'), books))
+    else:
+        with open(args.out, 'w', encoding='utf-8') as fp:
+            write_ndjson(books, fp)
+
+
+def cmd_trace(args):
+    header, operations = make_trace(args.books, args.ops, catalog_seed=args.catalog_seed, seed=args.seed)
+    save_trace(args.out, header, operations)
+    kinds = {}
+    for op in operations:
+        kinds[op['op']] = kinds.get(op['op'], 0) + 1
+    print(f'{len(operations)} operations: ' + ', '.join(f'{k} {n}' for k, n in sorted(kinds.items())))
+
+
+def cmd_run(args):
+    header, operations, digest = load_trace(args.trace)
+    with _target(args) as (url, backend):
+        seed_time = None
+        if not args.skip_seed:
+            existing = requests.get(f'{url}/books', params={'limit': 1}, timeout=30).json()['items']
+            if existing:
+                sys.exit(f'{url} already has books: replay needs a freshly seeded catalog '
+                         '(--reset-database, or --skip-seed if it was seeded from the same catalog)')
+            start = time.perf_counter()
+            seed_server(url, generate_books(header['books'], header['catalog_seed']))
+            seed_time = round(time.perf_counter() - start, 3)
+        ids = catalog_ids(url)
+        if len(ids) != header['books']:
+            sys.exit(f'the server has {len(ids)} books, the trace was made for {header["books"]}')
+        started = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        results, elapsed = replay(url, operations, ids, concurrency=args.concurrency, timeout=args.timeout)
+    meta = {
+        'label': args.label or backend,
+        'backend': backend,
+        'url': args.url,
+        'workers': None if args.url else args.workers,
+        'concurrency': args.concurrency,
+        'trace': os.path.basename(args.trace),
+        'trace_sha256': digest,
+        'trace_header': header,
+        'seed_s': seed_time,
+        'started': started,
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'host': platform.node(),
+    }
+    report = summarize(results, elapsed, meta)
+    print(format_report(report))
+    if args.out:
+        save_report(args.out, report)
+
+
+def cmd_compare(args):
+    print(compare(load_report(args.base), load_report(args.new)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m loadtest', description=USAGE.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog='\n'.join(USAGE.splitlines()[1:]))
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('catalog', help='generate the synthetic catalog (NDJSON file or straight into a server)')
+    p.add_argument('--books', type=int, default=100000)
+    p.add_argument('--seed', type=int, default=0)
+    dest = p.add_mutually_exclusive_group(required=True)
+    dest.add_argument('--out', help='NDJSON file for POST /books/bulk or flask import-books')
+    dest.add_argument('--url', help='seed this server through POST /books/bulk')
+    p.set_defaults(func=cmd_catalog)
+
+    p = sub.add_parser('trace', help='make a workload trace for a catalog')
+    p.add_argument('--books', type=int, default=100000, help='catalog size')
+    p.add_argument('--catalog-seed', type=int, default=0)
+    p.add_argument('--ops', type=int, default=20000)
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('--out', required=True)
+    p.set_defaults(func=cmd_trace)
+
+    p = sub.add_parser('run', help='seed a server with the trace\'s catalog and replay the trace')
+    p.add_argument('--trace', required=True)
+    target = p.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='an already running server (e.g. docker compose up)')
+    target.add_argument('--serve', choices=['sqlite', 'postgres'],
+                        help='migrate and start gunicorn as the Dockerfile does')
+    p.add_argument('--database-url', help='for --serve; default for sqlite is a fresh temporary file')
+    p.add_argument('--reset-database', action='store_true', help='delete all books before starting (--serve)')
+    p.add_argument('--skip-seed', action='store_true', help='the server already holds the trace\'s catalog')
+    p.add_argument('--backend', default='unknown', help='backend name to record for --url')
+    p.add_argument('--workers', type=int, default=2)
+    p.add_argument('--concurrency', type=int, default=8)
+    p.add_argument('--timeout', type=float, default=30)
+    p.add_argument('--label')
+    p.add_argument('--out', help='save the JSON report here')
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser('compare', help='compare two JSON reports')
+    p.add_argument('base')
+    p.add_argument('new')
+    p.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    if getattr(args, 'serve', None) == 'postgres' and not args.database_url:
+        parser.error('--serve postgres needs --database-url')
+    if getattr(args, 'serve', None) == 'postgres' and not args.database_url.startswith('postgres'):
+        parser.error('--serve postgres needs a postgresql:// --database-url')
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Synthetic catalog: Cyrillic titles and authors with a realistic status mix."""
+import json
+import random
+
+import requests
+
+# share of each status in a generated catalog (a lending library: most books on the shelf)
+STATUS_MIX = {'доступна': 0.7, 'выдана': 0.2, 'зарезервирована': 0.1}
+
+ADJECTIVES = ['Тихий', 'Белый', 'Последний', 'Красный', 'Долгий', 'Зимний', 'Старый', 'Северный',
+              'Золотой', 'Вишнёвый', 'Тёмный', 'Живой', 'Мёртвый', 'Чужой', 'Лунный', 'Ночной']
+NOUNS = ['Дон', 'сад', 'путь', 'берег', 'город', 'дом', 'лес', 'ветер', 'огонь', 'остров',
+         'мост', 'вечер', 'колокол', 'пароход', 'переулок', 'маяк']
+SUBJECTS = ['и мир', 'и наказание', 'над пропастью', 'у моря', 'без героя', 'в степи',
+            'на рассвете', 'после войны', 'для двоих', 'под снегом']
+SURNAMES = ['Толстой', 'Достоевский', 'Гоголь', 'Тургенев', 'Гончаров', 'Островский', 'Чехов',
+            'Лермонтов', 'Пушкин', 'Булгаков', 'Шолохов', 'Платонов', 'Бунин', 'Куприн',
+            'Ахматова', 'Цветаева', 'Пастернак', 'Паустовский', 'Распутин', 'Улицкая']
+INITIALS = 'АБВГДЕЖИКЛМНОПРСТФЭЮЯ'
+READERS = ['Иванов', 'Петрова', 'Сидоров', 'Кузнецова', 'Смирнов', 'Попова', 'Васильев',
+           'Соколова', 'Михайлов', 'Новикова', 'Фёдоров', 'Морозова']
+
+
+def _title(rng):
+    title = f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}'
+    roll = rng.random()
+    if roll < 0.3:
+        title += f' {rng.choice(SUBJECTS)}'
+    elif roll < 0.4:
+        title += f'. Том {rng.randint(1, 4)}'
+    return title
+
+
+def _author(rng):
+    return f'{rng.choice(INITIALS)}. {rng.choice(INITIALS)}. {rng.choice(SURNAMES)}'
+
+
+def reader_name(rng):
+    return f'{rng.choice(READERS)} {rng.choice(INITIALS)}.'
+
+
+def generate_books(n, seed=0, status_mix=STATUS_MIX):
+    """Yield `n` books as POST /books/bulk records: the same seed gives the same books.
+
+    Titles and authors are Cyrillic and repeat the way real ones do (many books
+    per author, common words in titles); statuses follow `status_mix`, and
+    reserved books carry a reader name.
+    """
+    rng = random.Random(seed)
+    statuses = list(status_mix)
+    weights = [status_mix[s] for s in statuses]
+    for _ in range(n):
+        status = rng.choices(statuses, weights)[0]
+        yield {
+            'title': _title(rng),
+            'author': _author(rng),
+            'status': status,
+            'reserved_by': reader_name(rng) if status == 'зарезервирована' else None,
+        }
+
+
+def write_ndjson(books, fp):
+    for book in books:
+        fp.write(json.dumps(book, ensure_ascii=False) + '\n')
+
+
+def seed_server(url, books, batch_size=5000, timeout=600):
+    """Stream `books` to POST /books/bulk; returns the import summary."""
+    body = (json.dumps(book, ensure_ascii=False).encode('utf-8') + b'\n' for book in books)
+    resp = requests.post(f'{url}/books/bulk', params={'batch_size': batch_size}, data=body,
+                         headers={'Content-Type': 'application/x-ndjson'}, timeout=timeout)
+    resp.raise_for_status()
+    summary = resp.json()
+    if summary.get('rejected'):
+        raise RuntimeError(f'the server rejected {summary["rejected"]} books: {summary.get("errors")!r:.300}')
+    return summary
@@ -0,0 +1,145 @@
+"""Replays a workload trace against a running server, or against one it starts itself.
+
+serve() starts the server the way the Dockerfile does (flask db upgrade, then
+gunicorn 'server.app:create_app()' --preload --workers N) on a free local
+port, with its own response-cache and metrics files so runs do not share state.
+"""
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# what the client sends for the full list (see client/model.py)
+LIST_ALL_ACCEPT = 'application/vnd.library.columnar+json, application/json;q=0.5'
+PAGE_SIZE = 1000
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def serve(database_url, workers=2, startup_timeout=60):
+    """Run gunicorn with DATABASE_URL=`database_url`; yields its base URL."""
+    port = _free_port()
+    state = tempfile.mkdtemp(prefix='loadtest-')
+    env = dict(os.environ, DATABASE_URL=database_url,
+               RESPONSE_CACHE_PATH=os.path.join(state, 'response_cache.sqlite'),
+               METRICS_PATH=os.path.join(state, 'metrics.sqlite'), FLASK_APP='server.app')
+    subprocess.run([sys.executable, '-m', 'flask', 'db', 'upgrade'], cwd=ROOT, env=env, check=True)
+    cmd = [sys.executable, '-m', 'gunicorn', 'server.app:create_app()', '-b', f'127.0.0.1:{port}',
+           '--workers', str(workers), '--preload']
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with code {proc.returncode}')
+            try:
+                if requests.get(f'{url}/health', timeout=1).status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f'gunicorn did not answer /health within {startup_timeout}s')
+            time.sleep(0.2)
+        yield url
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def reset_database(database_url):
+    """Empty the books tables (serve() creates them with the migrations if missing)."""
+    from sqlalchemy import create_engine, inspect, text
+
+    engine = create_engine(database_url)
+    try:
+        tables = [t for t in ('book_changes', 'books') if inspect(engine).has_table(t)]
+        with engine.begin() as conn:
+            if engine.dialect.name == 'postgresql' and tables:
+                conn.execute(text(f'TRUNCATE {", ".join(tables)} RESTART IDENTITY'))
+            else:
+                for table in tables:
+                    conn.execute(text(f'DELETE FROM {table}'))
+    finally:
+        engine.dispose()
+
+
+def catalog_ids(url, timeout=60):
+    """IDs of all books in ascending order (= catalog positions after a fresh seed)."""
+    ids = []
+    params = {'limit': PAGE_SIZE, 'sort': 'id', 'order': 'asc'}
+    with requests.Session() as session:
+        while True:
+            resp = session.get(f'{url}/books', params=params, timeout=timeout)
+            resp.raise_for_status()
+            page = resp.json()
+            ids.extend(book['id'] for book in page['items'])
+            if not page['next_cursor']:
+                return ids
+            params['cursor'] = page['next_cursor']
+
+
+def _request(op, ids):
+    kind = op['op']
+    if kind == 'list':
+        return 'GET', '/books', {'params': op['params']}
+    if kind == 'list_all':
+        return 'GET', '/books', {'headers': {'Accept': LIST_ALL_ACCEPT}}
+    if kind == 'add':
+        return 'POST', '/books', {'json': {'title': op['title'], 'author': op['author']}}
+    book_id = ids[op['book']]
+    if kind == 'delete':
+        return 'DELETE', f'/books/{book_id}', {}
+    body = {'name': op['name']} if op.get('name') else {}
+    return 'PUT', f'/books/{kind}/{book_id}', {'json': body}
+
+
+def replay(url, operations, ids, concurrency=8, timeout=30):
+    """Send `operations` in trace order from `concurrency` threads (each takes the next
+    operation once its previous one is answered). Returns (results, elapsed seconds);
+    a result is {'op', 'status' (None without a response), 'latency' (s, until the body is read)}."""
+    requests_iter = iter([(op['op'],) + _request(op, ids) for op in operations])
+    lock = threading.Lock()
+    results = []
+
+    def worker():
+        # no retries: a failed request is an error of the run, not something to hide
+        with requests.Session() as session:
+            session.mount('http://', HTTPAdapter(pool_maxsize=1, max_retries=0))
+            while True:
+                with lock:
+                    item = next(requests_iter, None)
+                if item is None:
+                    return
+                kind, method, path, kwargs = item
+                start = time.perf_counter()
+                try:
+                    resp = session.request(method, url + path, timeout=timeout, **kwargs)
+                    status = resp.status_code
+                except requests.RequestException:
+                    status = None
+                results.append({'op': kind, 'status': status, 'latency': time.perf_counter() - start})
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - start
@@ -0,0 +1,102 @@
+"""Load-test reports: throughput, latency percentiles and error rate, saved as JSON."""
+import json
+import math
+
+REPORT_FORMAT = 1
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, p):
+    """p-th percentile (0..100) of an ascending list, interpolating between ranks."""
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * p / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def _stats(results, elapsed):
+    latencies = sorted(r['latency'] for r in results)
+    errors = sum(1 for r in results if r['status'] is None or r['status'] >= 500)
+    # 4xx: the server refused a transition (the replay order drifted under concurrency)
+    rejected = sum(1 for r in results if r['status'] is not None and 400 <= r['status'] < 500)
+    stats = {
+        'requests': len(results),
+        'throughput_rps': round(len(results) / elapsed, 2) if elapsed else None,
+        'errors': errors,
+        'error_rate': round(errors / len(results), 6) if results else 0.0,
+        'rejected': rejected,
+        'latency_ms': {'mean': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+                       'max': round(latencies[-1] * 1000, 3) if latencies else None},
+    }
+    for p in PERCENTILES:
+        value = percentile(latencies, p)
+        stats['latency_ms'][f'p{p}'] = round(value * 1000, 3) if value is not None else None
+    return stats
+
+
+def summarize(results, elapsed, meta):
+    """Report for replay results: dicts with op, status (None if no response) and latency (s)."""
+    by_op = {}
+    for r in results:
+        by_op.setdefault(r['op'], []).append(r)
+    return {
+        'format': REPORT_FORMAT,
+        'meta': meta,
+        'elapsed_s': round(elapsed, 3),
+        'overall': _stats(results, elapsed),
+        'operations': {op: _stats(rs, elapsed) for op, rs in sorted(by_op.items())},
+    }
+
+
+def save_report(path, report):
+    with open(path, 'w', encoding='utf-8') as fp:
+        json.dump(report, fp, ensure_ascii=False, indent=2)
+        fp.write('\n')
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as fp:
+        report = json.load(fp)
+    if report.get('format') != REPORT_FORMAT:
+        raise ValueError(f'{path}: unsupported report format {report.get("format")!r}')
+    return report
+
+
+def format_report(report):
+    lines = [f'{"operation":<10}{"requests":>9}{"req/s":>9}{"p50, ms":>10}{"p95, ms":>10}'
+             f'{"p99, ms":>10}{"errors":>8}{"4xx":>6}']
+    rows = list(report['operations'].items()) + [('overall', report['overall'])]
+    for name, s in rows:
+        lat = s['latency_ms']
+        lines.append(f'{name:<10}{s["requests"]:>9}{s["throughput_rps"] or 0:>9.1f}{lat["p50"] or 0:>10.1f}'
+                     f'{lat["p95"] or 0:>10.1f}{lat["p99"] or 0:>10.1f}{s["errors"]:>8}{s["rejected"]:>6}')
+    return '\n'.join(lines)
+
+
+def compare(base, new):
+    """Side-by-side table of two reports: throughput and percentiles with the relative change."""
+    def change(a, b):
+        if not a or b is None:
+            return ''
+        return f'{(b - a) / a * 100:+.0f}%'
+
+    lines = [f'base: {base["meta"].get("label", "")}  new: {new["meta"].get("label", "")}']
+    if base['meta'].get('trace_sha256') != new['meta'].get('trace_sha256'):
+        lines.append('warning: the reports come from different traces')
+    lines.append(f'{"operation":<10}{"metric":<9}{"base":>10}{"new":>10}{"change":>8}')
+    names = sorted(set(base['operations']) | set(new['operations'])) + ['overall']
+    for name in names:
+        a = base['overall'] if name == 'overall' else base['operations'].get(name)
+        b = new['overall'] if name == 'overall' else new['operations'].get(name)
+        if a is None or b is None:
+            lines.append(f'{name:<10}only in {"new" if a is None else "base"}')
+            continue
+        metrics = [('req/s', a['throughput_rps'], b['throughput_rps'])]
+        metrics += [(f'p{p}, ms', a['latency_ms'][f'p{p}'], b['latency_ms'][f'p{p}']) for p in PERCENTILES]
+        metrics.append(('errors', a['error_rate'], b['error_rate']))
+        for metric, x, y in metrics:
+            lines.append(f'{name:<10}{metric:<9}{x if x is not None else "-":>10}'
+                         f'{y if y is not None else "-":>10}{change(x, y):>8}')
+    return '\n'.join(lines)
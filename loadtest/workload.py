@@ -0,0 +1,153 @@
+"""Mixed workload traces: a fixed sequence of requests replayed by loadtest.driver.
+
+A trace is made for a catalog from loadtest.catalog by simulating the book
+states, so issue/return/reserve/delete requests target books that are in a state
+the server accepts (when replayed in order on a freshly seeded catalog). Books
+are referred to by their position in the catalog, not by ID: IDs depend on the
+database and are resolved at replay time.
+"""
+import hashlib
+import json
+import random
+
+from .catalog import STATUS_MIX, generate_books, reader_name
+
+TRACE_FORMAT = 1
+
+# relative weight of each request kind: mostly browsing, the rest lending
+WORKLOAD_MIX = {
+    'list': 0.55,       # one page of GET /books with a filter and a sort
+    'list_all': 0.01,   # the full GET /books (the client's initial load)
+    'issue': 0.14,
+    'return': 0.13,
+    'reserve': 0.08,
+    'add': 0.06,
+    'delete': 0.03,
+}
+SORTS = ['id', 'title', 'author', 'status', 'reserved_by']
+QUERIES = ['сад', 'толстой', 'тихий дон', 'Том 2', 'пушкин', 'берег', 'ё', 'остров']
+
+
+class _Pool:
+    """Set of catalog positions with O(1) add, remove and random choice."""
+
+    def __init__(self):
+        self._items = []
+        self._where = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, item):
+        self._where[item] = len(self._items)
+        self._items.append(item)
+
+    def remove(self, item):
+        i = self._where.pop(item)
+        last = self._items.pop()
+        if i < len(self._items):
+            self._items[i] = last
+            self._where[last] = i
+
+    def choice(self, rng):
+        return self._items[rng.randrange(len(self._items))]
+
+
+def _list_params(rng):
+    params = {'limit': rng.choice([20, 50, 100, 100, 200])}
+    if rng.random() < 0.5:
+        params['sort'] = rng.choice(SORTS)
+        params['order'] = rng.choice(['asc', 'desc'])
+    if rng.random() < 0.3:
+        params['status'] = rng.choice(list(STATUS_MIX))
+    if rng.random() < 0.2:
+        params['q'] = rng.choice(QUERIES)
+    return params
+
+
+def make_trace(books, ops, catalog_seed=0, seed=1, mix=WORKLOAD_MIX):
+    """Return (header, operations) for `ops` requests against the catalog of
+    generate_books(books, catalog_seed)."""
+    rng = random.Random(seed)
+    pools = {status: _Pool() for status in STATUS_MIX}
+    status_of = []
+    reserved_by = {}
+    for i, book in enumerate(generate_books(books, catalog_seed)):
+        pools[book['status']].add(i)
+        status_of.append(book['status'])
+        if book['reserved_by']:
+            reserved_by[i] = book['reserved_by']
+    available, issued, reserved = (pools[s] for s in ('доступна', 'выдана', 'зарезервирована'))
+
+    def move(i, status):
+        pools[status_of[i]].remove(i)
+        status_of[i] = status
+        if status is not None:
+            pools[status].add(i)
+
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    operations = []
+    while len(operations) < ops:
+        kind = rng.choices(kinds, weights)[0]
+        if kind == 'list':
+            operations.append({'op': 'list', 'params': _list_params(rng)})
+        elif kind == 'list_all':
+            operations.append({'op': 'list_all'})
+        elif kind == 'add':
+            book = next(generate_books(1, rng.getrandbits(32)))
+            operations.append({'op': 'add', 'title': book['title'], 'author': book['author']})
+        elif kind == 'issue':
+            # a reserved book goes to the reader who reserved it
+            pool = reserved if reserved and rng.random() < 0.3 else available
+            if not pool:
+                continue
+            i = pool.choice(rng)
+            op = {'op': 'issue', 'book': i}
+            if status_of[i] == 'зарезервирована':
+                op['name'] = reserved_by.pop(i)
+            move(i, 'выдана')
+            operations.append(op)
+        elif kind == 'return':
+            if not issued:
+                continue
+            i = issued.choice(rng)
+            move(i, 'доступна')
+            operations.append({'op': 'return', 'book': i})
+        elif kind == 'reserve':
+            if not available:
+                continue
+            i = available.choice(rng)
+            reserved_by[i] = reader_name(rng)
+            move(i, 'зарезервирована')
+            operations.append({'op': 'reserve', 'book': i, 'name': reserved_by[i]})
+        elif kind == 'delete':
+            pool = rng.choice([p for p in pools.values() if p] or [None])
+            if pool is None:
+                continue
+            i = pool.choice(rng)
+            reserved_by.pop(i, None)
+            move(i, None)
+            operations.append({'op': 'delete', 'book': i})
+    header = {'format': TRACE_FORMAT, 'books': books, 'catalog_seed': catalog_seed, 'seed': seed,
+              'ops': ops, 'mix': dict(mix)}
+    return header, operations
+
+
+def save_trace(path, header, operations):
+    with open(path, 'w', encoding='utf-8') as fp:
+        fp.write(json.dumps(header, ensure_ascii=False) + '\n')
+        for op in operations:
+            fp.write(json.dumps(op, ensure_ascii=False) + '\n')
+
+
+def load_trace(path):
+    """(header, operations, sha256 of the file) of a saved trace."""
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    lines = data.decode('utf-8').splitlines()
+    header = json.loads(lines[0])
+    if header.get('format') != TRACE_FORMAT:
+        raise ValueError(f'{path}: unsupported trace format {header.get("format")!r}')
+    operations = [json.loads(line) for line in lines[1:] if line.strip()]
+    return header, operations, hashlib.sha256(data).hexdigest()
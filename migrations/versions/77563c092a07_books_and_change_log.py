@@ -0,0 +1,67 @@
+"""books and change log
+
+Таблицы books и book_changes с индексами для keyset-пагинации. Раньше схему
+создавало приложение при импорте (create_all + ALTER TABLE), поэтому миграция
+работает и на такой базе: недостающие таблицы, колонка reserved_by и индексы
+добавляются, существующие остаются как есть.
+
+Revision ID: 77563c092a07
+Revises: 
+Create Date: 2026-10-18 18:43:12.268174
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '77563c092a07'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Составные индексы (ключ сортировки, id) — см. BOOK_INDEXES в server/app.py.
+# reserved_by — по coalesce: индекс по выражению, которое SQLite не отражает,
+# поэтому CREATE INDEX IF NOT EXISTS вместо проверки через инспектор.
+BOOK_INDEXES = [
+    ('ix_books_title_id', 'title, id'),
+    ('ix_books_author_id', 'author, id'),
+    ('ix_books_status_id', 'status, id'),
+    ('ix_books_reserved_by_id', "coalesce(reserved_by, ''), id"),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+    if 'books' not in tables:
+        op.create_table(
+            'books',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(length=120), nullable=False),
+            sa.Column('author', sa.String(length=120), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=True),
+            sa.Column('issued_date', sa.DateTime(), nullable=True),
+            sa.Column('reserved_by', sa.String(length=120), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+    elif 'reserved_by' not in {c['name'] for c in inspector.get_columns('books')}:
+        op.add_column('books', sa.Column('reserved_by', sa.String(length=120), nullable=True))
+    if 'book_changes' not in tables:
+        op.create_table(
+            'book_changes',
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.Column('book_id', sa.Integer(), nullable=True),
+            sa.Column('op', sa.String(length=10), nullable=False),
+            sa.Column('changed_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('version'),
+            sqlite_autoincrement=True,
+        )
+    op.execute('CREATE INDEX IF NOT EXISTS ix_book_changes_book_id ON book_changes (book_id)')
+    for name, columns in BOOK_INDEXES:
+        op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON books ({columns})')
+
+
+def downgrade():
+    op.drop_table('book_changes')
+    op.drop_table('books')
@@ -0,0 +1,29 @@
+"""full-text search index
+
+SQLite — FTS5 с триггерами, Postgres — tsvector + pg_trgm (server/search.py).
+Если СУБД их не поддерживает, миграция проходит без индекса, а /books/search
+работает через LIKE.
+
+Revision ID: 856d6ac2d06a
+Revises: 77563c092a07
+Create Date: 2026-10-18 18:43:15.644333
+
+"""
+from alembic import op
+
+from server import search
+
+
+# revision identifiers, used by Alembic.
+revision = '856d6ac2d06a'
+down_revision = '77563c092a07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    search.create(op.get_bind())
+
+
+def downgrade():
+    search.drop(op.get_bind())
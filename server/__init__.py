@@ -1,2 +1,2 @@
 # server package
-from .app import app
+from .app import create_app
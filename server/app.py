@@ -1,18 +1,184 @@
 import os
 os.environ['PGCLIENTENCODING'] = 'UTF8'
 
-from flask import Flask, jsonify, request
+import click
+from flask import Blueprint, Flask, Response, current_app, jsonify, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from sqlalchemy import text
+from sqlalchemy import and_, bindparam, event, func, or_, select, text
 from datetime import datetime
+import base64
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import logging
+import tempfile
+import threading
+import time
+import weakref
+import zlib
+
+try:
+    from . import bulk, cache, metrics, search
+except ImportError:
+    # запуск как скрипт: python server/app.py
+    import bulk
+    import cache
+    import metrics
+    import search
+
+# orjson — необязательная зависимость: заметно быстрее стандартного json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+# brotli / zstandard — необязательные кодеки сжатия ответов; gzip есть всегда
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Начало жизни процесса: импорт модуля или fork воркера из мастера gunicorn (--preload)
+_process_started = time.perf_counter()
+_first_request_seen = False
+
+# Движки, созданные в этом процессе; после fork их пулы соединений не наследуются
+_engines = weakref.WeakSet()
+
+
+class _SQLAlchemy(SQLAlchemy):
+    def create_engine(self, sa_url, engine_opts):
+        # Движок создаётся при первом обращении к БД — сразу подключаем счётчики запросов
+        engine = super().create_engine(sa_url, engine_opts)
+        _instrument_engine(engine)
+        _engines.add(engine)
+        return engine
+
+
+db = _SQLAlchemy()
+migrate = Migrate()
+# Маршруты и обработчики запросов; create_app регистрирует их в приложении.
+# cli_group=None — команды остаются на верхнем уровне: flask import-books
+bp = Blueprint('library', __name__, cli_group=None)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'migrations')
+
+# Сколько SQL-запросов одного HTTP-запроса сохранять в трассировке
+MAX_TRACED_STATEMENTS = 200
+slow_log = logging.getLogger('library.slow_requests')
+if os.environ.get('SLOW_LOG_PATH'):
+    _slow_handler = logging.FileHandler(os.environ['SLOW_LOG_PATH'], encoding='utf-8')
+    _slow_handler.setFormatter(logging.Formatter('%(message)s'))
+    slow_log.addHandler(_slow_handler)
+    slow_log.propagate = False
+
+
+def create_app(config=None):
+    """Создаёт приложение. С БД при этом ничего не происходит: схему создают и обновляют
+    миграции (flask db upgrade), соединение открывается при первом запросе, поэтому
+    импорт и gunicorn --preload не зависят от доступности базы."""
+    app = Flask(__name__)
+    # Поддержка через переменную окружения `DATABASE_URL`, иначе fallback на SQLite
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or 'sqlite:///library.db'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Трассировка запросов (по умолчанию выключена): TRACE_REQUESTS=1 — для всех запросов,
+    # TRACE_HEADER=1 — для запросов с заголовком X-Request-Trace: 1. Трассируемый ответ
+    # получает заголовок Server-Timing (db, serialize, total); потоковое тело при этом
+    # собирается в памяти целиком, поэтому без явного включения заголовок игнорируется
+    app.config['TRACE_REQUESTS'] = os.environ.get('TRACE_REQUESTS') == '1'
+    app.config['TRACE_HEADER'] = os.environ.get('TRACE_HEADER') == '1'
+    # Запросы дольше SLOW_REQUEST_MS миллисекунд пишутся в журнал медленных запросов
+    # (JSON на строку, вместе с их SQL); 0 — журнал выключен
+    app.config['SLOW_REQUEST_MS'] = float(os.environ.get('SLOW_REQUEST_MS', 0))
+    # Кэш ответов GET /books и метрики для GET /metrics, общие для воркеров gunicorn
+    # (локальные SQLite-файлы); без пути — файл во временном каталоге, свой для каждой БД
+    app.config['RESPONSE_CACHE_PATH'] = os.environ.get('RESPONSE_CACHE_PATH')
+    app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 256))
+    app.config['RESPONSE_CACHE_MAX_BYTES'] = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    app.config['METRICS_PATH'] = os.environ.get('METRICS_PATH')
+    app.config.update(config or {})
+    db.init_app(app)
+    migrate.init_app(app, db, directory=MIGRATIONS_DIR)
+    app.register_blueprint(bp)
+
+    # Путь по умолчанию зависит от БД, чтобы разные базы не делили один кэш
+    db_hash = hashlib.sha1(app.config['SQLALCHEMY_DATABASE_URI'].encode('utf-8')).hexdigest()[:10]
+    response_cache = cache.ResponseCache(
+        app.config['RESPONSE_CACHE_PATH'] or os.path.join(tempfile.gettempdir(), f'library-response-cache-{db_hash}.sqlite'),
+        max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+        max_bytes=app.config['RESPONSE_CACHE_MAX_BYTES'],
+    )
+    # База могла быть пересоздана (версии начались заново) — старые ответы не годятся
+    response_cache.invalidate()
+    request_metrics = _create_metrics(
+        app.config['METRICS_PATH'] or os.path.join(tempfile.gettempdir(), f'library-metrics-{db_hash}.sqlite'))
+    app.extensions['library'] = _AppState(db_hash, response_cache, request_metrics)
+    return app
+
+
+class _AppState:
+    """Состояние одного приложения (app.extensions['library']): в процессе их может быть несколько."""
+
+    def __init__(self, db_hash, response_cache, request_metrics):
+        self.db_hash = db_hash
+        self.response_cache = response_cache
+        self.request_metrics = request_metrics
+        # Есть ли индекс полнотекстового поиска (его создаёт миграция); проверяется один
+        # раз при первом поиске, без индекса /books/search работает через LIKE
+        self.search_enabled = None
+
+
+def _state():
+    return current_app.extensions['library']
+
+
+def _create_metrics(path):
+    m = metrics.Metrics(path)
+    m.describe('library_http_requests_total', 'counter', 'Запросы по методу, маршруту и коду ответа.')
+    m.describe('library_http_request_duration_seconds', 'histogram',
+               'Время обработки запроса до отправки последнего байта, секунды.')
+    m.describe('library_http_response_bytes_total', 'counter', 'Отправлено байт тела ответа (после сжатия).')
+    m.describe('library_http_requests_in_flight', 'gauge', 'Запросы в обработке сейчас, по всем воркерам.')
+    m.describe('library_db_statements_total', 'counter', 'SQL-запросы, выполненные при обработке маршрута.')
+    m.describe('library_db_statement_duration_seconds_total', 'counter',
+               'Суммарное время SQL-запросов маршрута, секунды.')
+    m.describe('library_worker_startup_seconds', 'gauge',
+               'От импорта приложения (или fork воркера) до его первого запроса, секунды, по pid.')
+    return m
+
+
+def _after_fork():
+    # Воркер gunicorn, созданный fork из мастера (--preload): соединения мастера
+    # не трогаем (close=False), воркер откроет свои
+    global _process_started, _first_request_seen
+    _process_started = time.perf_counter()
+    _first_request_seen = False
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+_default_app = None
+
+
+def __getattr__(name):
+    # server.app:app (gunicorn, flask --app, старые скрипты): приложение по умолчанию
+    # создаётся при первом обращении, а не при импорте модуля
+    global _default_app
+    if name != 'app':
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    if _default_app is None:
+        _default_app = create_app()
+    return _default_app
 
-app = Flask(__name__)
-# Поддержка через переменную окружения `DATABASE_URL`, иначе fallback на SQLite
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or 'sqlite:///library.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
 
 # Определяем модель книги с добавленным полем reserved_by
 class Book(db.Model):
@@ -27,106 +193,919 @@ class Book(db.Model):
     def __repr__(self):
         return f'<Book {self.title}, {self.status}>'
 
-with app.app_context():
-    # Создаем таблицы, если их еще нет
-    db.create_all()
-    # Проверяем наличие столбца reserved_by в таблице books и, если его нет, добавляем его.
-    # Используем SQLAlchemy Inspector (работает для разных БД); при ошибках безопасно пропускаем.
-    from sqlalchemy import inspect
-    inspector = inspect(db.engine)
+# Журнал изменений каталога: каждая запись увеличивает версию (autoincrement,
+# номера не переиспользуются). Для удалённых книг остаётся запись op='delete'
+# (tombstone), op='reset' означает массовое изменение, после которого клиент
+# должен перечитать каталог целиком.
+class BookChange(db.Model):
+    __tablename__ = 'book_changes'
+    __table_args__ = {'sqlite_autoincrement': True}
+    version = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(db.Integer, nullable=True, index=True)
+    op = db.Column(db.String(10), nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Сколько последних записей журнала хранить и сколько книг максимум отдавать
+# в одном ответе /books/changes — при большем разрыве клиент делает полную загрузку.
+CHANGE_LOG_RETENTION = int(os.environ.get('CHANGE_LOG_RETENTION', 100000))
+MAX_CHANGES_PER_RESPONSE = int(os.environ.get('MAX_CHANGES_PER_RESPONSE', 1000))
+
+# Колонки, которые отдаёт API (совпадают с колонками Treeview в client/view.py)
+BOOK_FIELDS = ('id', 'title', 'author', 'status', 'reserved_by')
+# Ключи сортировки для keyset-пагинации; reserved_by может быть NULL, поэтому
+# сравниваем по coalesce, чтобы курсор был однозначным.
+SORT_KEYS = {
+    'id': Book.id,
+    'title': Book.title,
+    'author': Book.author,
+    'status': Book.status,
+    'reserved_by': func.coalesce(Book.reserved_by, ''),
+}
+# Размер партии при массовом импорте (POST /books/bulk, flask import-books)
+BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', 1000))
+MAX_BULK_BATCH_SIZE = 50000
+BULK_FORMATS = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv',
+}
+
+# Полный список отдаётся потоком, по STREAM_BATCH_SIZE строк за раз
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', 2000))
+
+# Компактное колоночное представление списка книг (выбирается заголовком Accept)
+COLUMNAR_MIMETYPE = 'application/vnd.library.columnar+json'
+# Меньшие ответы не сжимаем — выигрыш меньше накладных расходов
+COMPRESS_MIN_SIZE = 1024
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Составные индексы (ключ сортировки, id) — страница любой глубины читается по индексу
+BOOK_INDEXES = [
+    db.Index('ix_books_title_id', Book.title, Book.id),
+    db.Index('ix_books_author_id', Book.author, Book.id),
+    db.Index('ix_books_status_id', Book.status, Book.id),
+    db.Index('ix_books_reserved_by_id', SORT_KEYS['reserved_by'], Book.id),
+]
+
+# Статистика текущего запроса (SQL-запросы, время БД и сериализации, трассировка).
+# Поток, а не flask.g: потоковые ответы выполняют запросы уже после того, как
+# контекст запроса снят.
+_request_local = threading.local()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    stats = getattr(_request_local, 'stats', None)
+    if stats is not None:
+        stats['statements'] += 1
+        stats['db_time'] += elapsed
+        queries = stats['queries']
+        if queries is not None and len(queries) < MAX_TRACED_STATEMENTS:
+            # rowcount для SELECT знают не все драйверы (SQLite — нет)
+            rows = cursor.rowcount if cursor.rowcount >= 0 else None
+            queries.append({'sql': statement, 'ms': round(elapsed * 1000, 3), 'rows': rows})
+
+
+def _handle_db_error(exception_context):
+    starts = exception_context.connection.info.get('query_start') if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def _instrument_engine(engine):
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_db_error)
+
+
+def _search_available():
+    state = _state()
+    if state.search_enabled is None:
+        state.search_enabled = search.available(db.engine)
+    return state.search_enabled
+
+
+if orjson is not None:
+    def _encode_json(obj):
+        return orjson.dumps(obj)
+else:
+    _json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def _encode_json(obj):
+        return _json_encoder.encode(obj).encode('utf-8')
+
+
+@contextlib.contextmanager
+def _timed(key):
+    # Прибавляет время блока к статистике текущего запроса (например, 'serialize')
+    start = time.perf_counter()
     try:
-        cols = [c['name'] for c in inspector.get_columns('books')]
+        yield
+    finally:
+        stats = getattr(_request_local, 'stats', None)
+        if stats is not None:
+            stats[key] += time.perf_counter() - start
+
+
+def _dumps(obj):
+    with _timed('serialize'):
+        return _encode_json(obj)
+
+
+def _gzip_compressor():
+    c = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return c.compress, c.flush
+
+
+def _brotli_compressor():
+    c = brotli.Compressor(quality=5)
+    return c.process, c.finish
+
+
+def _zstd_compressor():
+    c = zstandard.ZstdCompressor(level=3).compressobj()
+    return c.compress, c.flush
+
+
+# Кодек -> фабрика пары (compress(chunk), finish()); порядок — предпочтение сервера
+COMPRESSORS = {}
+if zstandard is not None:
+    COMPRESSORS['zstd'] = _zstd_compressor
+if brotli is not None:
+    COMPRESSORS['br'] = _brotli_compressor
+COMPRESSORS['gzip'] = _gzip_compressor
+
+
+def _negotiate_encoding():
+    """Лучший кодек из Accept-Encoding, который есть на сервере, или None."""
+    return request.accept_encodings.best_match(list(COMPRESSORS))
+
+
+def _compress_stream(chunks, encoding):
+    compress, finish = COMPRESSORS[encoding]()
+    for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+@bp.before_app_request
+def _report_worker_startup():
+    # Один раз на процесс: сколько прошло от импорта (или fork) до первого запроса
+    global _first_request_seen
+    if _first_request_seen:
+        return
+    _first_request_seen = True
+    elapsed = time.perf_counter() - _process_started
+    current_app.logger.info('процесс %d: первый запрос через %.3f с после старта', os.getpid(), elapsed)
+    _state().request_metrics.add(
+        (), gauges=[(('library_worker_startup_seconds', metrics.labels(pid=os.getpid())), elapsed)])
+
+
+@bp.before_app_request
+def _metrics_start():
+    config = current_app.config
+    trace = config['TRACE_REQUESTS'] or (config['TRACE_HEADER'] and request.headers.get('X-Request-Trace') == '1')
+    # Текст SQL собираем, только если он может понадобиться: трассировка или журнал медленных
+    slow_ms = config['SLOW_REQUEST_MS']
+    collect = trace or slow_ms > 0
+    # Метрики приложения берём сейчас: потоковый ответ засчитывается уже без контекста
+    request_metrics = _state().request_metrics
+    _request_local.stats = {
+        'start': time.perf_counter(), 'statements': 0, 'db_time': 0.0, 'serialize': 0.0,
+        'trace': trace, 'slow_ms': slow_ms, 'queries': [] if collect else None,
+        'path': request.full_path.rstrip('?') if collect else None, 'metrics': request_metrics,
+    }
+    request_metrics.add((), gauges=[(('library_http_requests_in_flight', ''), 1)])
+
+
+def _count_bytes(chunks, counted):
+    for chunk in chunks:
+        counted[0] += len(chunk)
+        yield chunk
+
+
+# Регистрируется раньше _compress_response, поэтому вызывается после него (Flask
+# вызывает after_request в обратном порядке) и видит сжатое тело. Потоковый ответ
+# засчитывается, когда отправлен последний байт: он читает БД до конца передачи.
+@bp.after_app_request
+def _metrics_finish(resp):
+    stats = getattr(_request_local, 'stats', None)
+    if stats is None:
+        return resp
+    route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+    method = request.method
+    status = resp.status_code
+    if stats['trace'] and resp.is_streamed:
+        # Server-Timing уходит в заголовках, до тела, — поэтому трассируемое потоковое
+        # тело собираем целиком: иначе чтение БД и сериализация в него не попадут
+        resp.set_data(b''.join(resp.response))
+    if not resp.is_streamed:
+        total = _metrics_record(stats, method, route, status, resp.calculate_content_length() or 0)
+        if stats['trace']:
+            resp.headers['Server-Timing'] = _server_timing(stats, total)
+        return resp
+    counted = [0]
+    resp.response = _count_bytes(resp.response, counted)
+    resp.call_on_close(lambda: _metrics_record(stats, method, route, status, counted[0]))
+    return resp
+
+
+def _metrics_record(stats, method, route, status, nbytes):
+    if getattr(_request_local, 'stats', None) is stats:
+        _request_local.stats = None
+    route_labels = metrics.labels(method=method, route=route)
+    samples = [
+        (('library_http_requests_total', metrics.labels(method=method, route=route, status=status)), 1),
+        (('library_http_response_bytes_total', route_labels), nbytes),
+        (('library_db_statements_total', route_labels), stats['statements']),
+        (('library_db_statement_duration_seconds_total', route_labels), stats['db_time']),
+    ]
+    total = time.perf_counter() - stats['start']
+    request_metrics = stats['metrics']
+    samples += request_metrics.histogram('library_http_request_duration_seconds', route_labels, total)
+    request_metrics.add(samples, gauges=[(('library_http_requests_in_flight', ''), -1)])
+    threshold = stats['slow_ms']
+    if threshold > 0 and total * 1000 >= threshold and stats['queries'] is not None:
+        _log_slow_request(stats, method, route, status, nbytes, total)
+    return total
+
+
+def _server_timing(stats, total):
+    return (f'db;dur={stats["db_time"] * 1000:.3f};desc="{stats["statements"]} SQL", '
+            f'serialize;dur={stats["serialize"] * 1000:.3f}, total;dur={total * 1000:.3f}')
+
+
+def _log_slow_request(stats, method, route, status, nbytes, total):
+    entry = {
+        'time': datetime.utcnow().isoformat(timespec='milliseconds') + 'Z',
+        'method': method,
+        'path': stats['path'],
+        'route': route,
+        'status': status,
+        'bytes': nbytes,
+        'total_ms': round(total * 1000, 3),
+        'db_ms': round(stats['db_time'] * 1000, 3),
+        'serialize_ms': round(stats['serialize'] * 1000, 3),
+        'statement_count': stats['statements'],
+        'statements': stats['queries'],
+    }
+    slow_log.warning(json.dumps(entry, ensure_ascii=False))
+
+
+@bp.after_app_request
+def _compress_response(resp):
+    # Сжимаем JSON-ответы по Accept-Encoding; потоковые — на лету, кусками
+    if (request.method == 'HEAD' or resp.status_code != 200 or 'Content-Encoding' in resp.headers
+            or not (resp.mimetype or '').endswith('json')):
+        return resp
+    resp.vary.add('Accept-Encoding')
+    encoding = _negotiate_encoding()
+    if encoding is None:
+        return resp
+    if resp.is_streamed:
+        resp.response = _compress_stream(resp.response, encoding)
+        resp.headers.pop('Content-Length', None)
+    else:
+        data = resp.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return resp
+        compress, finish = COMPRESSORS[encoding]()
+        resp.set_data(compress(data) + finish())
+    resp.headers['Content-Encoding'] = encoding
+    return resp
+
+
+def _book_to_dict(b):
+    return {
+        'id': b.id,
+        'title': b.title,
+        'author': b.author,
+        'status': b.status,
+        'reserved_by': b.reserved_by
+    }
+
+
+def _record_change(book_id, op='upsert'):
+    """Добавляет запись в журнал изменений в текущей транзакции (до commit)."""
+    _record_changes([(book_id, op)])
+
+
+def _record_changes(changes):
+    """Добавляет записи (book_id, op) в журнал одной командой в текущей транзакции."""
+    if not changes:
+        return
+    table = BookChange.__table__
+    if db.engine.dialect.name == 'postgresql':
+        # Версии берутся из последовательности: без блокировки транзакция с версией 101
+        # может зафиксироваться после транзакции с 102, и клиент, уже получивший
+        # max(version) = 102, пропустит изменение 101. Пишущие в журнал транзакции
+        # выстраиваются в очередь до commit; чтение (SELECT) блокировка не задерживает.
+        # В SQLite запись и так последовательна — блокировка всей базы.
+        db.session.execute(text('LOCK TABLE book_changes IN EXCLUSIVE MODE'))
+    now = datetime.utcnow()
+    rows = [{'book_id': book_id, 'op': op, 'changed_at': now} for book_id, op in changes]
+    if len(rows) == 1:
+        version = db.session.execute(table.insert(), rows[0]).inserted_primary_key[0]
+    else:
+        db.session.execute(table.insert(), rows)
+        version = _current_version()
+    # Чистим журнал изредка — когда версия переходит через очередную тысячу
+    if version // 1000 != (version - len(rows)) // 1000:
+        db.session.execute(table.delete().where(table.c.version <= version - CHANGE_LOG_RETENTION))
+
+
+def _commit_changes():
+    """Фиксирует транзакцию с изменением каталога и сбрасывает кэш ответов."""
+    db.session.commit()
+    _state().response_cache.invalidate()
+
+
+def _current_version():
+    return db.session.query(func.max(BookChange.version)).scalar() or 0
+
+
+def _books_etag(version, args, representation='json'):
+    """Сильный ETag ответа /books: версия журнала + хэш параметров запроса и формата.
+    Считается без выборки и сериализации строк."""
+    params = '&'.join(f'{k}={v}' for k, v in sorted(args.items(multi=True)))
+    digest = hashlib.sha1(f'{representation}|{params}'.encode('utf-8')).hexdigest()[:12]
+    return f'v{version}-{digest}'
+
+
+def _encode_cursor(sort, order, value, book_id):
+    raw = json.dumps([sort, order, value, book_id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor, sort, order):
+    """Возвращает (значение ключа сортировки, id) последней строки предыдущей страницы."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        c_sort, c_order, value, book_id = json.loads(raw.decode('utf-8'))
     except Exception:
-        cols = []
-    if 'reserved_by' not in cols:
+        raise ValueError('Некорректный курсор')
+    if c_sort != sort or c_order != order or not isinstance(book_id, int):
+        raise ValueError('Курсор не соответствует параметрам сортировки')
+    return value, book_id
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _books_query(args):
+    """Строит запрос по параметрам q/status/sort/order/cursor/limit.
+
+    Возвращает (query, limit, sort, order); limit равен None, если пагинация не запрошена.
+    """
+    sort = args.get('sort', 'id')
+    order = args.get('order', 'asc')
+    if sort not in SORT_KEYS:
+        raise ValueError(f'Неизвестная колонка сортировки: {sort}')
+    if order not in ('asc', 'desc'):
+        raise ValueError('Параметр order должен быть asc или desc')
+
+    query = Book.query
+    q = (args.get('q') or '').strip()
+    if q:
+        pattern = f'%{_escape_like(q)}%'
+        query = query.filter(or_(
+            Book.title.ilike(pattern, escape='\\'),
+            Book.author.ilike(pattern, escape='\\'),
+            Book.reserved_by.ilike(pattern, escape='\\'),
+        ))
+    status = (args.get('status') or '').strip()
+    if status and status != 'Все':
+        query = query.filter(Book.status == status)
+
+    key = SORT_KEYS[sort]
+    cursor = args.get('cursor')
+    limit = args.get('limit')
+    if cursor is not None or limit is not None:
         try:
-            with db.engine.begin() as connection:
-                connection.execute(text("ALTER TABLE books ADD COLUMN reserved_by VARCHAR(120)"))
-        except Exception:
-            # Некритично — если ALTER TABLE не поддерживается или не сработал, пропускаем
-            pass
+            limit = int(limit) if limit is not None else DEFAULT_PAGE_SIZE
+        except ValueError:
+            raise ValueError('Параметр limit должен быть числом')
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f'Параметр limit должен быть от 1 до {MAX_PAGE_SIZE}')
+    if cursor:
+        value, last_id = _decode_cursor(cursor, sort, order)
+        if sort == 'id':
+            query = query.filter(Book.id > last_id if order == 'asc' else Book.id < last_id)
+        elif order == 'asc':
+            query = query.filter(or_(key > value, and_(key == value, Book.id > last_id)))
+        else:
+            query = query.filter(or_(key < value, and_(key == value, Book.id < last_id)))
 
-@app.route('/books', methods=['GET'])
+    if sort == 'id':
+        query = query.order_by(Book.id.asc() if order == 'asc' else Book.id.desc())
+    elif order == 'asc':
+        query = query.order_by(key.asc(), Book.id.asc())
+    else:
+        query = query.order_by(key.desc(), Book.id.desc())
+    return query, limit, sort, order
+
+
+@bp.route('/books', methods=['GET'])
 def get_books():
-    books = Book.query.all()
-    return jsonify([
-        {
-            'id': b.id,
-            'title': b.title,
-            'author': b.author,
-            'status': b.status,
-            'reserved_by': b.reserved_by
-        } for b in books
-    ])
-
-
-@app.route('/health', methods=['GET'])
+    try:
+        query, limit, sort, order = _books_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Колоночный формат — только для полного списка и только по явному Accept
+    mimetype = 'application/json'
+    if limit is None:
+        mimetype = request.accept_mimetypes.best_match(['application/json', COLUMNAR_MIMETYPE], 'application/json')
+    representation = 'columnar' if mimetype == COLUMNAR_MIMETYPE else 'json'
+
+    # Версию читаем до выборки: изменения после неё клиент получит через /books/changes.
+    # ETag и ключ кэша годятся как валидатор, только пока версии фиксируются по порядку
+    # (см. _record_changes): иначе поздний commit меньшей версии не меняет max(version)
+    version = _current_version()
+    base_etag = _books_etag(version, request.args, representation)
+    # Сжатое тело — другое представление, поэтому кодек входит в сильный ETag
+    encoding = _negotiate_encoding()
+    etag = f'{base_etag}-{encoding}' if encoding else base_etag
+    if request.if_none_match.contains(etag):
+        # Каталог не менялся — отвечаем 304 без чтения таблицы books
+        resp = current_app.response_class(status=304)
+        return _with_version_headers(resp, version, etag)
+
+    # Кэшируется несжатое тело: ключ — база, версия, параметры и формат
+    # (файл кэша может быть общим у приложений с разными базами)
+    state = _state()
+    response_cache = state.response_cache
+    cache_key = f'books:{state.db_hash}:{base_etag}'
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        resp = current_app.response_class(cached[0], mimetype=mimetype)
+        resp.headers['X-Cache'] = 'HIT'
+        return _with_version_headers(resp, version, etag)
+
+    # Выбираем только отдаваемые колонки, без ORM-объектов и identity map
+    query = query.with_entities(*(getattr(Book, f) for f in BOOK_FIELDS))
+    if limit is None:
+        # Без limit/cursor — прежний ответ: полный список, но потоком
+        stream = _stream_books_columnar if representation == 'columnar' else _stream_books
+        body = _tee_to_cache(response_cache, cache_key, stream(db.engine, query.statement))
+        resp = current_app.response_class(body, mimetype=mimetype)
+        resp.headers['X-Cache'] = 'MISS'
+        return _with_version_headers(resp, version, etag)
+
+    # Берём на одну строку больше, чтобы понять, есть ли следующая страница
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = dict(zip(BOOK_FIELDS, rows[-1]))
+        value = last['id'] if sort == 'id' else (last[sort] or '')
+        next_cursor = _encode_cursor(sort, order, value, last['id'])
+    with _timed('serialize'):
+        resp = jsonify({
+            'items': [dict(zip(BOOK_FIELDS, row)) for row in rows],
+            'next_cursor': next_cursor
+        })
+    response_cache.put(cache_key, resp.get_data())
+    resp.headers['X-Cache'] = 'MISS'
+    return _with_version_headers(resp, version, etag)
+
+
+def _tee_to_cache(response_cache, key, chunks):
+    """Отдаёт куски дальше и копит тело, пока оно помещается в одну запись кэша.
+    Сохраняет его, только если поток дочитан до конца."""
+    parts = []
+    size = 0
+    for chunk in chunks:
+        if parts is not None:
+            size += len(chunk)
+            if size <= response_cache.max_entry_bytes:
+                parts.append(chunk)
+            else:
+                parts = None
+        yield chunk
+    if parts is not None:
+        response_cache.put(key, b''.join(parts))
+
+
+def _stream_books(engine, statement):
+    """JSON-массив книг кусками: память не зависит от размера таблицы."""
+    with engine.connect() as conn:
+        # stream_results — серверный курсор на Postgres; строки читаются партиями
+        result = conn.execution_options(stream_results=True).execute(statement)
+        yield b'['
+        first = True
+        for rows in result.partitions(STREAM_BATCH_SIZE):
+            chunk = _dumps([dict(zip(BOOK_FIELDS, row)) for row in rows])[1:-1]
+            yield chunk if first else b',' + chunk
+            first = False
+        yield b']'
+
+
+def _stream_books_columnar(engine, statement):
+    """Колоночный вариант: блоки по STREAM_BATCH_SIZE строк, в каждом — массив на колонку.
+
+    Статус кодируется словарём: status_values — значения, status — их индексы.
+    {"columns": [...], "blocks": [{"id": [...], "title": [...], "author": [...],
+     "status": [0, 1, ...], "status_values": [...], "reserved_by": [...]}, ...]}
+    """
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(statement)
+        yield b'{"columns":' + _dumps(list(BOOK_FIELDS)) + b',"blocks":['
+        first = True
+        for rows in result.partitions(STREAM_BATCH_SIZE):
+            ids, titles, authors, statuses, reserved_by = zip(*rows)
+            status_values = list(dict.fromkeys(statuses))
+            codes = {value: i for i, value in enumerate(status_values)}
+            chunk = _dumps({
+                'id': ids,
+                'title': titles,
+                'author': authors,
+                'status': [codes[value] for value in statuses],
+                'status_values': status_values,
+                'reserved_by': reserved_by,
+            })
+            yield chunk if first else b',' + chunk
+            first = False
+        yield b']}'
+
+
+def _with_version_headers(resp, version, etag):
+    resp.headers['X-Books-Version'] = str(version)
+    # Тело зависит от Accept (формат) и Accept-Encoding (сжатие)
+    resp.vary.add('Accept')
+    resp.set_etag(etag)
+    # Кэшировать можно, но перед использованием нужно перепроверить (If-None-Match)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+
+@bp.route('/books/search', methods=['GET'])
+def search_books():
+    """Поиск по словам запроса (совпадение по префиксу, без учёта регистра), по релевантности."""
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({'error': 'Параметр q обязателен'}), 400
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({'error': f'Параметр limit должен быть от 1 до {MAX_PAGE_SIZE}'}), 400
+    status = (request.args.get('status') or '').strip()
+    status = None if status in ('', 'Все') else status
+
+    if _search_available():
+        rows = search.search(db.session, db.engine.dialect.name, q, limit, status)
+    else:
+        # Индекса нет — подстрочный поиск как в GET /books
+        args = {'q': q, 'status': status or ''}
+        query = _books_query(args)[0].with_entities(*(getattr(Book, f) for f in BOOK_FIELDS))
+        rows = query.limit(limit).all()
+    with _timed('serialize'):
+        return jsonify([dict(zip(BOOK_FIELDS, row)) for row in rows])
+
+
+@bp.route('/books/changes', methods=['GET'])
+def get_book_changes():
+    try:
+        since = int(request.args.get('since', ''))
+        if since < 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'Параметр since должен быть неотрицательным числом'}), 400
+
+    version = _current_version()
+    result = {'version': version, 'reset': False, 'changes': []}
+    if since >= version:
+        return jsonify(result)
+
+    oldest = db.session.query(func.min(BookChange.version)).scalar() or 0
+    window = BookChange.query.filter(BookChange.version > since, BookChange.version <= version)
+    changed_ids = [row[0] for row in window.with_entities(BookChange.book_id).filter(BookChange.book_id.isnot(None)).distinct().limit(MAX_CHANGES_PER_RESPONSE + 1)]
+    if (since < oldest - 1
+            or window.filter(BookChange.op == 'reset').first() is not None
+            or len(changed_ids) > MAX_CHANGES_PER_RESPONSE):
+        # Журнал уже очищен, было массовое изменение или разрыв слишком большой
+        result['reset'] = True
+        return jsonify(result)
+
+    # Отдаём текущее состояние изменённых книг; отсутствующие — tombstone
+    existing = {b.id: b for b in Book.query.filter(Book.id.in_(changed_ids))} if changed_ids else {}
+    for book_id in sorted(changed_ids):
+        book = existing.get(book_id)
+        if book is None:
+            result['changes'].append({'op': 'delete', 'id': book_id})
+        else:
+            result['changes'].append({'op': 'upsert', 'id': book_id, 'book': _book_to_dict(book)})
+    with _timed('serialize'):
+        return jsonify(result)
+
+
+@bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    # Попадания/промахи суммарно по всем воркерам, текущий размер кэша
+    return jsonify(_state().response_cache.stats()), 200
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    # Текстовый формат Prometheus; значения суммарно по всем воркерам
+    return Response(_state().request_metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@bp.route('/health', methods=['GET'])
 def health():
     return jsonify({'status': 'ok'}), 200
 
-@app.route('/books', methods=['POST'])
+@bp.route('/books', methods=['POST'])
 def add_book():
     data = request.json
     new_book = Book(title=data.get('title'), author=data.get('author'))
     db.session.add(new_book)
-    db.session.commit()
+    db.session.flush()
+    _record_change(new_book.id)
+    _commit_changes()
     return jsonify({'id': new_book.id}), 201
 
-@app.route('/books/issue/<int:book_id>', methods=['PUT'])
+def _insert_book_batch(rows):
+    """Вставляет партию строк одной командой и фиксирует её отдельной транзакцией."""
+    if db.engine.dialect.name == 'postgresql':
+        # COPY заметно быстрее INSERT на больших объёмах; пустое поле без кавычек — NULL
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in rows:
+            writer.writerow([row['title'], row['author'], row['status'], row['reserved_by']])
+        buf.seek(0)
+        cursor = db.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert('COPY books (title, author, status, reserved_by) FROM STDIN WITH (FORMAT csv)', buf)
+        finally:
+            cursor.close()
+    else:
+        # executemany: один подготовленный INSERT на всю партию
+        db.session.execute(Book.__table__.insert(), rows)
+    # id вставленных строк неизвестны — клиенты перечитают каталог целиком
+    _record_change(None, 'reset')
+    _commit_changes()
+
+
+def _import_books(stream, fmt, batch_size, on_batch=None):
+    try:
+        return bulk.import_records(bulk.iter_records(stream, fmt), _insert_book_batch, batch_size, on_batch)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+@bp.route('/books/bulk', methods=['POST'])
+def bulk_import_books():
+    # Тело читается потоком (request.stream), без request.data / request.json
+    fmt = request.args.get('format') or BULK_FORMATS.get(request.mimetype)
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({'error': 'Поддерживаются application/x-ndjson и text/csv'}), 415
+    try:
+        batch_size = int(request.args.get('batch_size', BULK_BATCH_SIZE))
+    except ValueError:
+        batch_size = 0
+    if not 1 <= batch_size <= MAX_BULK_BATCH_SIZE:
+        return jsonify({'error': f'Параметр batch_size должен быть от 1 до {MAX_BULK_BATCH_SIZE}'}), 400
+    try:
+        summary = _import_books(request.stream, fmt, batch_size,
+                                on_batch=lambda p: current_app.logger.info('bulk import: %s', p))
+    except bulk.MalformedStream as e:
+        # Уже зафиксированные партии остаются: клиент видит, сколько строк импортировано
+        return jsonify(dict(e.summary, error=f'Строка {e.line}: {e}', line=e.line)), 400
+    return jsonify(summary), 200
+
+
+@bp.cli.command('import-books')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default=None,
+              help='Формат файла; по умолчанию определяется по расширению.')
+@click.option('--batch-size', default=BULK_BATCH_SIZE, show_default=True, type=click.IntRange(1, MAX_BULK_BATCH_SIZE))
+def import_books_command(path, fmt, batch_size):
+    """Массовый импорт книг из локального NDJSON/CSV файла."""
+    if fmt is None:
+        fmt = 'csv' if path.lower().endswith('.csv') else 'ndjson'
+    with open(path, 'rb') as f:
+        try:
+            summary = _import_books(f, fmt, batch_size,
+                                    on_batch=lambda p: click.echo(f"партия {p['batch']}: +{p['inserted']} (всего {p['total_inserted']}, строка {p['last_line']})"))
+        except bulk.MalformedStream as e:
+            raise click.ClickException(f"строка {e.line}: {e}; импортировано: {e.summary['inserted']}")
+    click.echo(f"Импортировано: {summary['inserted']}, отклонено: {summary['rejected']}")
+    for error in summary['errors']:
+        click.echo(f"  строка {error['line']}: {error['error']}", err=True)
+
+
+# Правила переходов состояния книги. Общие для одиночных эндпоинтов и /books/batch:
+# принимают текущее состояние (dict status/reserved_by/issued_date или None, если
+# книги нет) и возвращают (HTTP-код, тело ответа, новое состояние).
+def _issue_transition(state, name):
+    if state is None:
+        return 404, {'error': 'Книга не найдена'}, state
+    if state['status'] == 'зарезервирована' and (not name or name != state['reserved_by']):
+        # Если книга зарезервирована, имя должно совпадать с reserved_by
+        return 400, {'error': 'Имя не совпадает с забронированным'}, state
+    if state['status'] not in ('доступна', 'зарезервирована'):
+        return 400, {'error': 'Книга не доступна для выдачи'}, state
+    return 200, {'message': 'Книга выдана'}, dict(state, status='выдана', issued_date=datetime.utcnow(), reserved_by=None)
+
+
+def _return_transition(state, name=None):
+    if state is None:
+        return 404, {'error': 'Книга не найдена'}, state
+    if state['status'] != 'выдана':
+        return 400, {'error': 'Книга не выдана'}, state
+    return 200, {'message': 'Книга возвращена'}, dict(state, status='доступна', issued_date=None)
+
+
+def _reserve_transition(state, name):
+    if state is None:
+        return 404, {'error': 'Книга не найдена'}, state
+    if not name:
+        return 400, {'error': 'Необходимо указать имя для резервирования'}, state
+    if state['status'] != 'доступна':
+        return 400, {'error': 'Книга не доступна для резервирования'}, state
+    return 200, {'message': 'Книга зарезервирована'}, dict(state, status='зарезервирована', reserved_by=name)
+
+
+def _delete_transition(state, name=None):
+    if state is None:
+        return 404, {'error': 'Книга не найдена'}, state
+    return 200, {'message': 'Книга удалена'}, None
+
+
+TRANSITIONS = {
+    'issue': _issue_transition,
+    'return': _return_transition,
+    'reserve': _reserve_transition,
+    'delete': _delete_transition,
+}
+MAX_BATCH_OPERATIONS = 1000
+
+
+@bp.route('/books/batch', methods=['POST'])
+def batch_books():
+    """Применяет список операций {op, id, name} в одной транзакции.
+
+    Правила и коды ответа для каждой операции — как у issue/return/reserve/delete;
+    ошибка одной операции не отменяет остальные. Операции над одной книгой
+    применяются по порядку.
+    """
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list):
+        return jsonify({'error': 'Ожидается {"operations": [...]}'}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'error': f'Не более {MAX_BATCH_OPERATIONS} операций за запрос'}), 400
+
+    ids = {op.get('id') for op in operations if isinstance(op, dict) and isinstance(op.get('id'), int)}
+    table = Book.__table__
+    original = {}
+    if ids:
+        # Один SELECT на все книги пакета; на Postgres строки блокируются до конца транзакции
+        query = select([table.c.id, table.c.status, table.c.reserved_by, table.c.issued_date]).where(table.c.id.in_(ids))
+        if db.engine.dialect.name == 'postgresql':
+            query = query.with_for_update()
+        for row in db.session.execute(query):
+            original[row.id] = {'status': row.status, 'reserved_by': row.reserved_by, 'issued_date': row.issued_date}
+    state = dict(original)
+
+    results = []
+    for item in operations:
+        op = item.get('op') if isinstance(item, dict) else None
+        book_id = item.get('id') if isinstance(item, dict) else None
+        if op not in TRANSITIONS:
+            results.append({'op': op, 'id': book_id, 'status': 400, 'error': 'Неизвестная операция'})
+            continue
+        if not isinstance(book_id, int):
+            results.append({'op': op, 'id': book_id, 'status': 400, 'error': 'Некорректный id'})
+            continue
+        code, body, new_state = TRANSITIONS[op](state.get(book_id), item.get('name'))
+        if code == 200:
+            state[book_id] = new_state
+        results.append(dict(body, op=op, id=book_id, status=code))
+
+    deleted = [book_id for book_id in original if state.get(book_id) is None]
+    updated = [book_id for book_id in original if state.get(book_id) is not None and state[book_id] != original[book_id]]
+    if deleted or updated:
+        expected = 0
+        matched = 0
+        if updated:
+            # Одна подготовленная команда на все изменённые строки; условие по старому
+            # статусу защищает от параллельного изменения между SELECT и UPDATE
+            stmt = table.update().where(and_(
+                table.c.id == bindparam('b_id'),
+                table.c.status == bindparam('b_old_status'),
+            )).values(
+                status=bindparam('b_status'),
+                reserved_by=bindparam('b_reserved_by'),
+                issued_date=bindparam('b_issued_date'),
+            )
+            res = db.session.execute(stmt, [{
+                'b_id': book_id,
+                'b_old_status': original[book_id]['status'],
+                'b_status': state[book_id]['status'],
+                'b_reserved_by': state[book_id]['reserved_by'],
+                'b_issued_date': state[book_id]['issued_date'],
+            } for book_id in updated])
+            expected += len(updated)
+            matched += res.rowcount
+        if deleted:
+            res = db.session.execute(table.delete().where(table.c.id.in_(deleted)))
+            expected += len(deleted)
+            matched += res.rowcount
+        if db.engine.dialect.supports_sane_multi_rowcount and matched != expected:
+            db.session.rollback()
+            return jsonify({'error': 'Книги изменились во время обработки, повторите запрос'}), 409
+        _record_changes([(book_id, 'upsert') for book_id in updated] + [(book_id, 'delete') for book_id in deleted])
+        _commit_changes()
+    return jsonify({'results': results}), 200
+
+
+def _book_state(book_id):
+    table = Book.__table__
+    row = db.session.execute(
+        select([table.c.status, table.c.reserved_by, table.c.issued_date]).where(table.c.id == book_id)
+    ).first()
+    if row is None:
+        return None
+    return {'status': row.status, 'reserved_by': row.reserved_by, 'issued_date': row.issued_date}
+
+
+def _transition_response(book_id, condition, values, message, transition, name=None):
+    """Переход одной командой UPDATE ... WHERE id=? AND <condition>.
+
+    Успех — одна изменённая строка; тогда пишем журнал и фиксируем транзакцию.
+    Иначе состояние читается только ради выбора ошибки по тем же правилам.
+    """
+    table = Book.__table__
+    result = db.session.execute(table.update().where(and_(table.c.id == book_id, condition)).values(**values))
+    if result.rowcount == 1:
+        _record_change(book_id)
+        _commit_changes()
+        return jsonify({'message': message}), 200
+    db.session.rollback()
+    code, body, _ = transition(_book_state(book_id), name)
+    if code == 200:
+        # Книгу успели изменить между UPDATE и чтением состояния
+        return jsonify({'error': 'Состояние книги изменилось, повторите запрос'}), 409
+    return jsonify(body), code
+
+
+@bp.route('/books/issue/<int:book_id>', methods=['PUT'])
 def issue_book(book_id):
-    book = Book.query.get(book_id)
-    if book:
-        data = request.get_json() or {}
-        if book.status == 'зарезервирована':
-            # Если книга зарезервирована, проверяем, передано ли имя и совпадает ли оно с reserved_by
-            if 'name' not in data or data['name'] != book.reserved_by:
-                return jsonify({'error': 'Имя не совпадает с забронированным'}), 400
-        if book.status in ['доступна', 'зарезервирована']:
-            book.status = 'выдана'
-            book.issued_date = datetime.utcnow()
-            book.reserved_by = None  # Сбрасываем резервирование
-            db.session.commit()
-            return jsonify({'message': 'Книга выдана'}), 200
-        else:
-            return jsonify({'error': 'Книга не доступна для выдачи'}), 400
-    return jsonify({'error': 'Книга не найдена'}), 404
+    data = request.get_json() or {}
+    name = data.get('name')
+    table = Book.__table__
+    condition = table.c.status == 'доступна'
+    if name:
+        # Зарезервированную книгу выдаём только на имя из reserved_by
+        condition = or_(condition, and_(table.c.status == 'зарезервирована', table.c.reserved_by == name))
+    return _transition_response(book_id, condition,
+                                {'status': 'выдана', 'issued_date': datetime.utcnow(), 'reserved_by': None},
+                                'Книга выдана', _issue_transition, name)
 
-@app.route('/books/return/<int:book_id>', methods=['PUT'])
+@bp.route('/books/return/<int:book_id>', methods=['PUT'])
 def return_book(book_id):
-    book = Book.query.get(book_id)
-    if book:
-        if book.status == 'выдана':
-            book.status = 'доступна'
-            book.issued_date = None
-            db.session.commit()
-            return jsonify({'message': 'Книга возвращена'}), 200
-        else:
-            return jsonify({'error': 'Книга не выдана'}), 400
-    return jsonify({'error': 'Книга не найдена'}), 404
+    table = Book.__table__
+    return _transition_response(book_id, table.c.status == 'выдана',
+                                {'status': 'доступна', 'issued_date': None},
+                                'Книга возвращена', _return_transition)
 
-@app.route('/books/reserve/<int:book_id>', methods=['PUT'])
+@bp.route('/books/reserve/<int:book_id>', methods=['PUT'])
 def reserve_book(book_id):
-    book = Book.query.get(book_id)
-    if book:
-        data = request.get_json() or {}
-        if 'name' not in data or not data['name']:
-            return jsonify({'error': 'Необходимо указать имя для резервирования'}), 400
-        if book.status != 'доступна':
-            return jsonify({'error': 'Книга не доступна для резервирования'}), 400
-        book.status = 'зарезервирована'
-        book.reserved_by = data['name']
-        db.session.commit()
-        return jsonify({'message': 'Книга зарезервирована'}), 200
-    return jsonify({'error': 'Книга не найдена'}), 404
+    data = request.get_json() or {}
+    name = data.get('name')
+    if not name:
+        # 404 для несуществующей книги важнее ошибки в параметрах
+        code, body, _ = _reserve_transition(_book_state(book_id), name)
+        return jsonify(body), code
+    table = Book.__table__
+    return _transition_response(book_id, table.c.status == 'доступна',
+                                {'status': 'зарезервирована', 'reserved_by': name},
+                                'Книга зарезервирована', _reserve_transition, name)
 
-@app.route('/books/<int:book_id>', methods=['DELETE'])
+@bp.route('/books/<int:book_id>', methods=['DELETE'])
 def delete_book(book_id):
-    book = Book.query.get(book_id)
-    if book:
-        db.session.delete(book)
-        db.session.commit()
+    table = Book.__table__
+    result = db.session.execute(table.delete().where(table.c.id == book_id))
+    if result.rowcount == 1:
+        _record_change(book_id, 'delete')
+        _commit_changes()
         return jsonify({'message': 'Книга удалена'}), 200
+    db.session.rollback()
     return jsonify({'error': 'Книга не найдена'}), 404
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,156 @@
+"""Потоковый разбор и проверка строк для массового импорта книг (NDJSON / CSV).
+
+Модуль не зависит от Flask и БД: вставка партии передаётся функцией `insert_batch`,
+поэтому один и тот же код используют и `POST /books/bulk`, и команда `flask import-books`.
+"""
+import csv
+import io
+import json
+
+STATUSES = ('доступна', 'выдана', 'зарезервирована')
+FIELDS = ('title', 'author', 'status', 'reserved_by')
+MAX_FIELD_LENGTH = 120
+# Сколько отклонённых строк описывать подробно (остальные только считаются)
+MAX_REPORTED_ERRORS = 100
+
+
+class MalformedStream(ValueError):
+    """Поток нельзя читать дальше: строка не в UTF-8 или сломан CSV.
+
+    line — номер строки; summary — сводка уже зафиксированных партий (заполняет
+    import_records): их строки остаются в базе, остальное не импортировано.
+    """
+
+    def __init__(self, line, message):
+        super().__init__(message)
+        self.line = line
+        self.summary = None
+
+
+class _RawStream(io.RawIOBase):
+    """Поток только с read(n) (например, wsgi.input у gunicorn) в виде, понятном TextIOWrapper."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _decoded_lines(stream):
+    # Каждая строка декодируется отдельно: ошибка указывает на строку, а не на блок потока
+    for lineno, raw in enumerate(stream, 1):
+        try:
+            yield raw.decode('utf-8')
+        except UnicodeDecodeError:
+            raise MalformedStream(lineno, 'Строка не в кодировке UTF-8') from None
+
+
+def iter_records(stream, fmt):
+    """Читает бинарный поток построчно, не буферизуя его целиком.
+
+    Возвращает кортежи (номер строки, запись или None, ошибка или None); ошибка
+    отдельной записи не прерывает чтение, нечитаемый поток — MalformedStream.
+    """
+    if not isinstance(stream, io.IOBase):
+        stream = io.BufferedReader(_RawStream(stream))
+    lines = _decoded_lines(stream)
+    if fmt == 'ndjson':
+        for lineno, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield lineno, None, 'Некорректный JSON'
+                continue
+            if not isinstance(record, dict):
+                yield lineno, None, 'Ожидался JSON-объект'
+                continue
+            yield lineno, record, None
+    elif fmt == 'csv':
+        reader = csv.DictReader(lines)
+        try:
+            for record in reader:
+                yield reader.line_num, record, None
+        except csv.Error as e:
+            raise MalformedStream(reader.line_num, f'Некорректный CSV: {e}') from None
+    else:
+        raise ValueError(f'Неизвестный формат: {fmt}')
+
+
+def validate_record(record):
+    """Приводит запись к строке таблицы books; при ошибке бросает ValueError."""
+    row = {}
+    for field in FIELDS:
+        value = record.get(field)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f'Поле {field} должно быть строкой')
+        value = (value or '').strip()
+        if len(value) > MAX_FIELD_LENGTH:
+            raise ValueError(f'Поле {field} длиннее {MAX_FIELD_LENGTH} символов')
+        row[field] = value or None
+    if not row['title'] or not row['author']:
+        raise ValueError('Не указаны название или автор')
+    row['status'] = row['status'] or 'доступна'
+    if row['status'] not in STATUSES:
+        raise ValueError(f"Неизвестный статус: {row['status']}")
+    if row['status'] == 'зарезервирована' and not row['reserved_by']:
+        raise ValueError('Для зарезервированной книги нужно указать reserved_by')
+    if row['status'] != 'зарезервирована':
+        row['reserved_by'] = None
+    return row
+
+
+def import_records(records, insert_batch, batch_size=1000, on_batch=None):
+    """Проверяет записи по мере чтения и передаёт их в `insert_batch` партиями.
+
+    Возвращает сводку: вставлено/отклонено, прогресс по партиям и первые ошибки.
+    """
+    summary = {'inserted': 0, 'rejected': 0, 'batches': [], 'errors': []}
+    batch = []
+    last_line = 0
+
+    def _flush():
+        insert_batch(batch)
+        summary['inserted'] += len(batch)
+        progress = {
+            'batch': len(summary['batches']) + 1,
+            'inserted': len(batch),
+            'total_inserted': summary['inserted'],
+            'last_line': last_line,
+        }
+        summary['batches'].append(progress)
+        if on_batch:
+            on_batch(progress)
+        batch.clear()
+
+    try:
+        for lineno, record, error in records:
+            last_line = lineno
+            if error is None:
+                try:
+                    batch.append(validate_record(record))
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                summary['rejected'] += 1
+                if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                    summary['errors'].append({'line': lineno, 'error': error})
+                continue
+            if len(batch) >= batch_size:
+                _flush()
+    except MalformedStream as e:
+        # Незафиксированная партия отбрасывается: в базе ровно summary['inserted'] строк,
+        # продолжать можно со строки после last_line последней партии
+        e.summary = summary
+        raise
+    if batch:
+        _flush()
+    return summary
@@ -0,0 +1,187 @@
+"""Кэш готовых ответов, общий для всех воркеров gunicorn.
+
+Хранится в локальном SQLite-файле (WAL), поэтому не нужен внешний сервис: каждый
+процесс открывает свой коннект к одному и тому же файлу. Размер ограничен числом
+записей и суммарным объёмом, вытесняются давно не использованные записи (LRU).
+Счётчики попаданий/промахов копятся в процессе и сбрасываются в файл не чаще раза
+в FLUSH_INTERVAL, чтобы не писать в него на каждый запрос; остаток сбрасывает таймер
+(даже если воркер больше не получит запросов) и выход процесса.
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+
+_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS entries ('
+    'key TEXT PRIMARY KEY, body BLOB NOT NULL, meta TEXT NOT NULL, '
+    'size INTEGER NOT NULL, last_used REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS ix_entries_last_used ON entries (last_used)',
+    'CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+]
+COUNTERS = ('hits', 'misses', 'stores', 'evictions', 'invalidations')
+
+
+class ResponseCache:
+    # Как часто обновлять last_used у записи и сбрасывать счётчики в файл (секунды)
+    TOUCH_INTERVAL = 1.0
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, path, max_entries=256, max_bytes=64 * 1024 * 1024, max_entry_bytes=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 4
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._pending = dict.fromkeys(COUNTERS, 0)
+        self._last_flush = time.monotonic()
+        self._timer = None
+        atexit.register(self.flush)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def _conn(self):
+        # Отдельный коннект на поток и на процесс (после fork старый не используем)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Это кэш: при сбое питания его можно потерять
+            conn.execute('PRAGMA synchronous=OFF')
+            for ddl in _SCHEMA:
+                conn.execute(ddl)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _check_fork(self):
+        # В дочернем процессе накопленное родителем уже не наше, а его таймера нет
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pending = dict.fromkeys(COUNTERS, 0)
+            self._timer = None
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._check_fork()
+            self._pending[name] += n
+            if time.monotonic() - self._last_flush < self.FLUSH_INTERVAL:
+                if self._timer is None:
+                    self._timer = threading.Timer(self.FLUSH_INTERVAL, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            pending = self._take()
+        self._flush(pending)
+
+    def _take(self):
+        pending = self._pending
+        self._pending = dict.fromkeys(COUNTERS, 0)
+        self._last_flush = time.monotonic()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return pending
+
+    def _flush(self, pending):
+        if not any(pending.values()):
+            return
+        try:
+            conn = self._conn()
+            for name, value in pending.items():
+                if value:
+                    conn.execute(
+                        'INSERT INTO stats (name, value) VALUES (?, ?) '
+                        'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+                        (name, value))
+        except sqlite3.Error:
+            pass
+
+    def flush(self):
+        """Сбрасывает накопленные в процессе счётчики в файл."""
+        with self._lock:
+            self._check_fork()
+            pending = self._take()
+        self._flush(pending)
+
+    def get(self, key):
+        """Возвращает (body, meta) или None."""
+        if not self.enabled:
+            return None
+        try:
+            conn = self._conn()
+            row = conn.execute('SELECT body, meta, last_used FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self._count('misses')
+                return None
+            now = time.time()
+            if now - row[2] > self.TOUCH_INTERVAL:
+                conn.execute('UPDATE entries SET last_used = ? WHERE key = ?', (now, key))
+        except sqlite3.Error:
+            return None
+        self._count('hits')
+        return row[0], json.loads(row[1])
+
+    def put(self, key, body, meta=None):
+        if not self.enabled or len(body) > self.max_entry_bytes:
+            return
+        try:
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    'INSERT OR REPLACE INTO entries (key, body, meta, size, last_used) VALUES (?, ?, ?, ?, ?)',
+                    (key, body, json.dumps(meta or {}), len(body), time.time()))
+                evicted = self._evict(conn)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            return
+        self._count('stores')
+        if evicted:
+            self._count('evictions', evicted)
+
+    def _evict(self, conn):
+        evicted = 0
+        while True:
+            count, total = conn.execute('SELECT count(*), coalesce(sum(size), 0) FROM entries').fetchone()
+            if count <= self.max_entries and total <= self.max_bytes:
+                return evicted
+            # Вытесняем давно не использованные записи пачкой
+            n = max(1, count - self.max_entries, count // 10)
+            evicted += conn.execute('DELETE FROM entries WHERE key IN '
+                                    '(SELECT key FROM entries ORDER BY last_used LIMIT ?)', (n,)).rowcount
+
+    def invalidate(self):
+        """Сбрасывает все записи (вызывается после каждой записи в каталог)."""
+        if not self.enabled:
+            return
+        try:
+            self._conn().execute('DELETE FROM entries')
+        except sqlite3.Error:
+            return
+        self._count('invalidations')
+
+    def stats(self):
+        """Счётчики по всем процессам плюс текущий размер кэша."""
+        result = dict.fromkeys(COUNTERS, 0)
+        self.flush()
+        try:
+            conn = self._conn()
+            for name, value in conn.execute('SELECT name, value FROM stats'):
+                if name in result:
+                    result[name] = value
+            result['entries'], result['bytes'] = conn.execute(
+                'SELECT count(*), coalesce(sum(size), 0) FROM entries').fetchone()
+        except sqlite3.Error:
+            result['entries'] = result['bytes'] = 0
+        result.update(max_entries=self.max_entries, max_bytes=self.max_bytes)
+        return result
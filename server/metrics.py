@@ -0,0 +1,233 @@
+"""Метрики сервера в текстовом формате Prometheus (GET /metrics).
+
+Счётчики и гистограммы копятся в памяти процесса и не чаще раза в FLUSH_INTERVAL
+прибавляются к общему SQLite-файлу (так же, как счётчики cache.ResponseCache);
+остаток сбрасывают таймер и выход процесса. Поэтому /metrics в любом воркере
+gunicorn отдаёт сумму по всем процессам, в том числе простаивающим. Значения gauge
+(запросы в обработке) тоже копятся в памяти и записываются в той же транзакции, что
+и счётчики, — каждый процесс в свою строку; строки завершившихся процессов не
+учитываются. Запрос, таким образом, пишет в файл не больше одного раза.
+"""
+import atexit
+import bisect
+import os
+import sqlite3
+import threading
+import time
+
+_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS samples (name TEXT NOT NULL, labels TEXT NOT NULL, '
+    'value REAL NOT NULL, PRIMARY KEY (name, labels))',
+    'CREATE TABLE IF NOT EXISTS gauges (pid INTEGER NOT NULL, name TEXT NOT NULL, labels TEXT NOT NULL, '
+    'value REAL NOT NULL, PRIMARY KEY (pid, name, labels))',
+]
+
+# Границы корзин гистограмм длительности (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def labels(**values):
+    """Метки в виде строки экспозиции: method="GET",route="/books"."""
+    return ','.join(f'{k}="{_escape(v)}"' for k, v in values.items())
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class Metrics:
+    # Как часто прибавлять накопленное в процессе к общему файлу (секунды)
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, path, buckets=DEFAULT_BUCKETS):
+        self.path = path
+        self.buckets = tuple(buckets)
+        self._les = [_format_value(b) for b in self.buckets] + ['+Inf']
+        self._meta = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Запись в файл: значения gauge пишутся в порядке их снимков
+        self._write_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._pending = {}
+        self._gauges = {}
+        self._gauges_dirty = False
+        self._last_flush = time.monotonic()
+        self._timer = None
+        atexit.register(self.flush)
+
+    def describe(self, name, kind, help_text):
+        """Тип (counter|gauge|histogram) и описание метрики для строк # TYPE / # HELP."""
+        self._meta[name] = (kind, help_text)
+
+    def _conn(self):
+        # Отдельный коннект на поток и на процесс (после fork старый не используем)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            for ddl in _SCHEMA:
+                conn.execute(ddl)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _check_fork(self):
+        # В дочернем процессе накопленное родителем уже не наше: иначе его прибавил бы каждый воркер
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pending = {}
+            self._gauges = {}
+            self._gauges_dirty = False
+            self._timer = None
+
+    def add(self, samples, gauges=()):
+        """Прибавляет значения к счётчикам: samples — пары ((name, labels), value).
+        gauges — такие же пары, прибавляемые к gauge этого процесса."""
+        with self._lock:
+            self._check_fork()
+            pending = self._pending
+            for key, value in samples:
+                pending[key] = pending.get(key, 0) + value
+            for key, value in gauges:
+                self._gauges[key] = self._gauges.get(key, 0) + value
+                self._gauges_dirty = True
+            due = time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL
+            if not due and (pending or self._gauges_dirty) and self._timer is None:
+                # остаток сбросит таймер, даже если процесс больше не получит запросов
+                self._timer = threading.Timer(self.FLUSH_INTERVAL, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+
+    def histogram(self, name, label_str, value):
+        """Пары для add(): наблюдение `value` в гистограмме `name` (корзина, _sum, _count)."""
+        le = self._les[bisect.bisect_left(self.buckets, value)]
+        bucket_labels = f'{label_str},le="{le}"' if label_str else f'le="{le}"'
+        return [((name + '_bucket', bucket_labels), 1), ((name + '_sum', label_str), value),
+                ((name + '_count', label_str), 1)]
+
+    def _take(self):
+        pending = self._pending
+        self._pending = {}
+        gauges = dict(self._gauges) if self._gauges_dirty else {}
+        self._gauges_dirty = False
+        self._last_flush = time.monotonic()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return pending, gauges
+
+    def _flush(self, pending, gauges):
+        try:
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    'INSERT INTO samples (name, labels, value) VALUES (?, ?, ?) '
+                    'ON CONFLICT(name, labels) DO UPDATE SET value = value + excluded.value',
+                    [(name, label_str, value) for (name, label_str), value in pending.items() if value])
+                conn.executemany(
+                    'INSERT OR REPLACE INTO gauges (pid, name, labels, value) VALUES (?, ?, ?, ?)',
+                    [(self._pid, name, label_str, value) for (name, label_str), value in gauges.items()])
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            pass
+
+    def flush(self):
+        """Записывает в файл всё накопленное процессом."""
+        # Снимок берётся под _write_lock: более старый снимок gauge не перезапишет новый
+        with self._write_lock:
+            with self._lock:
+                self._check_fork()
+                pending, gauges = self._take()
+            if pending or gauges:
+                self._flush(pending, gauges)
+
+    def collect(self):
+        """{(name, labels): value} по всем процессам."""
+        self.flush()
+        result = {}
+        try:
+            conn = self._conn()
+            for name, label_str, value in conn.execute('SELECT name, labels, value FROM samples'):
+                result[(name, label_str)] = value
+            dead = set()
+            for pid, name, label_str, value in conn.execute('SELECT pid, name, labels, value FROM gauges'):
+                if pid != self._pid and (pid in dead or not _pid_alive(pid)):
+                    dead.add(pid)
+                    continue
+                result[(name, label_str)] = result.get((name, label_str), 0) + value
+            if dead:
+                conn.executemany('DELETE FROM gauges WHERE pid = ?', [(pid,) for pid in dead])
+        except sqlite3.Error:
+            pass
+        return result
+
+    def render(self):
+        """Текст в формате экспозиции Prometheus 0.0.4."""
+        samples = self.collect()
+        families = {}
+        for (name, label_str), value in samples.items():
+            family = name
+            for suffix in ('_bucket', '_sum', '_count'):
+                base = name[:-len(suffix)]
+                if name.endswith(suffix) and self._meta.get(base, ('',))[0] == 'histogram':
+                    family = base
+                    break
+            families.setdefault(family, []).append((name, label_str, value))
+        lines = []
+        for family in sorted(families):
+            kind, help_text = self._meta.get(family, ('untyped', ''))
+            if help_text:
+                lines.append(f'# HELP {family} {help_text}')
+            lines.append(f'# TYPE {family} {kind}')
+            rows = families[family]
+            rows = self._cumulative(family, rows) if kind == 'histogram' else sorted(rows)
+            for name, label_str, value in rows:
+                lines.append(f'{name}{{{label_str}}} {_format_value(value)}' if label_str
+                             else f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def _cumulative(self, family, rows):
+        # В файле корзины хранятся по отдельности, Prometheus ждёт накопленные (le — «не больше»)
+        order = {le: i for i, le in enumerate(self._les)}
+        counts = {}
+        result = []
+        for name, label_str, value in rows:
+            if name != family + '_bucket':
+                result.append((name, label_str, value))
+                continue
+            base, _, le = label_str.rpartition('le=')
+            counts.setdefault(base, [0] * len(self._les))[order.get(le.strip('"'), len(self._les) - 1)] += value
+        for base, per_bucket in counts.items():
+            total = 0
+            for le, count in zip(self._les, per_bucket):
+                total += count
+                result.append((family + '_bucket', f'{base}le="{le}"', total))
+        # корзины по порядку границ, а не по строке le
+        result.sort(key=lambda r: (r[0], r[1].rpartition('le=')[0], order.get(r[1].rpartition('le=')[2].strip('"'), 0)))
+        return result
@@ -0,0 +1,150 @@
+"""Полнотекстовый поиск по title/author/reserved_by.
+
+SQLite — contentless-таблица FTS5 (токенизатор unicode61 приводит кириллицу к
+нижнему регистру), которую поддерживают триггеры на books. Postgres — GIN-индекс
+по выражению to_tsvector('simple', ...) и триграммный индекс pg_trgm для подстрок;
+индексы по выражению обновляются самой СУБД.
+
+Буква «ё» в индексе и в запросе заменяется на «е», чтобы «мертвые» находило «Мёртвые».
+"""
+import re
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _sql_fold(expr):
+    return f"replace(replace(coalesce({expr}, ''), 'ё', 'е'), 'Ё', 'Е')"
+
+
+_FTS_VALUES = ', '.join(_sql_fold(f'{{row}}.{c}') for c in ('title', 'author', 'reserved_by'))
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE books_fts USING fts5("
+    "title, author, reserved_by, content='', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN "
+    f"INSERT INTO books_fts(rowid, title, author, reserved_by) VALUES (new.id, {_FTS_VALUES.format(row='new')}); END",
+    "CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author, reserved_by) "
+    f"VALUES ('delete', old.id, {_FTS_VALUES.format(row='old')}); END",
+    "CREATE TRIGGER books_fts_au AFTER UPDATE OF title, author, reserved_by ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author, reserved_by) "
+    f"VALUES ('delete', old.id, {_FTS_VALUES.format(row='old')}); "
+    f"INSERT INTO books_fts(rowid, title, author, reserved_by) VALUES (new.id, {_FTS_VALUES.format(row='new')}); END",
+    # Первичное наполнение индекса уже существующими книгами
+    "INSERT INTO books_fts(rowid, title, author, reserved_by) "
+    f"SELECT books.id, {_FTS_VALUES.format(row='books')} FROM books",
+]
+
+_PG_DOCUMENT = "coalesce(title, '') || ' ' || coalesce(author, '') || ' ' || coalesce(reserved_by, '')"
+_PG_VECTOR = f"to_tsvector('simple', replace(lower({_PG_DOCUMENT}), 'ё', 'е'))"
+_PG_TRGM = f"replace(lower({_PG_DOCUMENT}), 'ё', 'е')"
+
+POSTGRES_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_books_search_tsv ON books USING GIN (({_PG_VECTOR}))",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_books_search_trgm ON books USING GIN (({_PG_TRGM}) gin_trgm_ops)",
+]
+
+# Колонки результата — в том же порядке, что BOOK_FIELDS в app.py
+_COLUMNS = 'books.id, books.title, books.author, books.status, books.reserved_by'
+
+
+def create(conn):
+    """Создаёт индекс поиска в транзакции `conn` (миграция). Возвращает True, если поиск доступен.
+
+    Шаги, которые СУБД не поддерживает, откатываются до точки сохранения и пропускаются.
+    """
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        if available(conn):
+            return True
+        try:
+            with conn.begin_nested():
+                for ddl in SQLITE_DDL:
+                    conn.execute(text(ddl))
+        except Exception:
+            # SQLite собран без FTS5 — поиск пойдёт через LIKE
+            return False
+        return True
+    if dialect == 'postgresql':
+        ok = True
+        for ddl in POSTGRES_DDL:
+            try:
+                with conn.begin_nested():
+                    conn.execute(text(ddl))
+            except Exception:
+                # Например, нет прав на CREATE EXTENSION — остаётся tsvector-индекс
+                ok = ok and 'trgm' in ddl
+        return ok
+    return False
+
+
+def drop(conn):
+    if conn.dialect.name == 'sqlite':
+        for name in ('books_fts_ai', 'books_fts_ad', 'books_fts_au'):
+            conn.execute(text(f'DROP TRIGGER IF EXISTS {name}'))
+        conn.execute(text('DROP TABLE IF EXISTS books_fts'))
+    elif conn.dialect.name == 'postgresql':
+        conn.execute(text('DROP INDEX IF EXISTS ix_books_search_trgm'))
+        conn.execute(text('DROP INDEX IF EXISTS ix_books_search_tsv'))
+
+
+def available(bind):
+    """Есть ли в базе индекс поиска (создаётся миграцией); без него поиск идёт через LIKE."""
+    dialect = bind.dialect.name
+    if dialect == 'sqlite':
+        sql = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'"
+    elif dialect == 'postgresql':
+        sql = "SELECT 1 FROM pg_indexes WHERE indexname = 'ix_books_search_tsv'"
+    else:
+        return False
+    if isinstance(bind, Engine):
+        with bind.connect() as conn:
+            return conn.execute(text(sql)).first() is not None
+    return bind.execute(text(sql)).first() is not None
+
+
+def fold(value):
+    return value.lower().replace('ё', 'е')
+
+
+def query_terms(q):
+    """Слова запроса в нижнем регистре, «ё» → «е»."""
+    return _WORD_RE.findall(fold(q))
+
+
+def search(conn, dialect, q, limit, status=None):
+    """Книги, все слова запроса в которых совпадают по префиксу, — по убыванию релевантности.
+
+    Возвращает кортежи (id, title, author, status, reserved_by).
+    """
+    terms = query_terms(q)
+    if not terms:
+        return []
+    params = {'limit': limit}
+    status_sql = ''
+    if status:
+        status_sql = 'AND books.status = :status'
+        params['status'] = status
+    if dialect == 'sqlite':
+        # Префиксный запрос FTS5: "слово"* для каждого слова (неявное AND);
+        # bm25 с весами: совпадение в названии важнее автора и читателя
+        params['match'] = ' '.join(f'"{term}"*' for term in terms)
+        sql = (
+            f"SELECT {_COLUMNS} FROM books_fts JOIN books ON books.id = books_fts.rowid "
+            f"WHERE books_fts MATCH :match {status_sql} "
+            "ORDER BY bm25(books_fts, 10.0, 5.0, 1.0), books.id LIMIT :limit"
+        )
+    else:
+        params['tsquery'] = ' & '.join(f'{term}:*' for term in terms)
+        params['like'] = '%' + fold(q.strip()).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        # tsvector для префиксов слов, триграммы — для подстроки внутри слова
+        sql = (
+            f"SELECT {_COLUMNS} FROM books "
+            f"WHERE ({_PG_VECTOR} @@ to_tsquery('simple', :tsquery) OR {_PG_TRGM} LIKE :like) {status_sql} "
+            f"ORDER BY ts_rank({_PG_VECTOR}, to_tsquery('simple', :tsquery)) DESC, books.id LIMIT :limit"
+        )
+    return conn.execute(text(sql), params).fetchall()
@@ -0,0 +1,86 @@
+import os
+import sys
+
+import pytest
+
+# ensure project root is on path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from loadtest.catalog import STATUS_MIX, generate_books
+from loadtest.report import load_report, percentile, save_report, summarize
+from loadtest.workload import load_trace, make_trace, save_trace
+
+
+def test_catalog_is_reproducible_and_follows_the_status_mix():
+    books = list(generate_books(5000, seed=3))
+    assert books == list(generate_books(5000, seed=3))
+    assert books != list(generate_books(5000, seed=4))
+    for status, share in STATUS_MIX.items():
+        assert abs(sum(b['status'] == status for b in books) / len(books) - share) < 0.03
+    assert all((b['reserved_by'] is not None) == (b['status'] == 'зарезервирована') for b in books)
+    assert all(len(b['title']) <= 120 and len(b['author']) <= 120 for b in books)
+
+
+def test_trace_only_asks_for_transitions_the_server_accepts(tmp_path):
+    header, operations = make_trace(200, 3000, catalog_seed=1, seed=2)
+    assert (header, operations) == make_trace(200, 3000, catalog_seed=1, seed=2)
+    path = str(tmp_path / 'trace.jsonl')
+    save_trace(path, header, operations)
+    loaded_header, loaded, digest = load_trace(path)
+    assert (loaded_header, loaded) == (header, operations) and len(digest) == 64
+
+    books = list(generate_books(200, seed=1))
+    for op in operations:
+        if 'book' not in op:
+            continue
+        book = books[op['book']]
+        assert book is not None, op
+        if op['op'] == 'issue':
+            assert book['status'] in ('доступна', 'зарезервирована')
+            assert op.get('name') == book['reserved_by']
+            book.update(status='выдана', reserved_by=None)
+        elif op['op'] == 'return':
+            assert book['status'] == 'выдана'
+            book['status'] = 'доступна'
+        elif op['op'] == 'reserve':
+            assert book['status'] == 'доступна' and op['name']
+            book.update(status='зарезервирована', reserved_by=op['name'])
+        else:
+            books[op['book']] = None
+    assert {op['op'] for op in operations} == set(header['mix'])
+
+
+def test_report_percentiles_and_error_rate(tmp_path):
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([5], 99) == 5 and percentile([], 50) is None
+    results = [{'op': 'list', 'status': 200, 'latency': i / 1000} for i in range(1, 101)]
+    results += [{'op': 'issue', 'status': 400, 'latency': 0.01}, {'op': 'issue', 'status': None, 'latency': 0.5},
+                {'op': 'issue', 'status': 503, 'latency': 0.02}]
+    report = summarize(results, 2.0, {'label': 'test'})
+    assert report['overall']['requests'] == 103 and report['overall']['throughput_rps'] == 51.5
+    assert report['operations']['list']['latency_ms']['p50'] == 50.5
+    assert report['operations']['list']['error_rate'] == 0
+    issue = report['operations']['issue']
+    assert issue['errors'] == 2 and issue['rejected'] == 1
+    path = str(tmp_path / 'report.json')
+    save_report(path, report)
+    assert load_report(path) == report
+
+
+def test_replay_against_gunicorn(tmp_path):
+    pytest.importorskip('gunicorn')
+    from loadtest.catalog import seed_server
+    from loadtest.driver import catalog_ids, replay, serve
+
+    header, operations = make_trace(300, 400)
+    with serve('sqlite:///' + str(tmp_path / 'library.db'), workers=2) as url:
+        assert seed_server(url, generate_books(300))['inserted'] == 300
+        ids = catalog_ids(url)
+        assert len(ids) == 300
+        results, elapsed = replay(url, operations, ids, concurrency=4)
+    report = summarize(results, elapsed, {})
+    assert report['overall']['requests'] == 400
+    assert report['overall']['errors'] == 0
+    assert set(report['operations']) == {op['op'] for op in operations}
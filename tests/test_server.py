@@ -1,5 +1,9 @@
+import importlib
+import json
 import os
 import sys
+import tempfile
+import threading
 import pytest
 
 # ensure project root is on path
@@ -7,7 +11,23 @@ ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
 
-from server import app as flask_app
+# tests run against a throwaway SQLite file instead of server/library.db
+_TMP = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_TMP, 'test_library.db'))
+os.environ.setdefault('RESPONSE_CACHE_PATH', os.path.join(_TMP, 'response_cache.sqlite'))
+os.environ.setdefault('METRICS_PATH', os.path.join(_TMP, 'metrics.sqlite'))
+
+import flask_migrate
+
+from server.app import Book, create_app, db
+
+# the module itself is needed for monkeypatching
+server_app = importlib.import_module('server.app')
+
+flask_app = create_app()
+# the schema comes from the migrations, as in production (flask db upgrade)
+with flask_app.app_context():
+    flask_migrate.upgrade()
 
 
 @pytest.fixture
@@ -16,8 +36,633 @@ def client():
         yield c
 
 
+@pytest.fixture
+def books(client):
+    # fresh catalog for every test that needs data
+    with flask_app.app_context():
+        Book.query.delete()
+        db.session.commit()
+    rows = [
+        ('Война и мир', 'Толстой', 'доступна', None),
+        ('Анна Каренина', 'Толстой', 'выдана', None),
+        ('Преступление и наказание', 'Достоевский', 'зарезервирована', 'Иванов'),
+        ('Идиот', 'Достоевский', 'доступна', None),
+        ('Мёртвые души', 'Гоголь', 'доступна', None),
+    ]
+    with flask_app.app_context():
+        for title, author, status, reserved_by in rows:
+            db.session.add(Book(title=title, author=author, status=status, reserved_by=reserved_by))
+        # the catalog was replaced wholesale: bump the version like a bulk import does
+        server_app._record_change(None, 'reset')
+        server_app._commit_changes()
+    return rows
+
+
 def test_health(client):
     rv = client.get('/health')
     assert rv.status_code == 200
     data = rv.get_json()
     assert data.get('status') == 'ok'
+
+
+def test_get_books_without_params_returns_list(client, books):
+    rv = client.get('/books')
+    assert rv.status_code == 200
+    data = rv.get_json()
+    assert isinstance(data, list)
+    assert [b['title'] for b in data] == [r[0] for r in books]
+    assert set(data[0]) == {'id', 'title', 'author', 'status', 'reserved_by'}
+
+
+def test_get_books_streams_in_batches(client, books, monkeypatch):
+    monkeypatch.setattr(server_app, 'STREAM_BATCH_SIZE', 2)
+    rv = client.get('/books?sort=title', buffered=False)
+    chunks = list(rv.response)
+    assert len(chunks) > 3
+    data = json.loads(b''.join(chunks))
+    assert [b['title'] for b in data] == sorted(r[0] for r in books)
+
+
+def test_get_books_keyset_pages_cover_catalog(client, books):
+    seen = []
+    cursor = None
+    while True:
+        url = '/books?limit=2&sort=author&order=desc' + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(url).get_json()
+        seen.extend(data['items'])
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+    assert len(seen) == len(books)
+    keys = [(b['author'], b['id']) for b in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_get_books_filters(client, books):
+    data = client.get('/books?q=Толстой&status=выдана').get_json()
+    assert [b['title'] for b in data] == ['Анна Каренина']
+    data = client.get('/books?q=Иван').get_json()
+    assert [b['reserved_by'] for b in data] == ['Иванов']
+
+
+def test_get_books_rejects_bad_params(client, books):
+    assert client.get('/books?sort=issued_date').status_code == 400
+    assert client.get('/books?limit=0').status_code == 400
+    cursor = client.get('/books?limit=1&sort=title').get_json()['next_cursor']
+    assert client.get(f'/books?limit=1&sort=author&cursor={cursor}').status_code == 400
+
+
+def test_changes_returns_upserts_and_tombstones(client, books):
+    rv = client.get('/books')
+    version = int(rv.headers['X-Books-Version'])
+    ids = [b['id'] for b in rv.get_json()]
+
+    assert client.put(f'/books/return/{ids[1]}').status_code == 200
+    assert client.delete(f'/books/{ids[0]}').status_code == 200
+    new_id = client.post('/books', json={'title': 'Нос', 'author': 'Гоголь'}).get_json()['id']
+
+    data = client.get(f'/books/changes?since={version}').get_json()
+    assert data['reset'] is False
+    assert data['version'] == version + 3
+    changes = {c['id']: c for c in data['changes']}
+    assert changes[ids[0]] == {'op': 'delete', 'id': ids[0]}
+    assert changes[ids[1]]['book']['status'] == 'доступна'
+    assert changes[new_id]['book']['title'] == 'Нос'
+
+    # nothing new since the latest version
+    data = client.get(f'/books/changes?since={data["version"]}').get_json()
+    assert data['changes'] == [] and data['reset'] is False
+
+
+def test_changes_requests_reset_when_gap_too_large(client, books, monkeypatch):
+    version = int(client.get('/books').headers['X-Books-Version'])
+    monkeypatch.setattr(server_app, 'MAX_CHANGES_PER_RESPONSE', 1)
+    client.post('/books', json={'title': 'Шинель', 'author': 'Гоголь'})
+    client.post('/books', json={'title': 'Вий', 'author': 'Гоголь'})
+    assert client.get(f'/books/changes?since={version}').get_json()['reset'] is True
+    assert client.get('/books/changes?since=abc').status_code == 400
+
+
+def _interleaved_writes(a_id, b_id, observe):
+    """Transaction A changes book a_id and holds its change-log entry uncommitted while
+    request B changes b_id; observe() runs while A is open and B has been given time to
+    finish. Returns whatever observe() returned."""
+    recorded, release = threading.Event(), threading.Event()
+
+    def writer_a():
+        with flask_app.app_context():
+            table = Book.__table__
+            db.session.execute(table.update().where(table.c.id == a_id).values(status='выдана'))
+            server_app._record_change(a_id)
+            recorded.set()
+            release.wait(10)
+            server_app._commit_changes()
+
+    def writer_b():
+        with flask_app.test_client() as c:
+            assert c.put(f'/books/issue/{b_id}', json={}).status_code == 200
+
+    a = threading.Thread(target=writer_a)
+    a.start()
+    assert recorded.wait(10)
+    b = threading.Thread(target=writer_b)
+    b.start()
+    # on Postgres without serialized change-log writes B commits a newer version here
+    b.join(0.5)
+    try:
+        return observe()
+    finally:
+        release.set()
+        a.join()
+        b.join()
+
+
+def test_changes_are_not_skipped_when_versions_commit_out_of_order(client, books):
+    ids = [b['id'] for b in client.get('/books').get_json() if b['status'] == 'доступна']
+    seen = _interleaved_writes(ids[0], ids[1], lambda: client.get('/books/changes?since=0').get_json()['version'])
+    data = client.get(f'/books/changes?since={seen}').get_json()
+    assert data['reset'] is False
+    assert {c['id'] for c in data['changes']} == {ids[0], ids[1]}
+
+
+def test_etag_and_cache_see_a_late_commit(client, books):
+    ids = [b['id'] for b in client.get('/books').get_json() if b['status'] == 'доступна']
+    seen = _interleaved_writes(ids[0], ids[1], lambda: client.get('/books').headers['ETag'])
+    rv = client.get('/books', headers={'If-None-Match': seen})
+    assert rv.status_code == 200 and rv.headers['X-Cache'] == 'MISS'
+    statuses = {b['id']: b['status'] for b in rv.get_json()}
+    assert statuses[ids[0]] == statuses[ids[1]] == 'выдана'
+
+
+def test_get_books_conditional_get(client, books):
+    rv = client.get('/books')
+    etag = rv.headers['ETag']
+    assert etag
+
+    rv = client.get('/books', headers={'If-None-Match': etag})
+    assert rv.status_code == 304
+    assert rv.data == b''
+    assert rv.headers['ETag'] == etag
+
+    # other parameters -> other representation
+    assert client.get('/books?sort=title').headers['ETag'] != etag
+
+    book_id = client.get('/books').get_json()[0]['id']
+    client.put(f'/books/issue/{book_id}', json={})
+    rv = client.get('/books', headers={'If-None-Match': etag})
+    assert rv.status_code == 200
+    assert rv.headers['ETag'] != etag
+
+
+def test_bulk_import_ndjson_in_batches(client, books):
+    version = int(client.get('/books').headers['X-Books-Version'])
+    lines = [
+        '{"title": "Обломов", "author": "Гончаров"}',
+        '{"title": "Обрыв", "author": "Гончаров", "status": "выдана"}',
+        'not json',
+        '{"title": "", "author": "Никто"}',
+        '',
+        '{"title": "Отцы и дети", "author": "Тургенев", "status": "зарезервирована", "reserved_by": "Петров"}',
+    ]
+    rv = client.post('/books/bulk?batch_size=2', data='\n'.join(lines).encode('utf-8'),
+                     content_type='application/x-ndjson')
+    assert rv.status_code == 200
+    summary = rv.get_json()
+    assert summary['inserted'] == 3
+    assert summary['rejected'] == 2
+    assert [e['line'] for e in summary['errors']] == [3, 4]
+    assert [b['inserted'] for b in summary['batches']] == [2, 1]
+
+    titles = {b['title']: b for b in client.get('/books').get_json()}
+    assert titles['Отцы и дети']['reserved_by'] == 'Петров'
+    # ids of imported rows are unknown to the change log -> clients reload
+    assert client.get(f'/books/changes?since={version}').get_json()['reset'] is True
+
+
+def test_bulk_import_csv_and_cli(client, books, tmp_path):
+    body = 'title,author,status\nМуму,Тургенев,\nАся,Тургенев,потеряна\n'
+    rv = client.post('/books/bulk', data=body.encode('utf-8'), content_type='text/csv')
+    summary = rv.get_json()
+    assert summary['inserted'] == 1 and summary['rejected'] == 1
+
+    path = tmp_path / 'books.ndjson'
+    path.write_text('{"title": "Рудин", "author": "Тургенев"}\n', encoding='utf-8')
+    result = flask_app.test_cli_runner().invoke(args=['import-books', str(path), '--batch-size', '10'])
+    assert result.exit_code == 0, result.output
+    assert 'Импортировано: 1' in result.output
+    assert 'Рудин' in [b['title'] for b in client.get('/books').get_json()]
+
+
+def test_bulk_import_stops_with_400_on_an_undecodable_line(client, books):
+    lines = [b'{"title": "\xd0\x9c\xd1\x83\xd0\xbc\xd1\x83", "author": "A"}'] * 3
+    lines += [b'{"title": "\xff", "author": "A"}', b'{"title": "X", "author": "A"}']
+    rv = client.post('/books/bulk?batch_size=2', data=b'\n'.join(lines), content_type='application/x-ndjson')
+    assert rv.status_code == 400
+    data = rv.get_json()
+    assert data['line'] == 4 and 'UTF-8' in data['error']
+    # the first batch is committed, the pending third row is not
+    assert data['inserted'] == 2 and data['batches'][-1]['last_line'] == 2
+    assert [b['title'] for b in client.get('/books').get_json()].count('Муму') == 2
+
+    # a CSV saved in cp1251
+    rv = client.post('/books/bulk', data='title,author\nАся,Тургенев\n'.encode('cp1251'), content_type='text/csv')
+    assert rv.status_code == 400 and rv.get_json()['line'] == 2 and rv.get_json()['inserted'] == 0
+
+
+def test_bulk_import_rejects_unknown_format(client):
+    rv = client.post('/books/bulk', data=b'{}', content_type='application/json')
+    assert rv.status_code == 415
+
+
+def test_batch_applies_operations_in_one_request(client, books):
+    rv = client.get('/books')
+    version = int(rv.headers['X-Books-Version'])
+    ids = {b['title']: b['id'] for b in rv.get_json()}
+    operations = [
+        {'op': 'return', 'id': ids['Анна Каренина']},
+        {'op': 'return', 'id': ids['Война и мир']},
+        {'op': 'issue', 'id': ids['Преступление и наказание'], 'name': 'Петров'},
+        {'op': 'issue', 'id': ids['Преступление и наказание'], 'name': 'Иванов'},
+        {'op': 'reserve', 'id': ids['Идиот'], 'name': 'Сидоров'},
+        {'op': 'delete', 'id': ids['Мёртвые души']},
+        {'op': 'return', 'id': ids['Мёртвые души']},
+        {'op': 'burn', 'id': ids['Идиот']},
+    ]
+    rv = client.post('/books/batch', json={'operations': operations})
+    assert rv.status_code == 200
+    results = rv.get_json()['results']
+    assert [r['status'] for r in results] == [200, 400, 400, 200, 200, 200, 404, 400]
+    assert results[1]['error'] == 'Книга не выдана'
+    assert results[2]['error'] == 'Имя не совпадает с забронированным'
+
+    state = {b['title']: b for b in client.get('/books').get_json()}
+    assert state['Анна Каренина']['status'] == 'доступна'
+    assert state['Преступление и наказание']['status'] == 'выдана'
+    assert state['Преступление и наказание']['reserved_by'] is None
+    assert state['Идиот']['reserved_by'] == 'Сидоров'
+    assert 'Мёртвые души' not in state
+
+    changes = client.get(f'/books/changes?since={version}').get_json()
+    assert {c['id']: c['op'] for c in changes['changes']} == {
+        ids['Анна Каренина']: 'upsert',
+        ids['Преступление и наказание']: 'upsert',
+        ids['Идиот']: 'upsert',
+        ids['Мёртвые души']: 'delete',
+    }
+
+
+def test_batch_rejects_malformed_body(client):
+    assert client.post('/books/batch', json=[{'op': 'return', 'id': 1}]).status_code == 400
+
+
+def _race(requests_per_thread):
+    """Fire the given (method, url, json) calls from parallel threads at the same moment."""
+    barrier = threading.Barrier(len(requests_per_thread))
+    codes = [None] * len(requests_per_thread)
+
+    def _worker(i, method, url, payload):
+        c = flask_app.test_client()
+        barrier.wait()
+        codes[i] = c.open(url, method=method, json=payload).status_code
+
+    threads = [threading.Thread(target=_worker, args=(i, *req)) for i, req in enumerate(requests_per_thread)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return codes
+
+
+def test_concurrent_issue_and_reserve_have_exactly_one_winner(client, books):
+    for _ in range(10):
+        book_id = client.post('/books', json={'title': 'Гонка', 'author': 'Тест'}).get_json()['id']
+        calls = [('PUT', f'/books/issue/{book_id}', {})] * 4
+        calls += [('PUT', f'/books/reserve/{book_id}', {'name': f'Читатель {i}'}) for i in range(4)]
+        codes = _race(calls)
+        assert codes.count(200) == 1, codes
+        assert set(codes) <= {200, 400}
+
+
+def test_reserved_book_is_issued_only_to_reserver(client, books):
+    book_id = next(b['id'] for b in client.get('/books').get_json() if b['reserved_by'] == 'Иванов')
+    assert client.put(f'/books/issue/{book_id}', json={}).status_code == 400
+    rv = client.put(f'/books/issue/{book_id}', json={'name': 'Петров'})
+    assert rv.status_code == 400 and rv.get_json()['error'] == 'Имя не совпадает с забронированным'
+    assert client.put(f'/books/issue/{book_id}', json={'name': 'Иванов'}).status_code == 200
+    assert client.put(f'/books/reserve/{book_id}', json={}).status_code == 400
+    assert client.put('/books/reserve/999999', json={}).status_code == 404
+    assert client.put(f'/books/return/{book_id}').status_code == 200
+    assert client.put(f'/books/return/{book_id}').get_json()['error'] == 'Книга не выдана'
+    assert client.delete(f'/books/{book_id}').status_code == 200
+    assert client.delete(f'/books/{book_id}').status_code == 404
+
+
+def test_search_is_case_insensitive_for_cyrillic_and_ranked(client, books):
+    data = client.get('/books/search?q=толст').get_json()
+    assert {b['title'] for b in data} == {'Война и мир', 'Анна Каренина'}
+    # «ё» and «е» are interchangeable, words match by prefix
+    assert [b['title'] for b in client.get('/books/search?q=мертвые ду').get_json()] == ['Мёртвые души']
+    # a title hit ranks above an author-only hit
+    client.post('/books', json={'title': 'Гоголь: биография', 'author': 'Вересаев'})
+    data = client.get('/books/search?q=гоголь').get_json()
+    assert data[0]['title'] == 'Гоголь: биография'
+    assert client.get('/books/search?q=гоголь&status=выдана').get_json() == []
+    assert client.get('/books/search').status_code == 400
+
+
+def test_search_index_follows_updates_and_deletes(client, books):
+    book_id = next(b['id'] for b in client.get('/books').get_json() if b['title'] == 'Идиот')
+    assert client.put(f'/books/reserve/{book_id}', json={'name': 'Сидоров'}).status_code == 200
+    assert [b['id'] for b in client.get('/books/search?q=СИДОР').get_json()] == [book_id]
+    client.put(f'/books/issue/{book_id}', json={'name': 'Сидоров'})
+    assert client.get('/books/search?q=сидор').get_json() == []
+    client.delete(f'/books/{book_id}')
+    assert client.get('/books/search?q=идиот').get_json() == []
+
+
+def test_response_cache_hits_and_is_invalidated_by_writes(client, books):
+    first = client.get('/books?sort=title')
+    assert first.headers['X-Cache'] == 'MISS'
+    first_books = first.get_json()  # the body is stored once the stream is consumed
+    second = client.get('/books?sort=title')
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_json() == first_books
+    assert client.get('/books?limit=2').headers['X-Cache'] == 'MISS'
+    assert client.get('/books?limit=2').headers['X-Cache'] == 'HIT'
+
+    book_id = next(b['id'] for b in first_books if b['status'] == 'доступна')
+    assert client.put(f'/books/issue/{book_id}', json={}).status_code == 200
+    rv = client.get('/books?sort=title')
+    assert rv.headers['X-Cache'] == 'MISS'
+    assert {b['id']: b['status'] for b in rv.get_json()}[book_id] == 'выдана'
+
+    stats = client.get('/cache/stats').get_json()
+    assert stats['hits'] >= 2 and stats['misses'] >= 3 and stats['invalidations'] >= 1
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    from server.cache import ResponseCache
+    rc = ResponseCache(str(tmp_path / 'c.sqlite'), max_entries=2, max_bytes=1000)
+    rc.TOUCH_INTERVAL = 0
+    rc.put('a', b'1')
+    rc.put('b', b'2')
+    assert rc.get('a') is not None  # 'a' is now more recent than 'b'
+    rc.put('c', b'3')
+    assert rc.get('b') is None
+    assert rc.get('a') is not None and rc.get('c') is not None
+    rc.put('big', b'x' * 500)  # larger than max_entry_bytes (max_bytes // 4)
+    assert rc.get('big') is None
+    stats = rc.stats()
+    assert stats['entries'] == 2 and stats['evictions'] == 1
+
+
+def test_response_cache_counters_of_an_idle_or_exited_worker_are_flushed(tmp_path):
+    import subprocess
+    import time
+    from server.cache import ResponseCache
+
+    path = str(tmp_path / 'c.sqlite')
+    ResponseCache(path).stats()  # create the file before the other processes use it
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # a worker that served a request and then went idle
+        os.close(read)
+        worker = ResponseCache(path)
+        worker.FLUSH_INTERVAL = 0.2
+        worker.get('a')
+        worker.get('a')
+        os.write(write, b'.')
+        time.sleep(3)
+        os._exit(0)
+    os.close(write)
+    os.read(read, 1)
+    current = ResponseCache(path)
+    deadline = time.monotonic() + 2
+    while current.stats()['misses'] < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert current.stats()['misses'] == 2
+    os.kill(pid, 9)
+    os.waitpid(pid, 0)
+
+    # a worker that exits before its next flush
+    code = f'from server.cache import ResponseCache; c = ResponseCache({path!r}); c.get("a"); c.invalidate()'
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
+    stats = current.stats()
+    assert stats['misses'] == 3 and stats['invalidations'] == 1
+
+
+def test_get_books_columnar_representation(client, books, monkeypatch):
+    monkeypatch.setattr(server_app, 'STREAM_BATCH_SIZE', 2)
+    plain = client.get('/books').get_json()
+    rv = client.get('/books', headers={'Accept': server_app.COLUMNAR_MIMETYPE})
+    assert rv.mimetype == server_app.COLUMNAR_MIMETYPE
+    assert rv.headers['ETag'] != client.get('/books').headers['ETag']
+    data = rv.get_json()
+    assert len(data['blocks']) == 3
+    assert len(data['blocks'][0]['status_values']) <= 2
+
+    sys.path.insert(0, os.path.join(ROOT, 'client'))
+    try:
+        from model import decode_columnar
+    finally:
+        sys.path.pop(0)
+    assert list(decode_columnar(data)) == plain
+
+
+def test_get_books_negotiates_compression(client, books):
+    import gzip
+    lines = '\n'.join(json.dumps({'title': f'Том {i}', 'author': 'Собрание'}) for i in range(50))
+    client.post('/books/bulk', data=lines.encode('utf-8'), content_type='application/x-ndjson')
+    plain = client.get('/books').get_data()
+    rv = client.get('/books', headers={'Accept-Encoding': 'gzip'})
+    assert rv.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in rv.headers['Vary']
+    assert gzip.decompress(rv.get_data()) == plain
+    etag = rv.headers['ETag']
+    assert etag != client.get('/books').headers['ETag']
+    assert client.get('/books', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}).status_code == 304
+    # small responses are left alone
+    assert 'Content-Encoding' not in client.get('/health', headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def _metric_values(text):
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, _, value = line.rpartition(' ')
+            values[name] = float(value)
+    return values
+
+
+def test_metrics_count_requests_sql_and_bytes(client, books):
+    before = _metric_values(client.get('/metrics').get_data(as_text=True))
+    for _ in range(3):
+        client.get('/books?limit=2')
+    with client.get('/books') as rv:
+        body = rv.get_data()
+    client.put('/books/issue/999999', json={})
+    rv = client.get('/metrics')
+    assert rv.content_type.startswith('text/plain; version=0.0.4')
+    after = _metric_values(rv.get_data(as_text=True))
+
+    def delta(name):
+        return after.get(name, 0) - before.get(name, 0)
+
+    route = 'method="GET",route="/books"'
+    assert delta('library_http_requests_total{%s,status="200"}' % route) == 4
+    assert delta('library_http_requests_total{method="PUT",route="/books/issue/<int:book_id>",status="404"}') == 1
+    assert delta('library_http_request_duration_seconds_count{%s}' % route) == 4
+    assert delta('library_http_request_duration_seconds_bucket{%s,le="+Inf"}' % route) == 4
+    assert delta('library_db_statements_total{%s}' % route) >= 4
+    assert delta('library_db_statement_duration_seconds_total{%s}' % route) > 0
+    # the streamed full list is counted once it has been sent
+    assert delta('library_http_response_bytes_total{%s}' % route) >= len(body)
+    buckets = [v for k, v in after.items() if k.startswith('library_http_request_duration_seconds_bucket{%s,' % route)]
+    assert buckets == sorted(buckets)
+
+
+def test_traced_request_reports_server_timing(client, books, monkeypatch):
+    from client.model import parse_server_timing
+
+    plain = client.get('/books')
+    assert 'Server-Timing' not in plain.headers
+    # the header is honoured only when the server opted in
+    rv = client.get('/books', headers={'X-Request-Trace': '1'}, buffered=False)
+    assert rv.is_streamed and 'Server-Timing' not in rv.headers
+    rv.close()
+    monkeypatch.setitem(flask_app.config, 'TRACE_HEADER', True)
+    rv = client.get('/books', headers={'X-Request-Trace': '1'})
+    # the streamed list is buffered so that the header covers reading and serializing it
+    assert rv.get_data() == plain.get_data()
+    timing = parse_server_timing(rv.headers['Server-Timing'])
+    assert set(timing) == {'db', 'serialize', 'total'}
+    assert 0 < timing['db'] < timing['total'] and timing['serialize'] > 0
+
+
+def test_slow_requests_are_logged_with_statements(client, books, monkeypatch, caplog):
+    monkeypatch.setitem(flask_app.config, 'SLOW_REQUEST_MS', 0.001)
+    book_id = client.get('/books?limit=1&status=доступна').get_json()['items'][0]['id']
+    caplog.clear()
+    with caplog.at_level('WARNING', logger='library.slow_requests'):
+        assert client.put(f'/books/issue/{book_id}', json={}).status_code == 200
+        with client.get('/books') as rv:
+            rv.get_data()
+    issue, listing = [json.loads(r.getMessage()) for r in caplog.records if r.name == 'library.slow_requests']
+    assert issue['route'] == '/books/issue/<int:book_id>' and issue['status'] == 200
+    assert issue['path'] == f'/books/issue/{book_id}'
+    assert issue['statement_count'] == len(issue['statements']) > 0
+    update = [q for q in issue['statements'] if q['sql'].lstrip().upper().startswith('UPDATE BOOKS')]
+    assert update and update[0]['rows'] == 1
+    assert listing['route'] == '/books' and listing['bytes'] > 0 and listing['db_ms'] > 0
+
+
+def test_metrics_aggregate_across_processes(tmp_path):
+    from server import metrics
+
+    path = str(tmp_path / 'metrics.sqlite')
+    key = ('library_http_requests_total', metrics.labels(route='/books'))
+    gauge = ('library_http_requests_in_flight', '')
+    pid = os.fork()
+    if pid == 0:
+        # a worker that served two requests, still had one in flight and exited
+        worker = metrics.Metrics(path)
+        worker.add([(key, 2)], gauges=[(gauge, 1)])
+        worker.flush()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    current = metrics.Metrics(path)
+    current.add([(key, 1)], gauges=[(gauge, 1)])
+    collected = current.collect()
+    assert collected[key] == 3
+    # the dead worker's gauge is not counted
+    assert collected[gauge] == 1
+
+
+def test_import_and_create_app_do_not_touch_the_database(tmp_path):
+    # a worker must start even while the database is still coming up
+    import subprocess
+
+    code = ('import server.app as m; a = m.create_app(); '
+            'assert not m._engines and not a.extensions["sqlalchemy"].connectors')
+    env = dict(os.environ, DATABASE_URL='postgresql://nobody@127.0.0.1:9/none',
+               RESPONSE_CACHE_PATH=str(tmp_path / 'rc.sqlite'), METRICS_PATH=str(tmp_path / 'm.sqlite'))
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True)
+
+
+def test_worker_startup_is_reported_once_per_process(client):
+    client.get('/health')
+    client.get('/health')
+    text = client.get('/metrics').get_data(as_text=True)
+    lines = [l for l in text.splitlines() if l.startswith('library_worker_startup_seconds{')]
+    assert [l.split('{')[1].split('}')[0] for l in lines].count(f'pid="{os.getpid()}"') == 1
+
+
+def test_metrics_of_an_idle_worker_are_flushed(tmp_path):
+    import time
+    from server import metrics
+
+    path = str(tmp_path / 'metrics.sqlite')
+    key = ('library_http_requests_total', metrics.labels(route='/books'))
+    gauge = ('library_http_requests_in_flight', '')
+    metrics.Metrics(path).flush()
+    read, write = os.pipe()
+    go, resume = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        worker = metrics.Metrics(path)
+        worker.FLUSH_INTERVAL = 0.2
+        worker.add([(key, 1)])
+        time.sleep(0.3)
+        # a request after an idle spell: nothing is written until the timer fires
+        worker.add((), gauges=[(gauge, 1)])
+        os.write(write, b'.')
+        os.read(go, 1)
+        worker.add([(key, 1)], gauges=[(gauge, -1)])
+        os.write(write, b'.')
+        time.sleep(3)
+        os._exit(0)
+    os.close(write)
+    current = metrics.Metrics(path)
+
+    def settle(expected):
+        deadline = time.monotonic() + 2
+        while current.collect() != expected and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return current.collect()
+
+    try:
+        os.read(read, 1)
+        # counter and gauge land in the same flush, within FLUSH_INTERVAL
+        assert settle({key: 1, gauge: 1}) == {key: 1, gauge: 1}
+        os.write(resume, b'.')
+        os.read(read, 1)
+        assert settle({key: 2, gauge: 0}) == {key: 2, gauge: 0}
+    finally:
+        os.kill(pid, 9)
+        os.waitpid(pid, 0)
+
+
+def test_apps_in_one_process_keep_their_own_cache_and_metrics(tmp_path):
+    shared = {'RESPONSE_CACHE_PATH': str(tmp_path / 'shared_cache.sqlite')}
+    apps = []
+    for name in ('a', 'b'):
+        app = create_app(dict(shared, SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / name}.db',
+                              METRICS_PATH=str(tmp_path / f'{name}_metrics.sqlite')))
+        with app.app_context():
+            flask_migrate.upgrade()
+        apps.append(app)
+    a, b = (app.test_client() for app in apps)
+    # both catalogs are at version 1, and the cache file is shared
+    assert a.post('/books', json={'title': 'Нос', 'author': 'Гоголь'}).status_code == 201
+    assert b.post('/books', json={'title': 'Вий', 'author': 'Гоголь'}).status_code == 201
+    assert [x['title'] for x in a.get('/books?limit=10').get_json()['items']] == ['Нос']
+    rv = b.get('/books?limit=10')
+    assert rv.headers['X-Cache'] == 'MISS' and [x['title'] for x in rv.get_json()['items']] == ['Вий']
+    # the first app still has its own state
+    assert flask_app.extensions['library'].response_cache.path == os.environ['RESPONSE_CACHE_PATH']
+    # each app counts only its own requests
+    for client in (a, b):
+        text = client.get('/metrics').get_data(as_text=True)
+        assert 'library_http_requests_total{method="GET",route="/books",status="200"} 1\n' in text